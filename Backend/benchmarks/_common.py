@@ -0,0 +1,53 @@
+# _common.py — ตัวช่วยร่วมของสคริปต์ benchmark (จับเวลา + สรุปผล)
+
+import os
+import sys
+import time
+import numpy as np
+
+# ให้ import โมดูลใน Backend/ ได้เมื่อรันจากโฟลเดอร์ใดก็ได้
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def time_calls(fn, n=100, warmup=5):
+    """ เรียก fn() n ครั้ง (หลัง warm-up) → list ของ latency หน่วย ms """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def summarize(samples):
+    """ สรุป latency (ms) → dict mean/p50/p95/p99 """
+    arr = np.asarray(samples, dtype=np.float64)
+    if arr.size == 0:
+        return {"n": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    return {
+        "n": int(arr.size),
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+    }
+
+
+def print_row(name, stats):
+    print(f"{name:<32} n={stats['n']:<5} mean={stats['mean']:8.3f} ms  "
+          f"p50={stats['p50']:8.3f}  p95={stats['p95']:8.3f}  p99={stats['p99']:8.3f}")
+
+
+def random_crops(n, min_size=20, max_size=60, seed=0):
+    """ รูปตาสุ่ม (BGR uint8) ขนาดไม่เท่ากัน เหมือน crop จริงจาก landmark """
+    rng = np.random.default_rng(seed)
+    crops = []
+    for _ in range(n):
+        h = int(rng.integers(min_size, max_size))
+        w = int(rng.integers(min_size, max_size))
+        crops.append(rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8))
+    return crops
@@ -0,0 +1,125 @@
+# bench_backends.py — เทียบ backend ตรวจจับใบหน้า (hog / mediapipe) บนเฟรมที่บันทึกไว้
+#
+# รันจากโฟลเดอร์ Backend:
+#   python benchmarks/bench_backends.py --frames recorded_frames/ --labels recorded_frames/labels.json
+#
+# วัดต่อ backend:
+#   - latency ต่อเฟรมของการตรวจจับ + landmark (เส้นทางเดียวกับ keyframe ใน FaceRecognizer)
+#   - latency ของการเข้ารหัสต่อใบหน้า
+#   - recall ของการตรวจจับ: สัดส่วนใบหน้าใน labels ที่มีกรอบ IoU ≥ --iou
+#
+# labels.json (ไม่บังคับ): {"frame_0001.jpg": [[top, right, bottom, left], ...], ...} พิกัดเฟรมเต็ม
+# ถ้าไม่มี labels จะใช้ผลของ --reference backend เป็นคำตอบแทน (ค่าที่ได้คือ "ความสอดคล้อง" ไม่ใช่ recall จริง)
+
+import argparse
+import json
+import os
+import time
+
+import cv2
+
+from _common import summarize, print_row
+from face_backends import BACKENDS
+from face_recognizer import FaceRecognizer, IMAGE_EXTS
+from face_tracker import iou
+
+
+def load_frames(folder, limit=None):
+    frames = []
+    for f in sorted(os.listdir(folder)):
+        if f.lower().endswith(IMAGE_EXTS):
+            img = cv2.imread(os.path.join(folder, f))
+            if img is not None:
+                frames.append((f, img))
+        if limit and len(frames) >= limit:
+            break
+    if not frames:
+        raise SystemExit(f"ไม่มีเฟรมใน {folder}")
+    return frames
+
+
+def detect_all(recognizer, frames, encode=True):
+    """ รันการตรวจจับทุกเฟรม → (boxes ต่อเฟรม, latency ตรวจจับ, latency เข้ารหัสต่อใบหน้า) """
+    boxes, detect_ms, encode_ms = {}, [], []
+    for filename, frame in frames:
+        t0 = time.perf_counter()
+        rgb_small, locations, _, handles = recognizer._detect(frame)
+        detect_ms.append((time.perf_counter() - t0) * 1000.0)
+        boxes[filename] = [(t * 2, r * 2, b * 2, l * 2) for (t, r, b, l) in locations]
+        if encode:
+            for handle in handles:
+                t0 = time.perf_counter()
+                try:
+                    recognizer.backend.encode(rgb_small, handle)
+                except Exception:
+                    continue
+                encode_ms.append((time.perf_counter() - t0) * 1000.0)
+    return boxes, detect_ms, encode_ms
+
+
+def recall(truth, predicted, threshold):
+    """ → (จำนวนใบหน้าที่เจอ, จำนวนใบหน้าทั้งหมด) จับคู่แบบ greedy หนึ่งต่อหนึ่ง """
+    found = total = 0
+    for filename, gt_boxes in truth.items():
+        remaining = list(predicted.get(filename, []))
+        total += len(gt_boxes)
+        for gt in gt_boxes:
+            scores = [iou(gt, box) for box in remaining]
+            if scores and max(scores) >= threshold:
+                remaining.pop(scores.index(max(scores)))
+                found += 1
+    return found, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark face detector backends")
+    parser.add_argument("--frames", required=True, help="โฟลเดอร์เฟรมที่บันทึกจากกล้อง")
+    parser.add_argument("--labels", default=None, help="JSON กรอบใบหน้าจริงต่อเฟรม")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--reference", default="hog", help="backend ที่ใช้แทน labels ถ้าไม่มี")
+    parser.add_argument("--iou", type=float, default=0.4)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--no-encode", action="store_true", help="ไม่วัดเวลาเข้ารหัส")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.limit)
+    print(f"🎞️ {len(frames)} เฟรมจาก {args.frames}")
+
+    results = {}
+    for name in args.backends:
+        try:
+            recognizer = FaceRecognizer(image_folder=args.frames, min_faces=0, cache_dir=None,
+                                        preload=False, tracking=False, backend=name)
+        except ImportError as e:
+            print(f"⚠️ ข้าม {name}: {e}")
+            continue
+        # warm-up (โหลดโมเดล / graph ครั้งแรก)
+        recognizer._detect(frames[0][1])
+        results[name] = detect_all(recognizer, frames, encode=not args.no_encode)
+
+    if args.labels:
+        with open(args.labels, "r", encoding="utf-8") as f:
+            loaded = {filename for filename, _ in frames}
+            truth = {k: [tuple(b) for b in v] for k, v in json.load(f).items() if k in loaded}
+        truth_label = "labels"
+    elif args.reference in results:
+        truth = results[args.reference][0]
+        truth_label = f"{args.reference} (agreement)"
+    else:
+        truth, truth_label = None, None
+
+    for name, (boxes, detect_ms, encode_ms) in results.items():
+        print(f"\n== {name} ==")
+        print_row("detect + landmarks / frame", summarize(detect_ms))
+        if encode_ms:
+            print_row("encode / face", summarize(encode_ms))
+        n_faces = sum(len(b) for b in boxes.values())
+        print(f"faces detected: {n_faces} ({n_faces / len(frames):.2f} / frame)")
+        if truth is not None:
+            found, total = recall(truth, boxes, args.iou)
+            rate = found / total if total else 0.0
+            print(f"recall vs {truth_label}: {found}/{total} = {rate:.3f} (IoU ≥ {args.iou})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# bench_e2e.py — benchmark ทั้งเส้นทาง (offline, ไม่ใช้กล้องจริง) → ไฟล์ JSON ไว้เทียบระหว่าง commit
+#
+# รันจากโฟลเดอร์ Backend:
+#   python benchmarks/bench_e2e.py --faces 1 5 15 30 --roster 10 1000 10000
+#   python benchmarks/bench_e2e.py --video recordings/class1.mp4 --roster 100      (คลิปห้องเรียนที่บันทึกไว้)
+#   python benchmarks/bench_e2e.py --compare benchmarks/results/e2e-abc1234.json   (เทียบกับผลเดิม)
+#
+# ไม่ระบุ --video → สร้าง fixture สังเคราะห์จากรูปใน static/: วางใบหน้า n รูปเป็นตารางบนฉากขนาดห้องเรียน
+# และขยับเล็กน้อยทุกเฟรม (tracker ได้ทำงานจริง) ; ไฟล์ถูก cache ไว้ที่ benchmarks/fixtures/ (seed คงที่)
+#
+# ต่อ (จำนวนใบหน้า × จำนวนใบหน้าที่ลงทะเบียน) วัด latency ต่อเฟรมของ:
+#   recognize_faces      FaceRecognizer.recognize_faces (API เดิม, ไม่มี tracking)
+#   extract_eye_crops    หา landmark + crop ตาในกรอบใบหน้าทุกกรอบ
+#   predict_from_array   SleepDetector ทีละรูปตา (ทุกรูปตาในเฟรม)
+#   predict_batch        SleepDetector รูปตาทั้งเฟรมใน batch เดียว
+#   loop_body            main._analyze_frame + imencode (งานของหนึ่งเฟรมใน /video_feed)
+# และ FPS ของ FramePipeline เต็ม (FileCapture ไม่หน่วงเวลา = กล้องปลอมที่ป้อนเร็วที่สุด)
+# + RSS ปัจจุบัน / สูงสุด
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from _common import BACKEND_DIR, time_calls, summarize, print_row
+
+FIXTURE_DIR = os.path.join(BACKEND_DIR, "benchmarks", "fixtures")
+RESULT_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+STAGES = ("recognize_faces", "extract_eye_crops", "predict_from_array", "predict_batch", "loop_body")
+
+
+# ---------- fixtures ----------
+def load_faces(folder, tile=160):
+    from face_recognizer import IMAGE_EXTS
+    faces = []
+    for f in sorted(os.listdir(folder)):
+        if f.lower().endswith(IMAGE_EXTS):
+            img = cv2.imread(os.path.join(folder, f))
+            if img is not None:
+                faces.append(cv2.resize(img, (tile, tile)))
+    if not faces:
+        raise SystemExit(f"ไม่มีรูปใน {folder}")
+    return faces
+
+
+def synthetic_fixture(faces, n, frames=90, fps=30.0, size=(1280, 720), tile=160, seed=0):
+    """ คลิปสังเคราะห์ n ใบหน้า → path (สร้างครั้งแรกแล้วใช้ซ้ำ) """
+    path = os.path.join(FIXTURE_DIR, f"synthetic_{n}faces_{frames}f.mp4")
+    if os.path.exists(path):
+        return path
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    W, H = size
+    cols = math.ceil(math.sqrt(n * W / H))
+    rows = math.ceil(n / cols)
+    # ใบหน้าเยอะ → ย่อให้ตารางพอดีฉาก (ห้องเรียนจริงใบหน้าเล็กลงเมื่อคนเยอะ)
+    t = min(tile, W // cols, H // rows)
+    rng = np.random.default_rng(seed)
+    phases = rng.uniform(0, 2 * np.pi, size=n)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (W, H))
+    for k in range(frames):
+        frame = np.full((H, W, 3), 110, dtype=np.uint8)
+        for i in range(n):
+            r, c = divmod(i, cols)
+            # ขยับ ±4 px ตาม sin (ต่างเฟสกันทุกคน)
+            dx = int(4 * math.sin(k / 8.0 + phases[i]))
+            dy = int(4 * math.cos(k / 11.0 + phases[i]))
+            x = min(max(c * (W // cols) + (W // cols - t) // 2 + dx, 0), W - t)
+            y = min(max(r * (H // rows) + (H // rows - t) // 2 + dy, 0), H - t)
+            frame[y:y + t, x:x + t] = cv2.resize(faces[i % len(faces)], (t, t))
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def read_frames(path, limit):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"อ่านเฟรมจาก {path} ไม่ได้")
+    return frames
+
+
+# ---------- memory ----------
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb():
+    # Linux: KB, macOS: bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+# ---------- stages ----------
+class Cycle:
+    """ วนเฟรมของคลิปทีละเฟรมทุกครั้งที่ถูกเรียก """
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.i = 0
+
+    def __call__(self):
+        frame = self.frames[self.i % len(self.frames)]
+        self.i += 1
+        return frame
+
+
+def grow_roster(index, size, rng):
+    """ เติม encoding สุ่ม (norm ≈ 1 เหมือน dlib) จนดัชนีมี size ใบหน้า """
+    missing = size - len(index)
+    if missing <= 0:
+        return
+    enc = rng.normal(size=(missing, 128)).astype(np.float32)
+    enc /= np.linalg.norm(enc, axis=1, keepdims=True)
+    index.upsert_many([f"bench_{len(index) + i}" for i in range(missing)], list(enc))
+
+
+def measure_config(app, video, frames, n_iter, pipeline_sec):
+    from frame_analysis import clip_box, extract_eye_crops
+    from camera_registry import FileCapture
+    from stream_pipeline import FramePipeline
+
+    recognizer = app.face_recognizer
+    detector = app.sleep_detector
+
+    # กรอบใบหน้า / รูปตาของเฟรมชุดหนึ่งคำนวณไว้ก่อน → แต่ละ stage วัดเฉพาะงานของตัวเอง
+    sample = frames[:min(len(frames), 10)]
+    boxes = [[clip_box(b, f.shape) for b in recognizer.recognize_faces(f)[0]] for f in sample]
+    eye_sets = [[eye for t, r, b, l in bx for eye in extract_eye_crops(f[t:b, l:r].copy())]
+                for f, bx in zip(sample, boxes)]
+
+    nxt = Cycle(frames)
+    nxt_sample = Cycle(list(zip(sample, boxes)))
+    nxt_eyes = Cycle(eye_sets)
+
+    def eye_crops_stage():
+        frame, bx = nxt_sample()
+        for t, r, b, l in bx:
+            extract_eye_crops(frame[t:b, l:r].copy())
+
+    cam = app.cameras.get("bench")
+    cam.reset()
+
+    def loop_body():
+        out = app._analyze_frame(cam, nxt())
+        cv2.imencode(".jpg", out[0] if isinstance(out, tuple) else out)
+
+    stages = {
+        "recognize_faces": lambda: recognizer.recognize_faces(nxt()),
+        "extract_eye_crops": eye_crops_stage,
+        "predict_from_array": lambda: [detector.predict_from_array(e, resize=True) for e in nxt_eyes()],
+        "predict_batch": lambda: detector.predict_batch(nxt_eyes(), resize=True),
+        "loop_body": loop_body,
+    }
+    result = {"stages": {}}
+    for name in STAGES:
+        result["stages"][name] = summarize(time_calls(stages[name], n=n_iter, warmup=2))
+    result["eyes_per_frame"] = float(np.mean([len(e) for e in eye_sets]))
+
+    # pipeline เต็มกับกล้องปลอม: อ่านคลิปเร็วที่สุด วนซ้ำ
+    cap = FileCapture(video)
+    cap.interval = 0.0
+    cam.reset()
+    pipeline = FramePipeline(cap, lambda frame: app._analyze_frame(cam, frame))
+    pipeline.start()
+    time.sleep(1.0)   # warm-up
+    start = pipeline.meters["inference"].count
+    time.sleep(pipeline_sec)
+    processed = pipeline.meters["inference"].count - start
+    pipeline.stop()
+    result["pipeline_fps"] = processed / pipeline_sec
+    result["rss_mb"] = rss_mb()
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+# ---------- report ----------
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(old_path, new):
+    """ พิมพ์ % เปลี่ยนแปลงของ p50/p95/fps เทียบกับไฟล์ผลเดิม (บวก = ช้าลง / fps ลดลง) """
+    with open(old_path) as f:
+        old = json.load(f)
+    old_rows = {(r["faces"], r["roster"]): r for r in old["results"]}
+    print(f"\nเทียบกับ {old_path} (commit {old['meta'].get('commit')})")
+    for r in new["results"]:
+        o = old_rows.get((r["faces"], r["roster"]))
+        if o is None:
+            continue
+        print(f"faces={r['faces']:<3} roster={r['roster']:<6} fps {o['pipeline_fps']:.2f} → {r['pipeline_fps']:.2f}")
+        for name in STAGES:
+            a, b = o["stages"].get(name), r["stages"].get(name)
+            if not a or not b or not a["p50"]:
+                continue
+            print(f"   {name:<20} p50 {(b['p50'] / a['p50'] - 1) * 100:+6.1f}%   "
+                  f"p95 {(b['p95'] / a['p95'] - 1) * 100:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offline end-to-end benchmark (fake camera)")
+    parser.add_argument("--video", help="คลิปห้องเรียนที่บันทึกไว้ ; ไม่ระบุ = fixture สังเคราะห์ตาม --faces")
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 5, 15, 30])
+    parser.add_argument("--roster", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--frames", type=int, default=90, help="จำนวนเฟรมของ fixture ที่ใช้")
+    parser.add_argument("--n", type=int, default=30, help="จำนวนครั้งที่วัดต่อ stage")
+    parser.add_argument("--pipeline-sec", type=float, default=5.0)
+    parser.add_argument("--backend", default="hog")
+    parser.add_argument("--out", help="ไฟล์ผล JSON ; ค่าเริ่มต้น benchmarks/results/e2e-<commit>.json")
+    parser.add_argument("--compare", help="ไฟล์ผลเดิมที่จะเทียบ")
+    args = parser.parse_args()
+
+    # main.py ใช้ path สัมพัทธ์ (static/, model/) และอ่าน env ตอน import
+    os.chdir(BACKEND_DIR)
+    os.environ["FACE_BACKEND"] = args.backend
+    os.environ.setdefault("SNAPSHOT_DIR", tempfile.mkdtemp(prefix="bench_snapshots_"))
+    import main as app
+
+    faces = load_faces(os.path.join(BACKEND_DIR, "static"))
+    rng = np.random.default_rng(0)
+    rows = []
+    face_counts = [None] if args.video else args.faces
+    for n in face_counts:
+        video = args.video or synthetic_fixture(faces, n, frames=args.frames)
+        frames = read_frames(video, args.frames)
+        if "bench" in app.cameras:
+            app.cameras.remove("bench")
+        app.cameras.register("bench", video, flip=False)
+        for roster in sorted(args.roster):
+            grow_roster(app.face_recognizer.index, roster, rng)
+            r = measure_config(app, video, frames, args.n, args.pipeline_sec)
+            r.update(faces=n if n is not None else "video", roster=len(app.face_recognizer.index))
+            rows.append(r)
+            print(f"\nfaces={r['faces']} roster={r['roster']} pipeline={r['pipeline_fps']:.2f} fps "
+                  f"eyes/frame={r['eyes_per_frame']:.1f} rss={r['rss_mb']:.0f} MB peak={r['peak_rss_mb']:.0f} MB")
+            for name in STAGES:
+                print_row(f"  {name}", r["stages"][name])
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "backend": args.backend,
+            "video": args.video,
+            "args": vars(args),
+        },
+        "results": rows,
+    }
+    out = args.out or os.path.join(RESULT_DIR, f"e2e-{commit}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 บันทึกผล → {out}")
+
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == "__main__":
+    main()
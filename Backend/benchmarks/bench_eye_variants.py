@@ -0,0 +1,134 @@
+# bench_eye_variants.py — ความแม่นยำ vs latency ของโมเดลตรวจตาแต่ละแบบ (keras / ไฟล์ .tflite จาก export_eye_model.py)
+#
+# รันจากโฟลเดอร์ Backend:
+#   python benchmarks/bench_eye_variants.py --data eye_crops/ --models model/Eye_Detection.keras model/*.tflite
+#
+# --data: รูปตาที่มี label แยกโฟลเดอร์ตามชื่อคลาส (Closed/ Open/) แบบเดียวกับชุดที่ใช้ train
+# แต่ละโมเดลรันใน process แยก (ไม่ให้ TensorFlow ของตัวหนึ่งไปนับรวม RSS / เวลาโหลดของอีกตัว) แล้ววัด:
+#   load      : เวลา import + โหลดโมเดล + warm-up, RSS หลังโหลด, import TensorFlow หรือไม่
+#   accuracy  : ทั้งชุด + recall ของ Closed (พลาดคนหลับแพงกว่าเตือนผิด) + ผลตรงกับโมเดลแรกกี่ %
+#   latency   : predict_from_array ต่อรูป และ predict_batch ต่อรูปที่ batch --batch
+# ผลรวมเขียนเป็น JSON (--out) ไว้เทียบ/แนบใน PR
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from _common import BACKEND_DIR, time_calls, summarize
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg')
+
+
+def load_labelled(folder, classes, limit=None):
+    """ → (รูป BGR, index ของ label) ตามลำดับชื่อไฟล์ """
+    import cv2
+    images, labels = [], []
+    for idx, name in enumerate(classes):
+        class_dir = os.path.join(folder, name)
+        if not os.path.isdir(class_dir):
+            raise SystemExit(f"ไม่มีโฟลเดอร์ {class_dir}")
+        files = sorted(f for f in os.listdir(class_dir) if f.lower().endswith(IMAGE_EXTS))[:limit]
+        for f in files:
+            img = cv2.imread(os.path.join(class_dir, f))
+            if img is not None:
+                images.append(img)
+                labels.append(idx)
+    if not images:
+        raise SystemExit(f"ไม่มีรูปใน {folder}")
+    return images, labels
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def measure(model_path, data, classes, batch, n, limit):
+    """ งานของ worker process: วัดโมเดลเดียว → dict """
+    backend = "tflite" if model_path.endswith(".tflite") else "keras"
+    t0 = time.perf_counter()
+    from sleep_detector import SleepDetector
+    detector = SleepDetector(model_path=model_path, backend=backend, data_cat=classes)
+    detector.predict_batch(load_labelled(data, classes, 1)[0])
+    load_sec = time.perf_counter() - t0
+    rss = rss_mb()
+
+    images, labels = load_labelled(data, classes, limit)
+    preds = []
+    for start in range(0, len(images), batch):
+        preds.extend(classes.index(label) for label, _ in detector.predict_batch(images[start:start + batch]))
+    closed = [p for p, y in zip(preds, labels) if y == 0]
+
+    single = summarize(time_calls(lambda: detector.predict_from_array(images[0]), n=n))
+    batched = summarize(time_calls(lambda: detector.predict_batch(images[:batch]), n=max(n // 4, 1)))
+    return {
+        "model": model_path,
+        "backend": backend,
+        "input": [detector.img_height, detector.img_width],
+        "size_mb": os.path.getsize(model_path) / 2 ** 20,
+        "load_sec": load_sec,
+        "rss_mb": rss,
+        "tensorflow_imported": "tensorflow" in sys.modules,
+        "accuracy": sum(p == y for p, y in zip(preds, labels)) / len(labels),
+        "closed_recall": sum(p == 0 for p in closed) / len(closed) if closed else None,
+        "single_ms": single,
+        "batch_ms_per_crop": {k: (v / min(batch, len(images)) if k != "n" else v) for k, v in batched.items()},
+        "preds": preds,
+    }
+
+
+def run_worker(model_path, args):
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", model_path, "--data", args.data,
+           "--batch", str(args.batch), "--n", str(args.n), "--classes", *args.classes]
+    if args.limit:
+        cmd += ["--limit", str(args.limit)]
+    out = subprocess.run(cmd, cwd=BACKEND_DIR, capture_output=True, text=True)
+    if out.returncode != 0:
+        print(f"❌ {model_path}: {out.stderr.strip().splitlines()[-1] if out.stderr.strip() else out.returncode}")
+        return None
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eye classifier variants: accuracy vs latency")
+    parser.add_argument("--data", required=True, help="โฟลเดอร์รูปตาที่มี label (Closed/ Open/)")
+    parser.add_argument("--models", nargs="+", default=["model/Eye_Detection.keras"],
+                        help="โมเดลแรกใช้เป็นตัวอ้างอิงของค่า agree")
+    parser.add_argument("--classes", nargs="+", default=["Closed", "Open"])
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--n", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=None, help="จำนวนรูปสูงสุดต่อคลาส")
+    parser.add_argument("--out", default=os.path.join(BACKEND_DIR, "benchmarks", "results", "eye-variants.json"))
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.data, args.classes, args.batch, args.n, args.limit)))
+        return
+
+    rows = [r for r in (run_worker(m, args) for m in args.models) if r is not None]
+    if not rows:
+        raise SystemExit("ไม่มีโมเดลที่วัดได้")
+    reference = rows[0]["preds"]
+    print(f"{'model':<44} {'in':>7} {'MB':>6} {'load s':>7} {'RSS MB':>7} {'TF':>3} "
+          f"{'acc':>6} {'closed':>6} {'agree':>6} {'1x p50':>7} {'batch/crop':>10}")
+    for r in rows:
+        r["agree"] = sum(a == b for a, b in zip(r["preds"], reference)) / len(reference)
+        closed = f"{r['closed_recall']:.3f}" if r["closed_recall"] is not None else "-"
+        print(f"{os.path.basename(r['model']):<44} {'x'.join(map(str, r['input'])):>7} {r['size_mb']:6.2f} "
+              f"{r['load_sec']:7.2f} {r['rss_mb']:7.0f} {'yes' if r['tensorflow_imported'] else 'no':>3} "
+              f"{r['accuracy']:6.3f} {closed:>6} {r['agree']:6.3f} {r['single_ms']['p50']:7.2f} "
+              f"{r['batch_ms_per_crop']['p50']:10.3f}")
+        del r["preds"]
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump({"data": args.data, "batch": args.batch, "results": rows}, f, indent=2)
+    print(f"📄 {args.out}")
+
+
+if __name__ == "__main__":
+    main()
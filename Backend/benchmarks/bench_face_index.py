@@ -0,0 +1,61 @@
+# bench_face_index.py — จับคู่ใบหน้า: ลูปเดิม (compare_faces + face_distance ต่อใบหน้า) vs FaceIndex.match
+#
+# รันจากโฟลเดอร์ Backend:  python benchmarks/bench_face_index.py --faces 30 --roster 10 100 1000 5000 20000
+
+import argparse
+
+import numpy as np
+import face_recognition
+
+from _common import time_calls, summarize, print_row
+from face_index import FaceIndex
+
+
+def loop_match(known_encodings, known_names, face_encodings, tolerance=0.6):
+    """ วิธีเดิมใน FaceRecognizer.recognize_faces (ก่อนมี FaceIndex) """
+    names = []
+    for face_encoding in face_encodings:
+        name = "Unknown"
+        matches = face_recognition.compare_faces(known_encodings, face_encoding, tolerance=tolerance)
+        if True in matches:
+            face_distances = face_recognition.face_distance(known_encodings, face_encoding)
+            best_match_index = np.argmin(face_distances)
+            if matches[best_match_index]:
+                name = known_names[best_match_index]
+        names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FaceIndex matching vs roster size")
+    parser.add_argument("--faces", type=int, default=30, help="จำนวนใบหน้าต่อเฟรม (M)")
+    parser.add_argument("--roster", type=int, nargs="+", default=[10, 100, 1000, 5000, 20000],
+                        help="จำนวนใบหน้าที่ลงทะเบียน (K)")
+    parser.add_argument("--n", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for k in args.roster:
+        # encoding ของ dlib มี norm ประมาณ 1 → สุ่มแบบเดียวกัน
+        known = rng.normal(size=(k, 128)).astype(np.float32)
+        known /= np.linalg.norm(known, axis=1, keepdims=True)
+        names = [f"student_{i}" for i in range(k)]
+        # ครึ่งหนึ่งเป็นคนที่รู้จัก (บวก noise เล็กน้อย) อีกครึ่งเป็นคนแปลกหน้า
+        picks = rng.integers(0, k, size=args.faces)
+        faces = known[picks] + rng.normal(scale=0.02, size=(args.faces, 128)).astype(np.float32)
+        faces[args.faces // 2:] = rng.normal(size=(args.faces - args.faces // 2, 128))
+
+        index = FaceIndex()
+        index.build(known, names)
+        known_list = list(known.astype(np.float64))
+
+        assert index.match(faces)[0] == loop_match(known_list, names, faces), "ผลไม่ตรงกับวิธีเดิม"
+
+        print_row(f"K={k:<6} loop  M={args.faces}",
+                  summarize(time_calls(lambda: loop_match(known_list, names, faces), n=max(args.n // 5, 1))))
+        print_row(f"K={k:<6} index M={args.faces}",
+                  summarize(time_calls(lambda: index.match(faces), n=args.n)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# bench_frame_analysis.py — ต้นทุนต่อเฟรม: ตรวจจับ/landmark แยกกัน (แบบเดิม) vs analyze_frame (landmark ครั้งเดียว)
+#
+# รันจากโฟลเดอร์ Backend:  python benchmarks/bench_frame_analysis.py --faces 1 5 15 30
+# เฟรมทดสอบสร้างจากการเรียงรูปใน static/ เป็นตาราง (ไม่ต้องใช้กล้อง)
+
+import argparse
+import math
+import os
+
+import cv2
+import numpy as np
+import face_recognition
+
+from _common import BACKEND_DIR, time_calls, summarize, print_row
+from face_recognizer import FaceRecognizer, IMAGE_EXTS
+from frame_analysis import clip_box, extract_eye_crops, eye_crops_from_landmarks
+
+
+def load_faces(folder, tile=200):
+    faces = []
+    for f in sorted(os.listdir(folder)):
+        if f.lower().endswith(IMAGE_EXTS):
+            img = cv2.imread(os.path.join(folder, f))
+            if img is not None:
+                faces.append(cv2.resize(img, (tile, tile)))
+    if not faces:
+        raise SystemExit(f"ไม่มีรูปใน {folder}")
+    return faces
+
+
+def make_frame(faces, n, tile=200):
+    """ เรียงรูปใบหน้า n รูปเป็นตาราง → เฟรม BGR """
+    cols = math.ceil(math.sqrt(n))
+    rows = math.ceil(n / cols)
+    frame = np.full((rows * tile, cols * tile, 3), 127, dtype=np.uint8)
+    for i in range(n):
+        r, c = divmod(i, cols)
+        frame[r * tile:(r + 1) * tile, c * tile:(c + 1) * tile] = faces[i % len(faces)]
+    return frame
+
+
+def separate_passes(recognizer, frame):
+    """ แบบเดิม: face_encodings (landmark ภายใน) แล้ว face_landmarks ซ้ำใน crop ของแต่ละใบหน้า """
+    small = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
+    rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+    locations = face_recognition.face_locations(rgb)
+    encodings = face_recognition.face_encodings(rgb, locations)
+    recognizer.index.match(encodings)
+    eyes = []
+    for box in locations:
+        t, r, b, l = clip_box(tuple(v * 2 for v in box), frame.shape)
+        eyes.append(extract_eye_crops(frame[t:b, l:r].copy()))
+    return eyes
+
+
+def single_pass(recognizer, frame):
+    """ แบบใหม่: ตรวจจับ + landmark ครั้งเดียว ใช้ทั้งระบุชื่อและ crop ตา """
+    _, _, landmarks, _ = recognizer.analyze_frame(frame)
+    return [eye_crops_from_landmarks(frame, lm) for lm in landmarks]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame analysis cost vs face count")
+    parser.add_argument("--folder", default=os.path.join(BACKEND_DIR, "static"))
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 5, 15, 30])
+    parser.add_argument("--n", type=int, default=10)
+    args = parser.parse_args()
+
+    # tracking=False → ตรวจจับ + ระบุตัวตนทุกเฟรม (วัดต้นทุนเต็มของหนึ่งเฟรม)
+    recognizer = FaceRecognizer(image_folder=args.folder, min_faces=0, tracking=False)
+    faces = load_faces(args.folder)
+
+    for n in args.faces:
+        frame = make_frame(faces, n)
+        old = summarize(time_calls(lambda: separate_passes(recognizer, frame), n=args.n, warmup=1))
+        new = summarize(time_calls(lambda: single_pass(recognizer, frame), n=args.n, warmup=1))
+        print_row(f"faces={n:<3} separate passes", old)
+        print_row(f"faces={n:<3} single pass", new)
+        print(f"{'':<32} saved {old['mean'] - new['mean']:8.3f} ms/frame ({(1 - new['mean'] / old['mean']) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# bench_metrics.py — ต้นทุนของ instrumentation ต่อเฟรม (metrics.py) เทียบกับเวลาเฟรมจริง
+#
+# รันจากโฟลเดอร์ Backend:  python benchmarks/bench_metrics.py --frame-ms 33 --threads 1 4
+#
+# ต่อเฟรมหนึ่งเฟรม pipeline บันทึก: capture/inference/encode + detect/eyes/annotate (6 observe)
+# + frames/faces/cnn (observe_frame) → วัดเวลาชุดนี้ ทั้งแบบ thread เดียวและหลาย thread แย่ง lock พร้อมกัน
+# (จำลองหลายกล้อง) แล้วเทียบเป็น % ของเวลาเฟรม ; render() วัดแยก (เกิดเฉพาะตอน scrape)
+
+import argparse
+import threading
+import time
+
+from _common import time_calls, summarize, print_row
+from metrics import Registry, PipelineMetrics
+
+STAGES = ("capture", "inference", "encode", "detect", "eyes", "annotate")
+
+
+def instrument_one_frame(cam_metrics):
+    for stage in STAGES:
+        cam_metrics.observe_stage(stage, 0.012)
+    cam_metrics.observe_frame(12, 3)
+
+
+def per_frame_us(pipeline_metrics, n_threads, frames):
+    """ หลาย thread (กล้อง) บันทึกพร้อมกัน → µs ต่อเฟรมต่อ thread """
+    results = []
+
+    def run(i):
+        cm = pipeline_metrics.for_camera(f"cam{i}")
+        t0 = time.perf_counter()
+        for _ in range(frames):
+            instrument_one_frame(cm)
+        results.append((time.perf_counter() - t0) / frames * 1e6)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return max(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="per-frame instrumentation overhead")
+    parser.add_argument("--frame-ms", type=float, default=33.0, help="เวลาเฟรมที่ใช้เทียบ (30 fps ≈ 33 ms)")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--frames", type=int, default=20000)
+    args = parser.parse_args()
+
+    registry = Registry()
+    pm = PipelineMetrics(registry)
+    cm = pm.for_camera("cam0")
+
+    print_row("histogram.observe", summarize([t * 1000.0 for t in
+                                              time_calls(lambda: cm.observe_stage("detect", 0.02), n=5000)]))
+    print_row("one frame (6 stages + frame)", summarize([t * 1000.0 for t in
+                                                         time_calls(lambda: instrument_one_frame(cm), n=5000)]))
+    print("  (หน่วยสองแถวบน: µs)")
+
+    for n in args.threads:
+        us = per_frame_us(pm, n, args.frames)
+        print(f"threads={n:<3} {us:7.2f} µs/frame  = {us / (args.frame_ms * 1000.0) * 100:.4f}% ของเฟรม {args.frame_ms:.0f} ms")
+
+    print_row("render() /metrics (ms)", summarize(time_calls(registry.render, n=200)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# bench_motion_gate.py — เทียบ FaceRecognizer.analyze_frame แบบมี / ไม่มี motion gate บนคลิปจริง
+#
+# รันจากโฟลเดอร์ Backend:
+#   python benchmarks/bench_motion_gate.py --video lecture.mp4 --frames 600 --rois "0,0.3,1,1"
+#
+# วัดต่อโหมด: latency ต่อเฟรม, จำนวน keyframe ที่ตรวจจับจริง, จำนวนใบหน้าเฉลี่ยต่อเฟรม
+# และของ gate: ต้นทุน check() ต่อครั้ง, สัดส่วนเฟรมที่ข้ามการตรวจจับ, สัดส่วนพิกเซลที่ไม่ต้องสแกน
+# จำนวนใบหน้าที่ต่างกันมากระหว่างสองโหมด = gate ไม่ไวพอ (พลาดคนที่ขยับ) → ลด --threshold
+
+import argparse
+import time
+
+import cv2
+
+from _common import summarize, print_row, time_calls
+from face_recognizer import FaceRecognizer
+from face_index import FaceIndex
+from motion_gate import MotionGate, parse_rois
+
+
+def load_video(path, limit):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"อ่านเฟรมจาก {path} ไม่ได้")
+    return frames
+
+
+def run(frames, gate, backend):
+    recognizer = FaceRecognizer(index=FaceIndex(), preload=False, cache_dir=None, backend=backend,
+                                motion_gate=gate)
+    latencies, faces = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        locations, _, _, _ = recognizer.analyze_frame(frame)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        faces.append(len(locations))
+    return latencies, faces, recognizer.tracker.stats["keyframes"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="motion gate: CPU saved vs faces kept")
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--rois", default=None, help='"x0,y0,x1,y1;..." สัดส่วนของเฟรม')
+    parser.add_argument("--backend", default="hog")
+    parser.add_argument("--threshold", type=int, default=18, help="diff_threshold ของ gate")
+    args = parser.parse_args()
+
+    frames = load_video(args.video, args.frames)
+    rois = parse_rois(args.rois)
+    print(f"{len(frames)} เฟรม {frames[0].shape[1]}x{frames[0].shape[0]} rois={rois}")
+
+    probe = MotionGate(rois, diff_threshold=args.threshold)
+    probe.check(frames[0])
+    print_row("gate.check()", summarize(time_calls(lambda: probe.check(frames[1 % len(frames)]), n=300)))
+
+    base_ms, base_faces, base_keyframes = run(frames, None, args.backend)
+    gate = MotionGate(rois, diff_threshold=args.threshold)
+    gated_ms, gated_faces, gated_keyframes = run(frames, gate, args.backend)
+
+    print_row("analyze_frame (no gate)", summarize(base_ms))
+    print_row("analyze_frame (gate)", summarize(gated_ms))
+    print(f"keyframes: {base_keyframes} → {gated_keyframes}")
+    print(f"faces/frame: {sum(base_faces) / len(frames):.2f} → {sum(gated_faces) / len(frames):.2f}  "
+          f"(เฟรมที่จำนวนต่างกัน {sum(a != b for a, b in zip(base_faces, gated_faces))})")
+    snap = gate.snapshot()
+    print(f"skipped frames {snap['frames_skipped_ratio']:.1%}  skipped pixels {snap['pixels_skipped_ratio']:.1%}  "
+          f"(full={snap['full']} region={snap['region']} skipped={snap['skipped']})")
+    saved = 1.0 - sum(gated_ms) / sum(base_ms) if sum(base_ms) else 0.0
+    print(f"เวลาวิเคราะห์รวมลดลง {saved:.1%}")
+
+
+if __name__ == "__main__":
+    main()
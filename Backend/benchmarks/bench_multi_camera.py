@@ -0,0 +1,76 @@
+# bench_multi_camera.py — throughput เมื่อจำนวนกล้องเพิ่มขึ้น (ทุกกล้องใช้ inference pool เดียวกัน)
+#
+# รันจากโฟลเดอร์ Backend:
+#   python benchmarks/bench_multi_camera.py --video classroom.mp4 --cameras 1 2 4 8 --duration 20
+#
+# ทุกกล้องอ่านไฟล์วิดีโอเดียวกัน (FileCapture วนซ้ำ) ผ่าน FramePipeline + analyze_faces แบบเดียวกับเซิร์ฟเวอร์
+# --unpaced: อ่านเฟรมเร็วที่สุดแทนความเร็วจริงของคลิป → วัดขีดจำกัดของเครื่อง
+
+import argparse
+import time
+
+from _common import BACKEND_DIR
+from camera_registry import CameraRegistry, open_capture
+from face_recognizer import FaceRecognizer
+from frame_analysis import analyze_faces
+from inference_pool import BatchingInferencePool
+from sleep_detector import SleepDetector
+from stream_pipeline import FramePipeline
+
+
+def run(registry, pool, video, n_cameras, duration, unpaced):
+    cams = [registry.register(f"bench-{n_cameras}-{i}", video) for i in range(n_cameras)]
+    for cam in cams:
+        cap = open_capture(cam.source)
+        if unpaced:
+            cap.interval = 0.0
+
+        def analyze(frame, cam=cam):
+            analyze_faces(cam.recognizer, pool, frame, estimator=cam.eye_state)
+            return frame
+
+        cam.pipeline = FramePipeline(cap, analyze)
+    before = pool.snapshot()
+    for cam in cams:
+        cam.pipeline.start()
+    time.sleep(duration)
+    counts = [cam.pipeline.meters["inference"].count for cam in cams]
+    after = pool.snapshot()
+    for cam in cams:
+        cam.pipeline.stop()
+        registry.remove(cam.id)
+
+    batches = after["batches"] - before["batches"]
+    crops = after["crops"] - before["crops"]
+    return {
+        "cameras": n_cameras,
+        "total_fps": sum(counts) / duration,
+        "per_camera_fps": sum(counts) / duration / n_cameras,
+        "avg_batch": crops / batches if batches else 0.0,
+        "avg_requests_per_batch": (after["requests"] - before["requests"]) / batches if batches else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="multi-camera throughput with a shared inference pool")
+    parser.add_argument("--video", required=True, help="ไฟล์วิดีโอที่ใช้แทนกล้อง")
+    parser.add_argument("--faces", default="static", help="โฟลเดอร์รูปใบหน้าที่รู้จัก")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--unpaced", action="store_true")
+    args = parser.parse_args()
+
+    owner = FaceRecognizer(image_folder=args.faces, min_faces=0, tracking=False)
+    pool = BatchingInferencePool(SleepDetector(inference="compiled"), max_wait_ms=args.max_wait_ms)
+    registry = CameraRegistry(owner.index)
+
+    print(f"{'cameras':>7} {'total fps':>10} {'fps/camera':>11} {'crops/batch':>12} {'cams/batch':>11}")
+    for n in args.cameras:
+        r = run(registry, pool, args.video, n, args.duration, args.unpaced)
+        print(f"{r['cameras']:>7} {r['total_fps']:>10.2f} {r['per_camera_fps']:>11.2f} "
+              f"{r['avg_batch']:>12.2f} {r['avg_requests_per_batch']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# bench_preprocess.py — เทียบ preprocess แบบเดิม (PIL) กับ preprocess_batch (cv2/NumPy + buffer)
+#
+# รันจากโฟลเดอร์ Backend:  python benchmarks/bench_preprocess.py --check
+#   --check : ตรวจว่าผลสองทางใกล้กันภายใน tolerance (exit code 1 ถ้าไม่ผ่าน)
+
+import argparse
+import sys
+
+import cv2
+import numpy as np
+import tensorflow as tf
+
+from _common import time_calls, summarize, print_row, random_crops
+from sleep_detector import SleepDetector
+
+
+def pil_batch(detector, crops):
+    return tf.concat([detector.preprocess_image_from_array(c) for c in crops], axis=0).numpy()
+
+
+def check(detector, crops, pixel_tol, prob_tol):
+    """ ค่า pixel เฉลี่ยต่างกันไม่เกิน pixel_tol (สเกล 0-255) และ softmax ต่างกันไม่เกิน prob_tol """
+    ref = pil_batch(detector, crops)
+    fast = detector.preprocess_batch(crops).copy()
+    pixel_diff = np.abs(ref - fast).mean(axis=(1, 2, 3))
+
+    ref_prob = tf.nn.softmax(detector._forward(ref), axis=-1).numpy()
+    fast_prob = tf.nn.softmax(detector._forward(fast), axis=-1).numpy()
+    prob_diff = np.abs(ref_prob - fast_prob).max(axis=1)
+
+    print(f"pixel mean abs diff: max={pixel_diff.max():.3f} (tol {pixel_tol})")
+    print(f"softmax abs diff   : max={prob_diff.max():.4f} (tol {prob_tol})")
+    print(f"label agreement    : {(ref_prob.argmax(1) == fast_prob.argmax(1)).mean() * 100:.1f}%")
+    return pixel_diff.max() <= pixel_tol and prob_diff.max() <= prob_tol
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SleepDetector preprocessing: PIL vs cv2 buffer")
+    parser.add_argument("--model", default="model/Eye_Detection.keras")
+    parser.add_argument("--n", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=30)
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--pixel-tol", type=float, default=3.0)
+    parser.add_argument("--prob-tol", type=float, default=0.05)
+    args = parser.parse_args()
+
+    detector = SleepDetector(model_path=args.model)
+    crops = random_crops(args.batch)
+    # crop ที่ใหญ่กว่า 180x180 ด้วย (กรณี fallback ใช้ทั้งใบหน้า)
+    crops += random_crops(4, min_size=200, max_size=320, seed=1)
+
+    print_row(f"pil preprocess[{len(crops)}]", summarize(time_calls(lambda: pil_batch(detector, crops), n=args.n)))
+    print_row(f"cv2 preprocess_batch[{len(crops)}]",
+              summarize(time_calls(lambda: detector.preprocess_batch(crops), n=args.n)))
+
+    if args.check:
+        # สุ่ม noise ไม่เหมือนรูปตาจริง → ใช้ภาพที่ smooth กว่าเพื่อให้ความต่างของ interpolation สมจริง
+        smooth = [cv2.GaussianBlur(c, (5, 5), 0) for c in crops]
+        ok = check(detector, smooth, args.pixel_tol, args.prob_tol)
+        print("✅ ผ่าน" if ok else "❌ ไม่ผ่าน")
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+# bench_sleep_detector.py — latency ต่อการเรียก SleepDetector (predict vs compiled)
+#
+# รันจากโฟลเดอร์ Backend:  python benchmarks/bench_sleep_detector.py --n 200
+
+import argparse
+
+from _common import time_calls, summarize, print_row, random_crops
+from sleep_detector import SleepDetector
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SleepDetector per-call latency")
+    parser.add_argument("--model", default="model/Eye_Detection.keras")
+    parser.add_argument("--n", type=int, default=200, help="จำนวนครั้งที่จับเวลา")
+    parser.add_argument("--batch", type=int, default=10, help="ขนาด batch สำหรับ predict_batch")
+    args = parser.parse_args()
+
+    crops = random_crops(max(args.batch, 1))
+    for mode in ("predict", "compiled"):
+        detector = SleepDetector(model_path=args.model, inference=mode)
+        single = time_calls(lambda: detector.predict_from_array(crops[0]), n=args.n)
+        batch = time_calls(lambda: detector.predict_batch(crops[:args.batch]), n=max(args.n // 4, 1))
+        print_row(f"{mode} predict_from_array", summarize(single))
+        print_row(f"{mode} predict_batch[{args.batch}]", summarize(batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# load_test_db.py — latency ของ route ที่อ่าน MongoDB ภายใต้ request พร้อมกันหลายตัว ขณะมีคนดูสตรีมอยู่
+#
+# 1) เปิด mongod + เซิร์ฟเวอร์ (MONGO_DB ชี้ไปฐานทดสอบได้):
+#      MONGO_DB=sleep_loadtest CAMERA_SOURCE=classroom.mp4 uvicorn main:app --port 8000
+# 2) รันจากโฟลเดอร์ Backend:
+#      python benchmarks/load_test_db.py --db sleep_loadtest --seed-users 20000 --concurrency 64 --duration 30 --stream
+#
+# --seed-users: ใส่นักเรียนปลอม (loadtest_000000 ...) ตรงเข้า mongod ก่อนยิง (+ รายงานพฤติกรรมคนละ --reports-per-user)
+# --stream: ถือ /video_feed ไว้หนึ่งเส้นระหว่างยิง → fps และช่วงห่างระหว่างเฟรมที่นานที่สุด
+#           (event loop ถูก query บล็อก = เฟรมค้างเป็นช่วง ๆ → max gap พุ่ง)
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime
+
+import httpx
+from pymongo import MongoClient
+
+from _common import summarize, print_row
+
+PREFIX = "loadtest_"
+
+
+def seed(mongo_uri, db_name, n_users, reports_per_user):
+    db = MongoClient(mongo_uri)[db_name]
+    db["users"].delete_many({"username": {"$regex": f"^{PREFIX}"}})
+    db["student_behavior_report"].delete_many({"student_id": {"$regex": f"^{PREFIX}"}})
+    users = []
+    reports = []
+    for i in range(n_users):
+        username = f"{PREFIX}{i:06d}"
+        users.append({"username": username, "username_lower": username, "email": f"{username}@example.com",
+                      "password": "secret", "profileImage": "", "role": "student"})
+        for _ in range(reports_per_user):
+            reports.append({"student_id": username, "penalty": random.randint(1, 10),
+                            "created_at": datetime.now(), "status": "active"})
+    for coll, docs in ((db["users"], users), (db["student_behavior_report"], reports)):
+        for start in range(0, len(docs), 5000):
+            coll.insert_many(docs[start:start + 5000], ordered=False)
+    print(f"🌱 seed: users={len(users)} reports={len(reports)}")
+
+
+def make_requests(n_users):
+    """ → list ของ (ชื่อ, ฟังก์ชันสร้าง request) สุ่มผู้ใช้ทุกครั้ง """
+    def user():
+        return f"{PREFIX}{random.randrange(max(n_users, 1)):06d}"
+
+    return [
+        ("GET /search-students", lambda c: c.get("/search-students",
+                                                 params={"name": user()[:len(PREFIX) + random.randint(2, 5)]})),
+        ("GET /student/{u}", lambda c: c.get(f"/student/{user()}")),
+        ("GET /behavior-reports/student", lambda c: c.get(f"/behavior-reports/student/{user()}")),
+        ("POST /login", lambda c: c.post("/login", json={"username": user(), "password": "secret"})),
+    ]
+
+
+async def worker(client, requests, deadline, samples, errors):
+    while time.perf_counter() < deadline:
+        name, make = random.choice(requests)
+        t0 = time.perf_counter()
+        try:
+            r = await make(client)
+            if r.status_code >= 500:
+                errors[name] = errors.get(name, 0) + 1
+                continue
+        except httpx.HTTPError:
+            errors[name] = errors.get(name, 0) + 1
+            continue
+        samples.setdefault(name, []).append((time.perf_counter() - t0) * 1000.0)
+
+
+async def watch_stream(client, deadline, result):
+    """ นับเฟรมจาก /video_feed + ช่วงห่างระหว่างเฟรมที่นานที่สุด """
+    frames, max_gap, last = 0, 0.0, None
+    async with client.stream("GET", "/video_feed", timeout=None) as r:
+        async for chunk in r.aiter_bytes():
+            n = chunk.count(b"--frame")
+            if n:
+                now = time.perf_counter()
+                if last is not None:
+                    max_gap = max(max_gap, now - last)
+                last = now
+                frames += n
+            if time.perf_counter() >= deadline:
+                break
+    result.update(frames=frames, max_gap_ms=max_gap * 1000.0)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 2, max_keepalive_connections=args.concurrency + 2)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30.0) as client:
+        requests = make_requests(args.seed_users or args.users)
+        stream = {}
+        stream_task = None
+        if args.stream:
+            await client.post("/start_stream")
+            stream_task = asyncio.create_task(watch_stream(client, time.perf_counter() + args.duration, stream))
+            await asyncio.sleep(2.0)   # ให้กล้องเปิด + เฟรมแรกออกก่อน
+        samples, errors = {}, {}
+        t0 = time.perf_counter()
+        deadline = t0 + args.duration
+        await asyncio.gather(*(worker(client, requests, deadline, samples, errors)
+                               for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - t0
+        if stream_task is not None:
+            await stream_task
+            await client.post("/stop_stream")
+
+    total = sum(len(v) for v in samples.values())
+    print(f"\nconcurrency={args.concurrency} duration={elapsed:.1f}s requests={total} ({total / elapsed:.0f} req/s)")
+    for name, values in sorted(samples.items()):
+        print_row(name, summarize(values))
+    print_row("ALL", summarize([v for values in samples.values() for v in values]))
+    if errors:
+        print(f"errors: {errors}")
+    if stream:
+        # เวลาที่ stream ถูกดูจริง ≈ duration - 2 วินาทีที่รอเฟรมแรก
+        print(f"stream: {stream['frames'] / max(args.duration - 2.0, 1e-6):.1f} fps, "
+              f"max gap {stream['max_gap_ms']:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mongo-backed route latency under concurrent load")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="sleep_loadtest", help="ฐานที่เซิร์ฟเวอร์ใช้ (MONGO_DB)")
+    parser.add_argument("--seed-users", type=int, default=0, help="0 = ไม่ seed (ใช้ข้อมูลที่มีอยู่)")
+    parser.add_argument("--users", type=int, default=1000, help="จำนวนผู้ใช้ปลอมที่มีอยู่แล้ว (เมื่อไม่ seed)")
+    parser.add_argument("--reports-per-user", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--stream", action="store_true", help="ดู /video_feed ไปพร้อมกัน")
+    args = parser.parse_args()
+
+    if args.seed_users:
+        seed(args.mongo_uri, args.db, args.seed_users, args.reports_per_user)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
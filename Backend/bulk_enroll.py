@@ -0,0 +1,65 @@
+# bulk_enroll.py — ลงทะเบียนใบหน้าทั้งโฟลเดอร์ด้วย process pool (ใช้ตอนรับนักเรียนใหม่ทั้งห้อง)
+#
+#   python bulk_enroll.py static --workers 4
+#   python bulk_enroll.py static --timing 1 2 4 0      (0 = ทุกคอร์) → วัดเวลาเข้ารหัสทั้งโฟลเดอร์ต่อจำนวน worker
+#
+# จำนวน worker ที่เหมาะขึ้นกับคอร์ / ขนาดรูป / จำนวนรูปของแต่ละเครื่อง → เลือก --workers จากผล --timing
+# บนเครื่องและรายชื่อจริง (repo ไม่มีตัวเลขอ้างอิงให้)
+
+import argparse
+import os
+import time
+
+from face_recognizer import FaceRecognizer, IMAGE_EXTS, encode_images_parallel
+
+
+def list_images(folder):
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTS))
+
+
+def print_progress(event):
+    line = f"[{event['done']}/{event['total']}] {event['status']:<8} {event['path']}"
+    if event["error"]:
+        line += f"  ({event['error']})"
+    print(line, flush=True)
+
+
+def run_timing(paths, worker_counts):
+    """ เวลาเข้ารหัสทั้งโฟลเดอร์ (ไม่ใช้ cache) ต่อจำนวน worker """
+    print(f"⏱️ เข้ารหัส {len(paths)} รูป")
+    baseline = None
+    for workers in worker_counts:
+        n = workers or os.cpu_count()
+        t0 = time.perf_counter()
+        for _ in encode_images_parallel(paths, workers=n):
+            pass
+        elapsed = time.perf_counter() - t0
+        baseline = baseline or elapsed
+        print(f"workers={n:<3} {elapsed:8.2f} s  {len(paths) / elapsed:7.2f} img/s  speedup x{baseline / elapsed:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk face enrollment with a process pool")
+    parser.add_argument("folder", help="โฟลเดอร์รูป (ชื่อไฟล์ = ชื่อนักเรียน)")
+    parser.add_argument("--workers", type=int, default=None, help="จำนวน process (ค่าเริ่มต้น = ทุกคอร์)")
+    parser.add_argument("--cache-dir", default=".face_cache")
+    parser.add_argument("--timing", type=int, nargs="+", metavar="N",
+                        help="วัดเวลาที่จำนวน worker ต่างๆ แทนการลงทะเบียน (0 = ทุกคอร์)")
+    args = parser.parse_args()
+
+    paths = list_images(args.folder)
+    if args.timing:
+        run_timing(paths, args.timing)
+        return
+
+    recognizer = FaceRecognizer(image_folder=args.folder, cache_dir=args.cache_dir, preload=False)
+    report = recognizer.bulk_enroll(paths, workers=args.workers, on_progress=print_progress)
+    print(f"✅ ลงทะเบียนใหม่ {len(report['enrolled'])}  ♻️ จาก cache {len(report['cached'])}  "
+          f"⚠️ ไม่เจอใบหน้า {len(report['no_face'])}  ❌ ผิดพลาด {len(report['failed'])}  "
+          f"({report['elapsed_sec']} s, workers={report['workers']})")
+    for failure in report["failed"]:
+        print(f"❌ {failure['path']}: {failure['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# camera_registry.py — หลายกล้อง (หลายห้องเรียน) ในเซิร์ฟเวอร์เดียว
+#
+# กล้องแต่ละตัวมี id และสถานะของตัวเองทั้งหมด: FaceRecognizer (tracker / backend ของกล้องนั้น),
+# EyeStateEstimator, ตัวนับเวลาหลับ, episode การหลับ (sleep_events), latest_status และ FramePipeline
+# motion_gate ของกล้อง: ไม่ตรวจจับใบหน้าเมื่อฉากนิ่ง / ตรวจเฉพาะบริเวณที่เปลี่ยนภายใน ROI ที่นั่ง
+# สิ่งที่ใช้ร่วมกัน: ดัชนีใบหน้า (ลงทะเบียนครั้งเดียวเห็นทุกกล้อง) และ inference pool ของตัวตรวจตา
+#
+# source: "0", "1" → หมายเลขอุปกรณ์ ; rtsp://... / http://... → สตรีมเครือข่าย ; อย่างอื่น → ไฟล์วิดีโอ
+# ไฟล์วิดีโอถูกอ่านตามความเร็วจริงของคลิปและวนซ้ำเมื่อจบ → ใช้แทนกล้องจริงตอนทดสอบได้
+# ไฟล์ที่ลงทะเบียนผ่าน API ต้องอยู่ใน recordings_dir (resolve_file_source) ; CAMERA_SOURCE ใน env ไม่ถูกจำกัด
+
+import os
+import threading
+import time
+
+import cv2
+
+from eye_state import EyeStateEstimator
+from face_recognizer import FaceRecognizer
+from motion_gate import MotionGate
+from sleep_events import SleepEpisodes
+
+
+def parse_source(source):
+    """ "0" → 0 (หมายเลขอุปกรณ์) ; อย่างอื่นคืนตามเดิม """
+    if isinstance(source, int):
+        return source
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+
+def is_file_source(source):
+    return isinstance(source, str) and "://" not in source
+
+
+def resolve_file_source(path, root):
+    """ path ไฟล์วิดีโอ (สัมพัทธ์กับ root) → realpath ; ValueError ถ้าอยู่นอก root หรือไม่มีไฟล์ """
+    root = os.path.realpath(root)
+    target = os.path.realpath(os.path.join(root, path))
+    if not target.startswith(root + os.sep):
+        raise ValueError("Video file sources must be inside the recordings folder")
+    if not os.path.isfile(target):
+        raise ValueError(f"Video file not found: {path}")
+    return target
+
+
+class FileCapture:
+    """ ไฟล์วิดีโอที่ทำตัวเหมือนกล้อง: read() ตาม fps ของคลิป และย้อนกลับต้นไฟล์เมื่อจบ """
+
+    def __init__(self, path, loop=True):
+        self.cap = cv2.VideoCapture(path)
+        self.loop = loop
+        self.interval = 1.0 / (self.cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        self._next = time.perf_counter()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def read(self):
+        delay = self._next - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next + self.interval, time.perf_counter())
+        ok, frame = self.cap.read()
+        if not ok and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read()
+        return ok, frame
+
+    def release(self):
+        self.cap.release()
+
+
+def open_capture(source, width=640, height=480):
+    """ เปิดแหล่งภาพตาม source → object ที่มี read()/release() ; ValueError ถ้าเปิดไม่ได้ """
+    source = parse_source(source)
+    cap = FileCapture(source) if is_file_source(source) else cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open camera source: {source}")
+    if isinstance(source, int):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    return cap
+
+
+class Camera:
+    """ สถานะของกล้องหนึ่งตัว (เดิมคือ global ใน main.py) """
+
+    def __init__(self, camera_id, source, index, backend="hog", flip=None, bus=None, rois=None, motion_gate=True):
+        self.id = camera_id
+        self.source = parse_source(source)
+        # กลับภาพซ้าย-ขวาเฉพาะกล้องหน้า (อุปกรณ์) เหมือนเดิม ; ไฟล์ / RTSP ไม่กลับ
+        self.flip = isinstance(self.source, int) if flip is None else flip
+        # rois: [(x0, y0, x1, y1)] สัดส่วนของเฟรม (หลัง flip) ; motion_gate=False → ตรวจจับทุก keyframe เหมือนเดิม
+        gate = MotionGate(rois) if motion_gate else None
+        self.recognizer = FaceRecognizer(index=index, preload=False, cache_dir=None, backend=backend,
+                                         motion_gate=gate)
+        self.eye_state = EyeStateEstimator()
+        self.eye_batch_inference = True
+        self.is_streaming = False
+        self.sleep_timers = {}
+        self.episodes = SleepEpisodes(camera_id, bus)   # ใครกำลังหลับ (ครั้งละหนึ่ง episode ต่อใบหน้า)
+        self.latest_snapshot = None
+        self.latest_status = {
+            "label": None,
+            "confidence": None,
+            "faces": [],
+            "per_eye": [],
+            "timestamp": None,
+            "snapshot": None,
+        }
+        self.pipeline = None
+        # sleep_timers / eye_state / tracker / motion gate: _analyze_frame (inference thread) ถือ lock นี้ทั้งเฟรม
+        self.state_lock = threading.Lock()
+        self.profiler = None   # metrics.SamplingProfiler ระหว่าง POST /profile/{id}
+
+    def reset(self):
+        """
+        เริ่มสตรีมใหม่: ล้างตัวนับเวลาหลับ + สถานะตา ; episode ที่ค้างอยู่ถูกปิด (reason="stopped")
+        รอให้เฟรมที่กำลังวิเคราะห์อยู่เสร็จก่อน (state_lock) → pipeline ไม่เห็นสถานะที่ล้างไปครึ่งเดียว
+        """
+        with self.state_lock:
+            self.sleep_timers = {}
+            self.episodes.end_all(time.time())
+            self.latest_snapshot = None
+            self.eye_state.reset()
+            if self.recognizer.motion_gate is not None:
+                self.recognizer.motion_gate.reset()
+            if self.recognizer.tracker is not None:
+                self.recognizer.tracker.reset()
+
+    def info(self):
+        return {
+            "id": self.id,
+            "source": self.source,
+            "is_streaming": self.is_streaming,
+            "running": self.pipeline is not None and self.pipeline.is_running,
+            "viewers": self.pipeline.broadcaster.subscribers if self.pipeline is not None else 0,
+            "backend": self.recognizer.backend.name,
+            "motion": self.recognizer.motion_gate.snapshot() if self.recognizer.motion_gate is not None else None,
+        }
+
+
+class CameraRegistry:
+    """ กล้องทั้งหมดตาม id (thread-safe) """
+
+    def __init__(self, index, backend="hog", bus=None, motion_gate=True):
+        self.index = index
+        self.backend = backend
+        self.bus = bus
+        self.motion_gate = motion_gate
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    def register(self, camera_id, source, backend=None, flip=None, rois=None, motion_gate=None):
+        """ เพิ่มกล้อง → Camera ; ValueError ถ้า id ซ้ำ ; motion_gate=None → ค่าของ registry """
+        with self._lock:
+            if camera_id in self._cameras:
+                raise ValueError(f"Camera already registered: {camera_id}")
+            camera = Camera(camera_id, source, self.index, backend or self.backend, flip, self.bus, rois,
+                            self.motion_gate if motion_gate is None else motion_gate)
+            self._cameras[camera_id] = camera
+            return camera
+
+    def get(self, camera_id):
+        """ → Camera ; KeyError ถ้าไม่มี """
+        with self._lock:
+            return self._cameras[camera_id]
+
+    def remove(self, camera_id):
+        with self._lock:
+            return self._cameras.pop(camera_id)
+
+    def all(self):
+        with self._lock:
+            return list(self._cameras.values())
+
+    def __contains__(self, camera_id):
+        with self._lock:
+            return camera_id in self._cameras
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cameras)
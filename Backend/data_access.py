@@ -0,0 +1,148 @@
+# data_access.py — เข้าถึง MongoDB จาก route แบบ async โดยไม่บล็อก event loop (ซึ่งขับสตรีม MJPEG / SSE ด้วย)
+#
+# ใช้ pymongo ตัวเดิม แต่ทุกคำสั่งรันใน thread pool ของตัวเอง (ไม่แย่ง default executor ที่ใช้เปิดกล้อง /
+# ลงทะเบียนใบหน้า) ; จำนวน thread = maxPoolSize ของ MongoClient → thread ไม่ต้องรอคิว connection
+#
+# index ถูกสร้างตอน startup (ensure_indexes) :
+#   users   : username (unique), email (unique), (role, username_lower)  ← ค้นหานักเรียนด้วย prefix
+#   reports : (student_id, created_at)
+# username_lower = username ตัวพิมพ์เล็ก เก็บคู่กันทุกครั้งที่เขียน → regex แบบ "^prefix" ใช้ index ได้
+# (regex ไม่ยึดต้น + ไม่สนตัวพิมพ์ ต้องสแกนผู้ใช้ทุกคน)
+
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+
+class Database:
+    """
+    Args:
+        uri / name: MongoDB
+        max_pool_size: connection สูงสุด (= จำนวน thread ที่รันคำสั่งพร้อมกัน)
+        min_pool_size: connection ที่เปิดค้างไว้ ไม่ต้อง handshake ใหม่ตอนโหลดขึ้น
+        timeout_ms: server selection / connect timeout ; mongod ล่ม → route ตอบ error แทนค้างนาน
+    """
+
+    def __init__(self, uri="mongodb://localhost:27017/", name="Project_sleep_classroom",
+                 max_pool_size=32, min_pool_size=4, timeout_ms=5000):
+        self.client = MongoClient(uri, maxPoolSize=max_pool_size, minPoolSize=min_pool_size,
+                                  serverSelectionTimeoutMS=timeout_ms, connectTimeoutMS=timeout_ms)
+        self.db = self.client[name]
+        self._executor = ThreadPoolExecutor(max_workers=max_pool_size, thread_name_prefix="mongo")
+
+    def __getitem__(self, name):
+        return self.db[name]
+
+    async def run(self, fn, *args, **kwargs):
+        """ เรียกฟังก์ชัน pymongo (sync) ใน thread pool ของ DB → ผลลัพธ์ """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.client.close()
+
+
+def _id_query(doc_id):
+    """ id ของเอกสาร: ObjectId (24 hex) หรือ string เดิม (รายงานเก่าบางส่วนใช้ string) """
+    return {"_id": {"$in": [ObjectId(doc_id), doc_id]}} if ObjectId.is_valid(doc_id) else {"_id": doc_id}
+
+
+class UserStore:
+    def __init__(self, database, collection="users"):
+        self.database = database
+        self.collection = database[collection]
+
+    def ensure_indexes(self):
+        # ชื่อผู้ใช้เก่าที่ยังไม่มี username_lower → เติมก่อนสร้าง index
+        self.collection.update_many({"username_lower": {"$exists": False}},
+                                    [{"$set": {"username_lower": {"$toLower": "$username"}}}])
+        self.collection.create_indexes([
+            IndexModel([("role", ASCENDING), ("username_lower", ASCENDING)]),
+        ])
+        # unique: ข้อมูลเดิมอาจมีซ้ำอยู่แล้ว → สร้างไม่ได้ก็ยังทำงานต่อ (แต่ signup จะไม่กันชื่อซ้ำจนกว่าจะล้างข้อมูลซ้ำ)
+        for field in ("username", "email"):
+            try:
+                self.collection.create_index([(field, ASCENDING)], unique=True)
+            except OperationFailure as e:
+                print(f"⚠️ สร้าง unique index {field} ไม่สำเร็จ (มีข้อมูลซ้ำ?): {e}")
+
+    @staticmethod
+    def _with_lower(user):
+        return dict(user, username_lower=user["username"].lower())
+
+    async def create(self, user):
+        """ → False ถ้า username / email ซ้ำ (unique index ตัดสินในคำสั่งเดียว) """
+        try:
+            await self.database.run(self.collection.insert_one, self._with_lower(user))
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def authenticate(self, username, password):
+        return await self.database.run(self.collection.find_one, {"username": username, "password": password})
+
+    async def all(self):
+        return await self.database.run(lambda: list(self.collection.find()))
+
+    async def search_students(self, prefix, limit=50):
+        """ นักเรียนที่ชื่อขึ้นต้นด้วย prefix (ไม่สนตัวพิมพ์) เรียงตามชื่อ """
+        query = {"role": "student"}
+        if prefix:
+            query["username_lower"] = {"$regex": "^" + re.escape(prefix.lower())}
+        return await self.database.run(
+            lambda: list(self.collection.find(query).sort("username_lower", ASCENDING).limit(limit)))
+
+    async def get_student(self, username):
+        return await self.database.run(self.collection.find_one, {"username": username, "role": "student"})
+
+    async def update(self, user_id, user):
+        """ → จำนวนที่ match ; DuplicateKeyError ถ้าเปลี่ยนไปชนชื่อ/อีเมลของคนอื่น """
+        result = await self.database.run(self.collection.update_one, {"_id": ObjectId(user_id)},
+                                         {"$set": self._with_lower(user)})
+        return result.matched_count
+
+    async def delete(self, user_id):
+        result = await self.database.run(self.collection.delete_one, {"_id": ObjectId(user_id)})
+        return result.deleted_count
+
+
+class BehaviorStore:
+    def __init__(self, database, collection="student_behavior_report"):
+        self.database = database
+        self.collection = database[collection]
+
+    def ensure_indexes(self):
+        self.collection.create_indexes([
+            IndexModel([("student_id", ASCENDING), ("created_at", DESCENDING)]),
+        ])
+
+    async def all(self):
+        return await self.database.run(lambda: list(self.collection.find()))
+
+    async def get(self, report_id):
+        return await self.database.run(self.collection.find_one, _id_query(report_id))
+
+    async def by_student(self, student_id):
+        return await self.database.run(lambda: list(self.collection.find({"student_id": student_id})))
+
+    async def create(self, report):
+        """ → เอกสารที่เพิ่ม (พร้อม _id) """
+        report = dict(report)
+        result = await self.database.run(self.collection.insert_one, report)
+        report["_id"] = result.inserted_id
+        return report
+
+    async def update(self, report_id, fields):
+        """ → เอกสารหลังแก้ หรือ None ถ้าไม่พบ """
+        return await self.database.run(self.collection.find_one_and_update, _id_query(report_id),
+                                       {"$set": fields}, return_document=ReturnDocument.AFTER)
+
+    async def delete(self, report_id):
+        result = await self.database.run(self.collection.delete_one, _id_query(report_id))
+        return result.deleted_count
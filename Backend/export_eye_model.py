@@ -0,0 +1,112 @@
+# export_eye_model.py — แปลงโมเดลตรวจตา (.keras) เป็น TFLite สำหรับ SleepDetector(backend="tflite")
+#
+#   python export_eye_model.py --variants fp32 fp16 dynamic int8 --calib eye_crops/
+#   python export_eye_model.py --variants int8 --size 96 --calib eye_crops/     (ย่อ input เหลือ 96x96)
+#
+# variant:
+#   fp32    : แปลงเฉย ๆ (ไว้เทียบ)
+#   fp16    : น้ำหนักเป็น float16 → ไฟล์เล็กลงครึ่งหนึ่ง คำนวณยังเป็น float32 บน CPU
+#   dynamic : น้ำหนัก int8, activation คำนวณ int8 แบบ dynamic range (ไม่ต้องมีรูปตัวอย่าง)
+#   int8    : full integer (น้ำหนัก + activation int8) ต้องมี --calib เป็นรูปตาจริงสำหรับ calibration
+#             input / output ยังเป็น float32 → SleepDetector ใช้เหมือนกันทุก variant
+#
+# --size: สร้างโมเดลใหม่ที่ input เล็กลงแล้วคัดลอกน้ำหนักเดิม ใช้ได้เฉพาะโมเดลที่ไม่มีชั้นผูกกับขนาดภาพ
+# (เช่น Flatten → Dense) ; ถ้าน้ำหนักไม่เข้ากันต้อง train ใหม่ที่ขนาดนั้น
+# เลือก variant จากผลของ benchmarks/bench_eye_variants.py (ความแม่นยำ vs latency บนชุดรูปตาที่มี label)
+#
+# รันบนเครื่องที่มี TensorFlow เต็ม ; เครื่องที่ใช้งานจริงต้องการแค่ tflite_runtime (หรือ ai_edge_litert)
+
+import argparse
+import os
+import random
+
+import cv2
+
+from sleep_detector import DEFAULT_MODELS, preprocess_crops
+
+VARIANTS = ("fp32", "fp16", "dynamic", "int8")
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg')
+
+
+def list_images(folder):
+    """ รูปทั้งหมดใต้ folder (รวมโฟลเดอร์ย่อย เช่น Closed/ Open/) """
+    paths = []
+    for root, _, files in os.walk(folder):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTS))
+    return sorted(paths)
+
+
+def load_keras(path, size=None):
+    """ โหลดโมเดล ; size → โมเดลเดิมที่ input (size, size, 3) ใช้น้ำหนักชุดเดิม """
+    import tensorflow as tf
+    model = tf.keras.models.load_model(path)
+    if size is None or tuple(model.input_shape[1:3]) == (size, size):
+        return model
+    resized = tf.keras.models.clone_model(model, input_tensors=tf.keras.Input((size, size, 3)))
+    try:
+        resized.set_weights(model.get_weights())
+    except ValueError as e:
+        raise SystemExit(f"❌ ย่อ input เป็น {size}x{size} ไม่ได้ (มีชั้นที่ผูกกับขนาดภาพ ต้อง train ใหม่): {e}")
+    return resized
+
+
+def representative_data(paths, size, limit=300, seed=0):
+    """ รูปตาสำหรับ calibration (int8) — preprocess แบบเดียวกับ SleepDetector """
+    paths = list(paths)
+    random.Random(seed).shuffle(paths)
+
+    def gen():
+        for path in paths[:limit]:
+            img = cv2.imread(path)
+            if img is not None:
+                yield [preprocess_crops([img], size[0], size[1])]
+    return gen
+
+
+def convert(model, variant, calib_paths=None):
+    """ → bytes ของไฟล์ .tflite """
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == "fp16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif variant == "int8":
+        if not calib_paths:
+            raise SystemExit("❌ int8 ต้องมีรูปตาสำหรับ calibration (--calib)")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_data(calib_paths, model.input_shape[1:3])
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the eye classifier to TFLite (optionally quantized)")
+    parser.add_argument("--model", default=DEFAULT_MODELS["keras"])
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=["fp16", "int8"])
+    parser.add_argument("--size", type=int, default=None, help="ขนาด input ใหม่ (None = เท่าเดิม)")
+    parser.add_argument("--calib", default=None, help="โฟลเดอร์รูปตา (calibration ของ int8)")
+    parser.add_argument("--out-dir", default=None, help="ค่าเริ่มต้น: โฟลเดอร์เดียวกับ --model")
+    args = parser.parse_args()
+
+    model = load_keras(args.model, args.size)
+    height, width = model.input_shape[1:3]
+    calib_paths = list_images(args.calib) if args.calib else None
+    if calib_paths is not None:
+        print(f"📷 รูป calibration {len(calib_paths)} รูป")
+
+    out_dir = args.out_dir or os.path.dirname(args.model) or "."
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(args.model))[0]
+    for variant in args.variants:
+        data = convert(model, variant, calib_paths)
+        path = os.path.join(out_dir, f"{stem}-{variant}-{height}x{width}.tflite")
+        with open(path, "wb") as f:
+            f.write(data)
+        print(f"✅ {variant:<8} {len(data) / 2 ** 20:7.2f} MB → {path}")
+    print("ใช้งาน: EYE_MODEL_BACKEND=tflite EYE_MODEL_PATH=<ไฟล์ด้านบน>")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# eye_state.py — ประมาณสถานะตา (Open/Closed) ต่อ track โดยเรียก CNN เท่าที่จำเป็น
+#
+#   1) eye aspect ratio (EAR) จาก landmark ที่เพิ่งคำนวณ (keyframe) ชัดเจนว่าเปิด/ปิด → ไม่ต้องเรียก CNN
+#   2) track ที่สถานะนิ่งและมั่นใจ → ใช้ค่าเดิมต่อได้ไม่เกิน max_reuse_frames เฟรม
+#   3) นอกนั้น (ก้ำกึ่ง / track ใหม่) → เรียก SleepDetector
+# ทุกค่าที่วัดได้ถูกเกลี่ยด้วย EMA ของความน่าจะเป็นที่ตาปิด (p_closed) แยกตาม track
+
+import math
+import time
+
+
+def eye_aspect_ratio(pts):
+    """ EAR ของตาหนึ่งข้าง (6 จุดแบบ dlib): (|p2-p6| + |p3-p5|) / (2|p1-p4|) """
+    if len(pts) != 6:
+        return None
+    p1, p2, p3, p4, p5, p6 = pts
+    horizontal = math.dist(p1, p4)
+    if horizontal == 0:
+        return None
+    return (math.dist(p2, p6) + math.dist(p3, p5)) / (2.0 * horizontal)
+
+
+def landmarks_ear(landmarks):
+    """ EAR เฉลี่ยสองตา หรือ None ถ้าไม่มี landmark """
+    if not landmarks:
+        return None
+    ears = [eye_aspect_ratio(landmarks[key]) for key in ("left_eye", "right_eye") if key in landmarks]
+    ears = [e for e in ears if e is not None]
+    return sum(ears) / len(ears) if ears else None
+
+
+def _p_closed(label, conf):
+    """ (label, conf %) ของ CNN → ความน่าจะเป็นที่ตาปิด ; label อื่น / conf 0 → None """
+    if conf <= 0:
+        return None
+    if label.lower() == "closed":
+        return conf / 100.0
+    if label.lower() == "open":
+        return 1.0 - conf / 100.0
+    return None
+
+
+def closed_probability(label, conf, per_eye):
+    """
+    ค่าที่ป้อน EMA: เฉลี่ย p_closed ของแต่ละตาจาก per_eye (ไม่ใช้ผล vote_eyes ที่ผ่านเกณฑ์ 70% แล้ว
+    เพราะตาปิดที่ไม่มั่นใจจะถูกโหวตเป็น ("Open", 0) ซึ่งกลับด้านเป็น p_closed = 1)
+    ไม่มี per_eye (ใช้ทั้งใบหน้าแทน) → ใช้ label/conf ของใบหน้า ; ไม่มีค่าที่ใช้ได้ → None (ไม่นับเป็นการวัด)
+    """
+    if per_eye:
+        values = [p for p in (_p_closed(e["label"], e["conf"]) for e in per_eye) if p is not None]
+        return sum(values) / len(values) if values else None
+    return _p_closed(label, conf)
+
+
+class EyeStateEstimator:
+    """
+    Args:
+        open_ear / closed_ear: EAR ≥ open_ear ถือว่าเปิดแน่ ≤ closed_ear ถือว่าปิดแน่ (ระหว่างนั้น = ก้ำกึ่ง)
+        alpha: น้ำหนักของค่าที่วัดใหม่ใน EMA
+        confident: p_closed ≥ confident หรือ ≤ 1 - confident ถือว่ามั่นใจพอจะใช้ค่าเดิมต่อ
+        max_reuse_frames: ใช้ค่าเดิมต่อได้ติดกันกี่เฟรมก่อนต้องวัดใหม่
+        forget_after_sec: ลบสถานะของ track ที่ไม่เห็นนานเกินนี้
+        min_conf_for_closed: p_closed (%) หลังเกลี่ยต้องถึงเท่านี้จึงตอบ "Closed" (เกณฑ์เดียวกับ vote_eyes)
+    """
+
+    def __init__(self, open_ear=0.25, closed_ear=0.18, alpha=0.6, confident=0.85,
+                 max_reuse_frames=3, forget_after_sec=5.0, min_conf_for_closed=70.0):
+        self.open_ear = open_ear
+        self.closed_ear = closed_ear
+        self.alpha = alpha
+        self.confident = confident
+        self.max_reuse_frames = max_reuse_frames
+        self.forget_after_sec = forget_after_sec
+        self.min_conf_for_closed = min_conf_for_closed
+        self.states = {}
+        self.stats = {"cnn_calls": 0, "cnn_calls_avoided": 0, "ear_decisions": 0, "reused": 0}
+
+    def reset(self):
+        self.states = {}
+
+    def estimate(self, keys, landmarks, fresh, classify):
+        """
+        Args:
+            keys: key ต่อใบหน้า (track id หรือชื่อ)
+            landmarks: landmark ต่อใบหน้า (ใช้คำนวณ EAR)
+            fresh: landmark มาจากการตรวจจับในเฟรมนี้ (ไม่ใช่เลื่อนตาม optical flow)
+            classify: callable(list ของ index) → list ของ (label, conf, per_eye) จาก CNN
+        Returns:
+            list ของ (label, conf, per_eye) ต่อใบหน้า หลังเกลี่ยด้วย EMA
+            (เฟรมที่ไม่ได้เรียก CNN ได้ per_eye ล่าสุดของ track นั้น)
+        """
+        now = time.time()
+        measurements = [None] * len(keys)
+        per_eyes = [[] for _ in keys]
+        need_cnn = []
+
+        for i, key in enumerate(keys):
+            state = self.states.get(key)
+            ear = landmarks_ear(landmarks[i]) if fresh else None
+            if ear is not None and ear >= self.open_ear:
+                measurements[i] = 0.0
+                self.stats["ear_decisions"] += 1
+            elif ear is not None and ear <= self.closed_ear:
+                measurements[i] = 1.0
+                self.stats["ear_decisions"] += 1
+            elif (state is not None and state["reused"] < self.max_reuse_frames
+                  and (state["p_closed"] >= self.confident or state["p_closed"] <= 1 - self.confident)):
+                state["reused"] += 1
+                self.stats["reused"] += 1
+            else:
+                need_cnn.append(i)
+
+        if need_cnn:
+            for i, (label, conf, per_eye) in zip(need_cnn, classify(need_cnn)):
+                per_eyes[i] = per_eye
+                measurements[i] = closed_probability(label, conf, per_eye)
+        self.stats["cnn_calls"] += len(need_cnn)
+        self.stats["cnn_calls_avoided"] += len(keys) - len(need_cnn)
+
+        results = []
+        for i, key in enumerate(keys):
+            state = self.states.get(key)
+            m = measurements[i]
+            if state is None and m is None:
+                # ยังไม่เคยวัดได้ (เช่น crop ว่าง) → ไม่รู้สถานะ
+                results.append(("Unknown", 0.0, per_eyes[i]))
+                continue
+            if state is None:
+                state = self.states[key] = {"p_closed": m, "reused": 0, "per_eye": []}
+            elif m is not None:
+                state["p_closed"] = self.alpha * m + (1 - self.alpha) * state["p_closed"]
+                state["reused"] = 0
+            if i in need_cnn:
+                state["per_eye"] = per_eyes[i]
+            state["last_seen"] = now
+            p = state["p_closed"]
+            if p * 100.0 >= self.min_conf_for_closed:
+                results.append(("Closed", p * 100.0, state["per_eye"]))
+            else:
+                results.append(("Open", (1 - p) * 100.0, state["per_eye"]))
+
+        for key in [k for k, s in self.states.items() if now - s["last_seen"] > self.forget_after_sec]:
+            del self.states[key]
+        return results
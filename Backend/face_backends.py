@@ -0,0 +1,118 @@
+# face_backends.py — ตัวตรวจจับใบหน้า + landmark ที่เลือกได้ (ค่าเริ่มต้นคือ dlib HOG แบบเดิม)
+#
+# ทุก backend มี interface เดียวกัน:
+#   detect(rgb)        → (face_locations, landmarks, handles)
+#                          face_locations[i] = (top, right, bottom, left)
+#                          landmarks[i]      = {"left_eye": 6 จุด, "right_eye": 6 จุด} (ลำดับจุดแบบ dlib) หรือ None
+#                          handles[i]        = ข้อมูลภายในของ backend ที่ encode() ใช้ต่อ
+#   encode(rgb, handle) → face encoding 128 มิติ (dlib face_encoder เสมอ → เทียบกับใบหน้าที่ลงทะเบียนไว้ได้)
+
+import threading
+
+import dlib
+import numpy as np
+from face_recognition import api as fr_api
+
+# ดัชนีจุดตาใน landmark 68 จุดของ dlib (เหมือน face_recognition.face_landmarks)
+LEFT_EYE = slice(36, 42)
+RIGHT_EYE = slice(42, 48)
+
+# face_encoder (dlib DNN) ใช้ buffer ภายในร่วมกัน → เรียกพร้อมกันหลาย thread (หลายกล้อง) ไม่ได้
+# ส่วน shape predictor ของ dlib ใช้ร่วมกันได้โดยไม่ต้องล็อก
+_encoder_lock = threading.Lock()
+
+
+def face_shapes(rgb_image, face_locations):
+    """ landmark 68 จุด (dlib full_object_detection) ครั้งเดียวต่อใบหน้า """
+    return [fr_api.pose_predictor_68_point(rgb_image, dlib.rectangle(left, top, right, bottom))
+            for top, right, bottom, left in face_locations]
+
+def shape_eye_landmarks(shape):
+    """ จุดรอบดวงตาจาก shape → {"left_eye": [(x, y), ...], "right_eye": [...]} """
+    points = [(p.x, p.y) for p in shape.parts()]
+    return {"left_eye": points[LEFT_EYE], "right_eye": points[RIGHT_EYE]}
+
+def shape_encoding(rgb_image, shape):
+    """ face encoding 128 มิติจาก shape ที่คำนวณไว้แล้ว (dlib face_encoder) """
+    with _encoder_lock:
+        return np.array(fr_api.face_encoder.compute_face_descriptor(rgb_image, shape, 1))
+
+
+class HogBackend:
+    """ dlib HOG detector + landmark 68 จุด (shape เดียวใช้ทั้งหาตาและเข้ารหัส) """
+
+    name = "hog"
+
+    def __init__(self, upsample=1):
+        self.upsample = upsample
+        # HOG detector ของ dlib ใช้พร้อมกันหลาย thread ไม่ได้ → หนึ่งตัวต่อ backend (ต่อกล้อง)
+        self._detector = dlib.get_frontal_face_detector()
+
+    def detect(self, rgb):
+        # เหมือน face_recognition.face_locations (model="hog") แต่ใช้ detector ของตัวเอง
+        h, w = rgb.shape[:2]
+        face_locations = [(max(r.top(), 0), min(r.right(), w), min(r.bottom(), h), max(r.left(), 0))
+                          for r in self._detector(rgb, self.upsample)]
+        try:
+            shapes = face_shapes(rgb, face_locations)
+        except Exception as e:
+            print(f"❌ ข้อผิดพลาดในการหา landmark: {e}")
+            shapes = [None] * len(face_locations)
+        landmarks = [shape_eye_landmarks(s) if s is not None else None for s in shapes]
+        return face_locations, landmarks, shapes
+
+    def encode(self, rgb, handle):
+        return shape_encoding(rgb, handle)
+
+
+class MediaPipeBackend:
+    """
+    MediaPipe FaceMesh: ได้ทั้งกรอบหน้าและจุดตาจาก mesh 468 จุดในรอบเดียว (ไม่ใช้ HOG)
+    การเข้ารหัสยังใช้ dlib (landmark 68 จุดในกรอบจาก mesh) เพื่อให้ encoding เข้ากับดัชนีเดิม
+    """
+
+    name = "mediapipe"
+    # ลำดับ p1..p6 แบบ dlib (มุมตา, บน, บน, มุมตา, ล่าง, ล่าง) ; "left_eye" = ตาที่อยู่ซ้ายของภาพ
+    LEFT_EYE_IDX = (33, 160, 158, 133, 153, 144)
+    RIGHT_EYE_IDX = (362, 385, 387, 263, 373, 380)
+
+    def __init__(self, max_num_faces=30, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        import mediapipe as mp
+        self._mesh = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=False,
+            max_num_faces=max_num_faces,
+            refine_landmarks=False,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+        )
+
+    def detect(self, rgb):
+        h, w = rgb.shape[:2]
+        result = self._mesh.process(rgb)
+        face_locations, landmarks = [], []
+        for face in result.multi_face_landmarks or []:
+            pts = np.array([(p.x * w, p.y * h) for p in face.landmark], dtype=np.float32)
+            left, top = np.clip(pts.min(axis=0), 0, [w - 1, h - 1]).astype(int)
+            right, bottom = np.clip(pts.max(axis=0), 0, [w - 1, h - 1]).astype(int)
+            face_locations.append((int(top), int(right), int(bottom), int(left)))
+            landmarks.append({
+                "left_eye": [tuple(int(v) for v in pts[i]) for i in self.LEFT_EYE_IDX],
+                "right_eye": [tuple(int(v) for v in pts[i]) for i in self.RIGHT_EYE_IDX],
+            })
+        return face_locations, landmarks, face_locations
+
+    def encode(self, rgb, handle):
+        return shape_encoding(rgb, face_shapes(rgb, [handle])[0])
+
+
+BACKENDS = {
+    HogBackend.name: HogBackend,
+    MediaPipeBackend.name: MediaPipeBackend,
+}
+
+
+def make_backend(name, **kwargs):
+    """ สร้าง backend จากชื่อ ("hog" / "mediapipe") """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown face backend: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,190 @@
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows: ไม่มี flock → save ของหลาย process ไม่ถูก serialise
+    fcntl = None
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """ sha1 ของเนื้อไฟล์ """
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class EncodingCache:
+    """
+    cache ของ face encoding บนดิสก์ เพื่อไม่ต้องรัน dlib encoder ใหม่ทุกครั้งที่เปิดเซิร์ฟเวอร์
+      - encodings-*.npy : เมทริกซ์ float32 (K x 128) เปิดแบบ memory-mapped (ชื่อไม่ซ้ำกันทุกครั้งที่ save)
+      - manifest.json   : ชื่อไฟล์ array + realpath ของรูป → {size, mtime_ns, sha1, name, row}
+                          (row = -1 คือรูปที่หาใบหน้าไม่เจอ)
+
+    ไฟล์ที่ size/mtime ตรงกับ manifest ใช้ cache ได้ทันที ถ้าไม่ตรงจะเทียบ sha1 อีกชั้น
+    (เช่นไฟล์ถูก copy ทับด้วยเนื้อหาเดิม) ถ้ายังไม่ตรงถือว่าต้องเข้ารหัสใหม่
+    """
+
+    # 2: encoding คำนวณจาก landmark 68 จุด (encode_faces_with_landmarks)
+    VERSION = 2
+
+    def __init__(self, cache_dir, dim=128):
+        self.cache_dir = cache_dir
+        self.dim = dim
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self.array_path = None
+        self._entries = {}
+        self._encodings = {}
+        self._touched = set()   # key ที่ instance นี้ put / อัปเดต mtime ตั้งแต่ save ครั้งก่อน
+        self._removed = set()   # key ที่ instance นี้ลบตั้งแต่ save ครั้งก่อน
+        self.dirty = False
+        self.load()
+
+    def _read_disk(self):
+        """ manifest + array ที่อยู่บนดิสก์ตอนนี้ → (array_path, entries, encodings) ; ไม่มี cache → (None, {}, {}) """
+        if not os.path.exists(self.manifest_path):
+            return None, {}, {}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != self.VERSION:
+            return None, {}, {}
+        array_path = os.path.join(self.cache_dir, manifest.get("array", "encodings.npy"))
+        array = np.load(array_path, mmap_mode="r")
+        entries, encodings = {}, {}
+        for path, meta in manifest["entries"].items():
+            row = meta["row"]
+            entries[self._key(path)] = meta
+            encodings[self._key(path)] = array[row] if row >= 0 else None
+        return array_path, entries, encodings
+
+    def load(self):
+        self._touched.clear()
+        self._removed.clear()
+        try:
+            self.array_path, self._entries, self._encodings = self._read_disk()
+        except Exception as e:
+            print(f"⚠️ อ่าน face cache ไม่ได้ ({e}) → เข้ารหัสใหม่ทั้งหมด")
+            self._entries = {}
+            self._encodings = {}
+
+    @staticmethod
+    def _key(path):
+        """ key ของ manifest: ./static/a.jpg, static/a.jpg และ path เต็มของไฟล์เดียวกัน → key เดียวกัน """
+        return os.path.realpath(path)
+
+    def get(self, path):
+        """ → (hit, encoding หรือ None) ; hit=False แปลว่าต้องเข้ารหัสไฟล์นี้ใหม่ """
+        key = self._key(path)
+        meta = self._entries.get(key)
+        if meta is None:
+            return False, None
+        st = os.stat(path)
+        if meta["size"] == st.st_size and meta["mtime_ns"] == st.st_mtime_ns:
+            return True, self._encodings[key]
+        if meta["size"] == st.st_size and meta["sha1"] == file_digest(path):
+            meta["mtime_ns"] = st.st_mtime_ns
+            self._touched.add(key)
+            self.dirty = True
+            return True, self._encodings[key]
+        return False, None
+
+    def put(self, path, name, encoding):
+        key = self._key(path)
+        st = os.stat(path)
+        self._entries[key] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha1": file_digest(path),
+            "name": name,
+            "row": -1,
+        }
+        self._encodings[key] = None if encoding is None else np.asarray(encoding, dtype=np.float32)
+        self._touched.add(key)
+        self._removed.discard(key)
+        self.dirty = True
+
+    def remove(self, path):
+        key = self._key(path)
+        if self._entries.pop(key, None) is not None:
+            self._encodings.pop(key, None)
+            self._touched.discard(key)
+            self._removed.add(key)
+            self.dirty = True
+
+    def retain(self, folder, paths):
+        """ ลบรายการของไฟล์ใน folder ที่ไม่มีอยู่แล้ว (รายการของโฟลเดอร์อื่นไม่ถูกแตะ) """
+        folder = self._key(folder)
+        keep = {self._key(p) for p in paths}
+        for path in [p for p in self._entries if os.path.dirname(p) == folder and p not in keep]:
+            self.remove(path)
+
+    @contextlib.contextmanager
+    def _save_lock(self):
+        """ lock file ของ cache_dir: save ของหลาย process (worker ของ video_analysis) ทำทีละตัว """
+        with open(os.path.join(self.cache_dir, ".lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield   # ปิดไฟล์ = ปลด lock
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._save_lock():
+            # รวมกับสิ่งที่ process อื่นเขียนไว้หลังเราโหลด: รายการที่เราไม่ได้แตะใช้ของบนดิสก์
+            try:
+                _, disk_entries, disk_encodings = self._read_disk()
+            except Exception:
+                disk_entries, disk_encodings = {}, {}
+            for key, meta in disk_entries.items():
+                if key not in self._touched and key not in self._removed:
+                    self._entries[key] = meta
+                    self._encodings[key] = disk_encodings[key]
+
+            rows = []
+            for path in sorted(self._entries):
+                encoding = self._encodings.get(path)
+                if encoding is None:
+                    self._entries[path]["row"] = -1
+                else:
+                    self._entries[path]["row"] = len(rows)
+                    rows.append(np.asarray(encoding, dtype=np.float32))
+            array = np.stack(rows) if rows else np.empty((0, self.dim), dtype=np.float32)
+
+            # array ลงไฟล์ชื่อไม่ซ้ำที่ manifest อ้างถึง แล้ว os.replace manifest → ผู้อ่านที่ไม่ถือ lock
+            # เห็น manifest กับ array คู่เดียวกันเสมอ ไม่มีสถานะที่เขียนค้างครึ่งไฟล์
+            fd, array_path = tempfile.mkstemp(prefix="encodings-", suffix=".npy", dir=self.cache_dir)
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            fd, tmp_manifest = tempfile.mkstemp(prefix="manifest-", suffix=".tmp", dir=self.cache_dir)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "array": os.path.basename(array_path),
+                           "entries": self._entries}, f)
+            os.replace(tmp_manifest, self.manifest_path)
+            self.array_path = array_path
+            self._remove_unreferenced()
+        self._touched.clear()
+        self._removed.clear()
+        self.dirty = False
+
+    def _remove_unreferenced(self):
+        """
+        ลบ array / manifest ชั่วคราวที่ manifest ปัจจุบันไม่อ้างถึง (ของ save ครั้งก่อน ๆ หรือ process ที่ตายกลางทาง)
+        เรียกขณะถือ lock → ไม่มีใครกำลังเขียนอยู่ ; process ที่เปิด array เก่าแบบ mmap ไว้ยังอ่านต่อได้บน POSIX
+        """
+        patterns = ("encodings-*.npy", "encodings.npy", "manifest-*.tmp")
+        for path in {p for pattern in patterns for p in glob.glob(os.path.join(self.cache_dir, pattern))}:
+            if os.path.abspath(path) == os.path.abspath(self.array_path):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,105 @@
+import threading
+import numpy as np
+
+
+class FaceIndex:
+    """
+    ดัชนีใบหน้าที่รู้จัก: encoding ทั้งหมดเก็บเป็นเมทริกซ์ float32 ก้อนเดียว (K x 128) + อาร์เรย์ชื่อ
+    จับคู่ใบหน้าที่ตรวจเจอทั้งเฟรม (M ใบ) ด้วยการคำนวณระยะทาง M x K ครั้งเดียว
+
+    สถานะ (เมทริกซ์, norm², ชื่อ) เป็น snapshot ที่ไม่ถูกแก้ในที่ → เปลี่ยนทั้งก้อนแบบ atomic
+    thread ที่กำลัง match อยู่จึงอ่านได้โดยไม่ต้องล็อก
+    """
+
+    def __init__(self, tolerance=0.6, dim=128):
+        self.tolerance = tolerance
+        self.dim = dim
+        self._write_lock = threading.Lock()
+        self._state = self._make_state(np.empty((0, dim), dtype=np.float32), [])
+
+    def _make_state(self, encodings, names):
+        encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        names = np.asarray(names, dtype=object)
+        sq_norms = np.einsum("ij,ij->i", encodings, encodings)
+        return encodings, sq_norms, names
+
+    def build(self, encodings, names):
+        """ แทนที่ทั้งดัชนีด้วย encodings (K x 128) และ names (K) """
+        if len(encodings) != len(names):
+            raise ValueError("encodings and names must have the same length")
+        state = self._make_state(encodings, names)
+        with self._write_lock:
+            self._state = state
+
+    def upsert(self, name, encoding):
+        """ เพิ่มใบหน้า หรือแทนที่ encoding เดิมของชื่อนี้ (สร้าง snapshot ใหม่แล้วสลับ) """
+        self.upsert_many([name], [encoding])
+
+    def upsert_many(self, new_names, new_encodings):
+        """ เหมือน upsert แต่หลายชื่อในการสลับ snapshot ครั้งเดียว """
+        if len(new_names) != len(new_encodings):
+            raise ValueError("encodings and names must have the same length")
+        if len(new_names) == 0:
+            return
+        with self._write_lock:
+            encodings, _, names = self._state
+            keep = ~np.isin(names, np.asarray(new_names, dtype=object))
+            merged = np.vstack([encodings[keep],
+                                np.asarray(new_encodings, dtype=np.float32).reshape(-1, self.dim)])
+            self._state = self._make_state(merged, list(names[keep]) + list(new_names))
+
+    def remove(self, name):
+        """ ลบทุก encoding ของชื่อนี้ → True ถ้ามีอยู่ """
+        with self._write_lock:
+            encodings, _, names = self._state
+            keep = names != name
+            if keep.all():
+                return False
+            self._state = self._make_state(encodings[keep], list(names[keep]))
+            return True
+
+    def __contains__(self, name):
+        return bool((self._state[2] == name).any())
+
+    @property
+    def encodings(self):
+        return self._state[0]
+
+    @property
+    def names(self):
+        return self._state[2]
+
+    def __len__(self):
+        return len(self._state[2])
+
+    def _sq_distances(self, q, encodings, sq_norms):
+        # |q - k|² = |q|² + |k|² - 2 q·k
+        d2 = np.einsum("ij,ij->i", q, q)[:, None] + sq_norms[None, :] - 2.0 * (q @ encodings.T)
+        np.maximum(d2, 0.0, out=d2)
+        return d2
+
+    def distances(self, queries):
+        """ ระยะทางแบบยุคลิด (เหมือน face_recognition.face_distance) → เมทริกซ์ M x K """
+        encodings, sq_norms, _ = self._state
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        return np.sqrt(self._sq_distances(q, encodings, sq_norms))
+
+    def match(self, queries):
+        """
+        จับคู่ encoding ของใบหน้าที่ตรวจเจอทั้งหมดในครั้งเดียว
+        Returns:
+            (names, distances) — ชื่อที่ใกล้ที่สุดถ้าระยะ ≤ tolerance ไม่งั้น "Unknown"
+        """
+        encodings, sq_norms, names = self._state
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if len(q) == 0:
+            return [], np.empty(0, dtype=np.float32)
+        if len(names) == 0:
+            return ["Unknown"] * len(q), np.full(len(q), np.inf, dtype=np.float32)
+
+        d2 = self._sq_distances(q, encodings, sq_norms)
+        best = np.argmin(d2, axis=1)
+        best_dist = np.sqrt(d2[np.arange(len(q)), best])
+        matched = best_dist <= self.tolerance
+        result = [str(names[b]) if ok else "Unknown" for b, ok in zip(best, matched)]
+        return result, best_dist
@@ -2,95 +2,363 @@ import face_recognition
 import cv2 
 import numpy as np 
 import os 
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from face_backends import face_shapes, make_backend, shape_encoding, shape_eye_landmarks
+from face_cache import EncodingCache
+from face_index import FaceIndex
+from face_tracker import FaceTracker
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg')
+
+def encode_faces_with_landmarks(rgb_image, face_locations):
+    """
+    คำนวณ landmark 68 จุดครั้งเดียวต่อใบหน้า แล้วใช้ผลเดียวกันทั้ง
+      - face encoding 128 มิติ (dlib face_encoder)
+      - จุดรอบดวงตา (ไว้ crop ตาให้ SleepDetector)
+    → (encodings, landmarks) ; landmarks[i] = {"left_eye": [(x, y), ...], "right_eye": [...]}
+    """
+    shapes = face_shapes(rgb_image, face_locations)
+    return [shape_encoding(rgb_image, s) for s in shapes], [shape_eye_landmarks(s) for s in shapes]
+
+def _scale_landmarks(landmarks, factor, region=None):
+    if not landmarks:
+        return None
+    dy, dx = (region[0], region[3]) if region is not None else (0, 0)
+    return {key: [(x*factor + dx, y*factor + dy) for (x, y) in pts] for key, pts in landmarks.items()}
+
+def _to_full_boxes(face_locations, region=None):
+    """ กรอบจากเฟรมย่อครึ่ง (ของ region ถ้ามี) → พิกัดเฟรมเต็ม """
+    dy, dx = (region[0], region[3]) if region is not None else (0, 0)
+    return [(top*2 + dy, right*2 + dx, bottom*2 + dy, left*2 + dx)
+            for (top, right, bottom, left) in face_locations]
+
+def _encode_job(image_path):
+    """ งานใน worker process → (path, encoding หรือ None, ข้อความ error หรือ None) """
+    try:
+        return image_path, FaceRecognizer.encode_image_file(image_path), None
+    except Exception as e:
+        return image_path, None, str(e)
+
+def encode_images_parallel(image_paths, workers=None):
+    """
+    เข้ารหัสรูปหลายไฟล์แบบขนานด้วย ProcessPoolExecutor
+    yield (path, encoding หรือ None, error หรือ None) ตามลำดับที่เสร็จ
+    workers=1 → ทำใน process นี้เลย (ไว้เป็น baseline) ; None → ใช้ทุกคอร์
+    """
+    if workers == 1:
+        for path in image_paths:
+            yield _encode_job(path)
+        return
+    # spawn: process แม่อาจมี thread (pipeline / TensorFlow) อยู่ ไม่ควร fork
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        futures = [executor.submit(_encode_job, path) for path in image_paths]
+        for future in as_completed(futures):
+            yield future.result()
 
 class FaceRecognizer:
-    def __init__(self, image_folder="static", min_faces=3):
+    def __init__(self, image_folder="static", min_faces=3, tolerance=0.6, cache_dir=".face_cache", preload=True,
+                 tracking=True, backend="hog", backend_options=None, index=None, motion_gate=None):
         self.image_folder = image_folder
         self.min_faces = min_faces
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.load_known_faces()
+        # index=FaceIndex ที่มีอยู่แล้ว → ใช้ร่วมกัน (เช่นหลายกล้องใช้ชุดใบหน้าเดียวกัน ลงทะเบียนครั้งเดียวเห็นทุกกล้อง)
+        self.index = index if index is not None else FaceIndex(tolerance=tolerance)
+        # cache_dir=None → ไม่ใช้ cache (เข้ารหัสทุกรูปใหม่ทุกครั้ง)
+        self.cache = EncodingCache(cache_dir) if cache_dir else None
+        # กันการลงทะเบียนพร้อมกันหลาย thread (index เองอ่านได้เสมอ ไม่ต้องรอ lock นี้)
+        self._enroll_lock = threading.Lock()
+        if preload:
+            self.load_known_faces()
         
-        self.frame_skip = 2
+        # tracking=True: ตรวจจับเฉพาะ keyframe แล้วติดตามด้วย optical flow ระหว่างนั้น (แทน frame_skip เดิม)
+        # tracking=False: ตรวจจับ + ระบุตัวตนใหม่ทุกเฟรม
+        self.tracker = FaceTracker() if tracking else None
+        # ตัวตรวจจับใบหน้า + landmark ของเฟรมสด ("hog" = dlib แบบเดิม, "mediapipe" = FaceMesh)
+        # การลงทะเบียนรูปยังใช้ HOG เสมอ เพราะ encoding มาจาก dlib อยู่แล้ว
+        self.backend = make_backend(backend, **(backend_options or {}))
+        # motion_gate.MotionGate (ถ้ามี): ก่อนตรวจจับทุกครั้ง — ฉากนิ่งไม่ตรวจจับ / ตรวจเฉพาะบริเวณที่เปลี่ยน
+        self.motion_gate = motion_gate
         self.frame_count = 0
+        self.last_was_keyframe = False  # landmark ของเฟรมล่าสุดมาจากการตรวจจับจริง (ไม่ใช่ optical flow)
         self.last_result = ([], [])
+        self.last_analysis = ([], [], [], [])
+    
+    @staticmethod
+    def encode_image_file(image_path):
+        """ โหลดรูป + ย่อถ้ากว้างเกิน 800px แล้วคืน encoding ของใบหน้าแรก (None ถ้าไม่เจอใบหน้า) """
+        image = face_recognition.load_image_file(image_path)
+        
+        height, width = image.shape[:2]
+        if width > 800:
+            scale = 800 / width
+            new_width = int(width * scale)
+            new_height = int(height * scale)
+            image = cv2.resize(image, (new_width, new_height))
+        
+        # ใช้ landmark 68 จุดแบบเดียวกับตอนวิเคราะห์เฟรม → encoding เทียบกันได้ตรงๆ
+        face_locations = face_recognition.face_locations(image)
+        if not face_locations:
+            return None
+        encodings, _ = encode_faces_with_landmarks(image, face_locations[:1])
+        return encodings[0]
     
     def load_known_faces(self):
+        with self._enroll_lock:
+            self._load_known_faces()
+    
+    def _load_known_faces(self):
         print("🔄 โหลดใบหน้าที่รู้จักจาก:", self.image_folder)
         
         if not os.path.exists(self.image_folder):
             os.makedirs(self.image_folder)
             return
         
-        for filename in os.listdir(self.image_folder):
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                try:
-                    image_path = os.path.join(self.image_folder, filename)
-                    image = face_recognition.load_image_file(image_path)
-                    
-                    height, width = image.shape[:2]
-                    if width > 800:
-                        scale = 800 / width
-                        new_width = int(width * scale)
-                        new_height = int(height * scale)
-                        image = cv2.resize(image, (new_width, new_height))
-                    
-                    encoding = face_recognition.face_encodings(image)
-                    if encoding:
-                        self.known_face_encodings.append(encoding[0])
-                        name = os.path.splitext(filename)[0]
-                        self.known_face_names.append(name)
+        encodings = []
+        names = []
+        filenames = sorted(f for f in os.listdir(self.image_folder)
+                           if f.lower().endswith(IMAGE_EXTS))
+        cached = 0
+        for filename in filenames:
+            try:
+                image_path = os.path.join(self.image_folder, filename)
+                name = os.path.splitext(filename)[0]
+                
+                hit, encoding = self.cache.get(image_path) if self.cache else (False, None)
+                if hit:
+                    cached += 1
+                else:
+                    encoding = self.encode_image_file(image_path)
+                    if self.cache:
+                        self.cache.put(image_path, name, encoding)
+                    if encoding is not None:
                         print(f"✅ โหลดใบหน้า: {name}")
                     else:
                         print(f"⚠️ ไม่สามารถเข้ารหัสใบหน้าในไฟล์: {filename}")
-                        
-                except Exception as e:
-                    print(f"❌ ข้อผิดพลาดในไฟล์ {filename}: {str(e)}")
+                
+                if encoding is not None:
+                    encodings.append(encoding)
+                    names.append(name)
+                    
+            except Exception as e:
+                print(f"❌ ข้อผิดพลาดในไฟล์ {filename}: {str(e)}")
+
+        if self.cache:
+            self.cache.retain(self.image_folder, [os.path.join(self.image_folder, f) for f in filenames])
+            self.cache.save()
+            print(f"♻️ ใช้ face cache {cached}/{len(filenames)} ไฟล์")
+        self.index.build(encodings, names)
+    
+    def add_face(self, image_path, name=None):
+        """
+        ลงทะเบียนใบหน้าจากรูปเดียวขณะเซิร์ฟเวอร์ทำงาน (เข้ารหัสเฉพาะรูปนี้ แล้วสลับเข้า index)
+        ถ้าชื่อนี้มีอยู่แล้วจะถูกแทนที่ → ใช้เป็น update ได้ด้วย
+        Returns:
+            True ถ้าเจอใบหน้าและลงทะเบียนแล้ว
+        """
+        if name is None:
+            name = os.path.splitext(os.path.basename(image_path))[0]
+        encoding = self.encode_image_file(image_path)
+        with self._enroll_lock:
+            if self.cache:
+                self.cache.put(image_path, name, encoding)
+                self.cache.save()
+            if encoding is None:
+                print(f"⚠️ ไม่สามารถเข้ารหัสใบหน้าในไฟล์: {image_path}")
+                return False
+            self.index.upsert(name, encoding)
+        print(f"✅ ลงทะเบียนใบหน้า: {name}")
+        return True
+    
+    def update_face(self, name, image_path):
+        """ แทนที่ใบหน้าของชื่อที่มีอยู่แล้วด้วยรูปใหม่ (KeyError ถ้ายังไม่มีชื่อนี้) """
+        if name not in self.index:
+            raise KeyError(name)
+        return self.add_face(image_path, name=name)
+    
+    def remove_face(self, name):
+        """
+        เอาใบหน้าออกจาก index → True ถ้ามีชื่อนี้อยู่
+        ไฟล์รูปไม่ถูกลบ (ยังเป็นรูปโปรไฟล์) — ถ้ารูปยังอยู่ใน image_folder จะถูกโหลดกลับเมื่อรีสตาร์ท
+        """
+        with self._enroll_lock:
+            return self.index.remove(name)
+    
+    def bulk_enroll(self, image_paths, workers=None, on_progress=None):
+        """
+        ลงทะเบียนรูปจำนวนมาก (เช่นทั้งห้องเรียน) โดยกระจายการเข้ารหัสไปหลาย process
+        รูปที่อยู่ใน cache แล้วไม่ถูกเข้ารหัสซ้ำ ผลทั้งหมดสลับเข้า index ครั้งเดียวตอนจบ
+        Args:
+            image_paths: list ของ path รูป (ชื่อ = ชื่อไฟล์ไม่รวมนามสกุล)
+            workers: จำนวน process (None = ทุกคอร์, 1 = ไม่ใช้ pool)
+            on_progress: callable(dict) เรียกทุกครั้งที่แต่ละไฟล์เสร็จ
+        Returns:
+            dict สรุปผล: enrolled / cached / no_face / failed (พร้อม error รายไฟล์) / elapsed_sec
+        """
+        t0 = time.perf_counter()
+        report = {"total": len(image_paths), "workers": workers or os.cpu_count(),
+                  "enrolled": [], "cached": [], "no_face": [], "failed": []}
+        names, encodings = [], []
+        done = 0
+
+        def progress(path, status, error=None):
+            if on_progress:
+                on_progress({"path": path, "status": status, "error": error,
+                             "done": done, "total": len(image_paths)})
+
+        todo = []
+        for path in image_paths:
+            with self._enroll_lock:
+                hit, encoding = self.cache.get(path) if self.cache else (False, None)
+            if not hit:
+                todo.append(path)
+                continue
+            done += 1
+            name = os.path.splitext(os.path.basename(path))[0]
+            if encoding is None:
+                report["no_face"].append(path)
+                progress(path, "no_face")
+            else:
+                names.append(name)
+                encodings.append(encoding)
+                report["cached"].append(name)
+                progress(path, "cached")
+
+        for path, encoding, error in encode_images_parallel(todo, workers):
+            done += 1
+            name = os.path.splitext(os.path.basename(path))[0]
+            if error is not None:
+                report["failed"].append({"path": path, "error": error})
+                progress(path, "failed", error)
+                continue
+            if self.cache:
+                with self._enroll_lock:
+                    self.cache.put(path, name, encoding)
+            if encoding is None:
+                report["no_face"].append(path)
+                progress(path, "no_face")
+            else:
+                names.append(name)
+                encodings.append(encoding)
+                report["enrolled"].append(name)
+                progress(path, "enrolled")
+
+        with self._enroll_lock:
+            self.index.upsert_many(names, encodings)
+            if self.cache:
+                self.cache.save()
+        report["elapsed_sec"] = round(time.perf_counter() - t0, 3)
+        return report
+    
+    @property
+    def known_face_encodings(self):
+        return self.index.encodings
+    
+    @property
+    def known_face_names(self):
+        return list(self.index.names)
     
     def recognize_faces(self, frame):
+        face_locations, names, _, _ = self.analyze_frame(frame)
+        return face_locations, names
+    
+    def analyze_frame(self, frame):
+        """
+        วิเคราะห์เฟรม: ตรวจจับใบหน้าครั้งเดียว + landmark ครั้งเดียวต่อใบหน้า
+        แล้วได้ทั้งชื่อ (จาก encoding) และจุดรอบดวงตา โดยไม่ต้องรัน detector ซ้ำใน crop ของแต่ละใบหน้า
+        เมื่อเปิด tracking จะตรวจจับเฉพาะ keyframe และเข้ารหัสเฉพาะ track ใหม่/ไม่มั่นใจ
+        Returns:
+            (face_locations, names, landmarks, track_ids) — พิกัดของเฟรมเต็ม
+            landmarks[i] = {"left_eye": [...], "right_eye": [...]} หรือ None ถ้าคำนวณไม่ได้
+            track_ids[i] = id คงที่ของ track (None ถ้าปิด tracking)
+        """
         self.frame_count += 1
         
-        if self.frame_count % self.frame_skip != 0:
-            return self.last_result
-        
+        if self.tracker is None:
+            detect, region = (self.motion_gate.check(frame, allow_region=False) if self.motion_gate is not None
+                              else (True, None))
+            if not detect:
+                # ฉากนิ่ง → ผลเดิม (ไม่ใช่ keyframe: landmark ไม่ได้คำนวณใหม่)
+                self.last_was_keyframe = False
+                return self.last_analysis
+            rgb_small_frame, face_locations, landmarks, handles = self._detect(frame, region)
+            names = []
+            if face_locations:
+                try:
+                    face_encodings = [self.backend.encode(rgb_small_frame, h) for h in handles]
+                    
+                    # จับคู่ทุกใบหน้าในเฟรมกับดัชนีในครั้งเดียว (M x K)
+                    names, _ = self.index.match(face_encodings)
+                    
+                except Exception as e:
+                    print(f"❌ ข้อผิดพลาดในการประมวลผล face encodings: {e}")
+                    names = ["Error"] * len(face_locations)
 
+            face_locations = _to_full_boxes(face_locations, region)
+            landmarks = [_scale_landmarks(lm, 2, region) for lm in landmarks]
+            track_ids = [None] * len(face_locations)
+            self.last_was_keyframe = True
+        else:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            self.last_was_keyframe = self.tracker.needs_detection()
+            region = None
+            if self.last_was_keyframe and self.motion_gate is not None:
+                # ฉากนิ่ง → ไม่ตรวจจับ เลื่อน track เดิมด้วย optical flow ต่อ (keyframe ถัดไปถามใหม่)
+                self.last_was_keyframe, region = self.motion_gate.check(frame)
+            if self.last_was_keyframe:
+                t0 = time.perf_counter()
+                self._detect_keyframe(frame, gray, region)
+                self.tracker.update_interval((time.perf_counter() - t0) * 1000.0)
+            else:
+                self.tracker.propagate(gray)
+            tracks = self.tracker.active_tracks()
+            face_locations = [t.box for t in tracks]
+            names = [t.name for t in tracks]
+            landmarks = [t.landmarks for t in tracks]
+            track_ids = [t.id for t in tracks]
+        
+        self.last_result = (face_locations, names)
+        self.last_analysis = (face_locations, names, landmarks, track_ids)
+        return self.last_analysis
+    
+    def _detect(self, frame, region=None):
+        """
+        ตรวจจับใบหน้า + landmark บนเฟรมย่อครึ่งด้วย backend ที่เลือก
+        region: (top, right, bottom, left) → ตรวจจับเฉพาะบริเวณนี้ ; None = ทั้งเฟรม
+        → (rgb_small_frame, face_locations, landmarks, handles) พิกัดของเฟรมย่อ (ของ region ถ้ากำหนด)
+        """
+        if region is not None:
+            top, right, bottom, left = region
+            frame = frame[top:bottom, left:right]
         small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
         rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
 
-        face_locations = face_recognition.face_locations(rgb_small_frame)
+        face_locations, landmarks, handles = self.backend.detect(rgb_small_frame)
 
-        if len(face_locations) < self.min_faces:
+        if region is None and len(face_locations) < self.min_faces:
             print(f"⚠️ ตรวจจับได้ {len(face_locations)} ใบหน้า (ต้องการอย่างน้อย {self.min_faces} ใบหน้า)")
-        
-        names = []
-        if face_locations:
-            try:
+        return rgb_small_frame, face_locations, landmarks, handles
+    
+    def _detect_keyframe(self, frame, gray, region=None):
+        """ keyframe: ตรวจจับ + landmark ทุกใบหน้า (ใน region) แต่เข้ารหัสเฉพาะที่ tracker ขอ """
+        rgb_small_frame, face_locations, landmarks, handles = self._detect(frame, region)
 
-                face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-                
-                for face_encoding in face_encodings:
-                    name = "Unknown"
-                    
-                    if self.known_face_encodings:  
-                        matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding, tolerance=0.6)
-                        
-                        if True in matches:
-                            face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                            best_match_index = np.argmin(face_distances)
-                            if matches[best_match_index]:
-                                name = self.known_face_names[best_match_index]
-                    
-                    names.append(name)
-                    
+        boxes = _to_full_boxes(face_locations, region)
+        landmarks = [_scale_landmarks(lm, 2, region) for lm in landmarks]
+
+        def identify(det_indices):
+            try:
+                encodings = [self.backend.encode(rgb_small_frame, handles[i]) for i in det_indices]
+                names, distances = self.index.match(encodings)
+                return list(zip(names, distances))
             except Exception as e:
                 print(f"❌ ข้อผิดพลาดในการประมวลผล face encodings: {e}")
-                names = ["Error"] * len(face_locations)
+                return [("Error", float("inf"))] * len(det_indices)
 
-        face_locations = [(top*2, right*2, bottom*2, left*2) 
-                         for (top, right, bottom, left) in face_locations]
-        
-        self.last_result = (face_locations, names)
-        return face_locations, names
+        self.tracker.apply_detections(gray, boxes, landmarks, identify, region)
 
 def main():
 
@@ -0,0 +1,221 @@
+# face_tracker.py — ติดตามใบหน้าระหว่างเฟรมที่ตรวจจับจริง (keyframe)
+#
+#   keyframe : ตรวจจับใบหน้า → จับคู่กับ track เดิมด้วย IoU → เข้ารหัสเฉพาะ track ใหม่/ไม่มั่นใจ
+#   เฟรมอื่น : เลื่อนกรอบ + จุดตาของแต่ละ track ด้วย optical flow (Lucas-Kanade) ซึ่งถูกมาก
+#
+# ความถี่ keyframe ปรับตามเวลาที่ใช้ตรวจจับจริง (detect_budget_ms) → เครื่องช้าตรวจจับห่างขึ้นเอง
+
+import math
+
+import cv2
+import numpy as np
+
+
+def iou(a, b):
+    """ IoU ของกรอบ (top, right, bottom, left) """
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    area_a = max(0, a[1] - a[3]) * max(0, a[2] - a[0])
+    area_b = max(0, b[1] - b[3]) * max(0, b[2] - b[0])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _center_in(box, region):
+    """ จุดกลางกรอบ (top, right, bottom, left) อยู่ใน region หรือไม่ """
+    cy, cx = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+    return region[0] <= cy <= region[2] and region[3] <= cx <= region[1]
+
+
+class Track:
+    """ ใบหน้าหนึ่งคนที่ถูกติดตามอยู่ — id คงที่ตลอดที่ยังอยู่ในภาพ """
+
+    def __init__(self, track_id, box, landmarks):
+        self.id = track_id
+        self.box = box              # (top, right, bottom, left) พิกัดเฟรมเต็ม
+        self.landmarks = landmarks  # {"left_eye": [(x, y), ...], "right_eye": [...]} หรือ None
+        self.name = "Unknown"
+        self.distance = math.inf    # ระยะ encoding ถึงใบหน้าที่รู้จักที่ใกล้สุด
+        self.identified = False
+        self.confidence = 1.0       # คุณภาพการติดตาม: IoU ตอน keyframe × สัดส่วนจุดที่ flow ตามได้
+        self.keyframes_since_id = 0
+        self.misses = 0
+        self.age = 0
+
+
+class FaceTracker:
+    """
+    Args:
+        iou_threshold: IoU ขั้นต่ำที่ถือว่า detection เป็นคนเดียวกับ track เดิม
+        max_misses: keyframe ที่หาไม่เจอติดกันได้กี่ครั้งก่อนทิ้ง track
+        min_confidence: ต่ำกว่านี้ → เข้ารหัสระบุตัวตนใหม่ใน keyframe ถัดไป
+        retry_unknown_every / reverify_every: เข้ารหัสซ้ำทุกกี่ keyframe สำหรับ Unknown / คนที่รู้จักแล้ว
+        detect_budget_ms: เวลาตรวจจับเฉลี่ยต่อเฟรมที่ยอมได้ → ใช้คำนวณระยะห่าง keyframe
+        min_interval / max_interval: ขอบเขตระยะห่าง keyframe (เฟรม)
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=2, min_confidence=0.5,
+                 retry_unknown_every=5, reverify_every=30,
+                 detect_budget_ms=30.0, min_interval=1, max_interval=8):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.min_confidence = min_confidence
+        self.retry_unknown_every = retry_unknown_every
+        self.reverify_every = reverify_every
+        self.detect_budget_ms = detect_budget_ms
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+        self.tracks = []
+        self.interval = min_interval
+        self._next_id = 1
+        self._frames_since_detect = 0
+        self._force_detect = True
+        self._prev_gray = None
+        self.stats = {"keyframes": 0, "tracked_frames": 0, "encodings": 0, "encodings_skipped": 0}
+
+    # ----- keyframe -----
+    def needs_detection(self):
+        return self._force_detect or not self.tracks or self._frames_since_detect + 1 >= self.interval
+
+    def needs_identity(self, track):
+        if not track.identified or track.confidence < self.min_confidence:
+            return True
+        every = self.retry_unknown_every if track.name == "Unknown" else self.reverify_every
+        return track.keyframes_since_id >= every
+
+    def associate(self, boxes):
+        """
+        จับคู่ detection กับ track แบบ greedy ตาม IoU มากสุดก่อน
+        → (matches [(track, det_idx, iou)], det_idx ที่ไม่มีคู่)
+        """
+        pairs = sorted(
+            ((iou(t.box, box), ti, di) for ti, t in enumerate(self.tracks) for di, box in enumerate(boxes)),
+            reverse=True,
+        )
+        used_t, used_d, matches = set(), set(), []
+        for score, ti, di in pairs:
+            if score < self.iou_threshold:
+                break
+            if ti in used_t or di in used_d:
+                continue
+            used_t.add(ti)
+            used_d.add(di)
+            matches.append((self.tracks[ti], di, score))
+        unmatched = [di for di in range(len(boxes)) if di not in used_d]
+        return matches, unmatched
+
+    def apply_detections(self, gray, boxes, landmarks, identify, region=None):
+        """
+        อัปเดต track จาก keyframe
+        Args:
+            boxes / landmarks: ผลตรวจจับของเฟรมนี้ (พิกัดเต็ม)
+            identify: callable(list ของ det_idx) → list ของ (name, distance) ; เรียกเฉพาะใบหน้าที่ต้องระบุตัวตน
+            region: บริเวณที่ตรวจจับ (top, right, bottom, left) ; None = ทั้งเฟรม
+                    track ที่อยู่นอก region ไม่ถูกนับว่าหาย (ไม่ได้ถูกตรวจ) แค่เลื่อนตาม optical flow ต่อ
+        """
+        matches, unmatched = self.associate(boxes)
+        matched_ids = {t.id for t, _, _ in matches}
+
+        new_tracks = []
+        for di in unmatched:
+            track = Track(self._next_id, boxes[di], landmarks[di])
+            self._next_id += 1
+            new_tracks.append((track, di))
+
+        for track, di, score in matches:
+            track.box = boxes[di]
+            track.landmarks = landmarks[di]
+            track.confidence = score
+            track.misses = 0
+            track.keyframes_since_id += 1
+
+        to_identify = [(t, di) for t, di, _ in matches if self.needs_identity(t)] + new_tracks
+        if to_identify:
+            for (track, _), (name, distance) in zip(to_identify, identify([di for _, di in to_identify])):
+                track.name = name
+                track.distance = distance
+                track.identified = True
+                track.keyframes_since_id = 0
+        self.stats["encodings"] += len(to_identify)
+        self.stats["encodings_skipped"] += len(matches) + len(new_tracks) - len(to_identify)
+
+        survivors = []
+        for track in self.tracks:
+            if track.id not in matched_ids and (region is None or _center_in(track.box, region)):
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+        self.tracks = survivors + [t for t, _ in new_tracks]
+
+        self.stats["keyframes"] += 1
+        self._frames_since_detect = 0
+        self._force_detect = False
+        if region is not None and self._prev_gray is not None and self._prev_gray.shape == gray.shape:
+            # track นอก region (ไม่ได้ถูกตรวจ ; ที่หายใน region มี misses แล้วจึงถูกข้าม)
+            self._propagate_tracks(gray, [t for t in survivors if t.id not in matched_ids])
+        self._prev_gray = gray
+
+    def update_interval(self, detect_ms):
+        """ keyframe ถัดไปห่างกี่เฟรม: ให้ต้นทุนตรวจจับเฉลี่ยต่อเฟรมไม่เกิน detect_budget_ms """
+        wanted = math.ceil(detect_ms / self.detect_budget_ms) if self.detect_budget_ms > 0 else self.max_interval
+        self.interval = max(self.min_interval, min(self.max_interval, wanted))
+
+    # ----- เฟรมระหว่าง keyframe -----
+    def propagate(self, gray):
+        """ เลื่อนกรอบและจุดตาของทุก track ตาม optical flow จากเฟรมก่อนหน้า """
+        self._frames_since_detect += 1
+        self.stats["tracked_frames"] += 1
+        if self._prev_gray is None or self._prev_gray.shape != gray.shape:
+            self._force_detect = True
+            self._prev_gray = gray
+            return
+
+        self._propagate_tracks(gray, self.tracks)
+        self._prev_gray = gray
+
+    def _propagate_tracks(self, gray, tracks):
+        for track in tracks:
+            if track.misses:
+                continue
+            points = self._track_points(track)
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(
+                self._prev_gray, gray, points, None, winSize=(15, 15), maxLevel=2)
+            good = status.reshape(-1) == 1
+            quality = float(good.mean()) if len(good) else 0.0
+            track.confidence *= quality
+            if quality < 0.5:
+                # ตามไม่ได้แล้ว → ตรวจจับใหม่เฟรมหน้า
+                self._force_detect = True
+                continue
+            dx, dy = np.median((moved - points).reshape(-1, 2)[good], axis=0)
+            top, right, bottom, left = track.box
+            track.box = (int(round(top + dy)), int(round(right + dx)),
+                         int(round(bottom + dy)), int(round(left + dx)))
+            if track.landmarks:
+                track.landmarks = {key: [(int(round(x + dx)), int(round(y + dy))) for x, y in pts]
+                                   for key, pts in track.landmarks.items()}
+
+    @staticmethod
+    def _track_points(track):
+        """ จุดที่ใช้ทำ flow: จุดรอบตา (ถ้ามี) + ตาราง 3x3 ในกรอบหน้า """
+        top, right, bottom, left = track.box
+        pts = [(left + (right - left) * fx, top + (bottom - top) * fy)
+               for fx in (0.25, 0.5, 0.75) for fy in (0.25, 0.5, 0.75)]
+        if track.landmarks:
+            for eye_pts in track.landmarks.values():
+                pts.extend(eye_pts)
+        return np.asarray(pts, dtype=np.float32).reshape(-1, 1, 2)
+
+    # ----- ผลลัพธ์ -----
+    def active_tracks(self):
+        """ track ที่เห็นในเฟรมล่าสุด (ไม่นับที่หลุดไปใน keyframe ก่อน) """
+        return [t for t in self.tracks if t.misses == 0]
+
+    def reset(self):
+        self.tracks = []
+        self._frames_since_detect = 0
+        self._force_detect = True
+        self._prev_gray = None
@@ -0,0 +1,194 @@
+# frame_analysis.py — ตรวจตา (Open/Closed) ของใบหน้าในเฟรม
+# ใช้ได้ทั้งจาก main.py (สตรีมสด) และสคริปต์ benchmark / ประมวลผลย้อนหลัง
+# ทุกฟังก์ชันรับ SleepDetector เป็นพารามิเตอร์ ไม่ผูกกับ global ของเซิร์ฟเวอร์
+
+import time
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+
+# ใช้ landmark เพื่อหา “ดวงตา”
+import face_recognition as fr
+
+
+def _clip(v, lo, hi):
+    return max(lo, min(int(v), hi))
+
+def clip_box(box, shape):
+    """ กัน index หลุดขอบ: (top, right, bottom, left) → ค่าที่อยู่ในเฟรม """
+    top, right, bottom, left = box
+    return (max(0, top), min(shape[1]-1, right), min(shape[0]-1, bottom), max(0, left))
+
+def crop_eye(frame_bgr, pts):
+    """ crop รอบจุด landmark ของตาหนึ่งข้าง (เผื่อขอบ 30%) → รูป หรือ None ถ้าว่าง """
+    H, W = frame_bgr.shape[:2]
+    xs = [p[0] for p in pts]; ys = [p[1] for p in pts]
+    x_min, x_max = min(xs), max(xs)
+    y_min, y_max = min(ys), max(ys)
+    w = x_max - x_min; h = y_max - y_min
+    pad = int(0.3 * max(w, h))
+    x0 = _clip(x_min - pad, 0, W - 1)
+    y0 = _clip(y_min - pad, 0, H - 1)
+    x1 = _clip(x_max + pad, 0, W - 1)
+    y1 = _clip(y_max + pad, 0, H - 1)
+    crop = frame_bgr[y0:y1, x0:x1].copy()
+    return crop if crop.size > 0 else None
+
+def eye_crops_from_landmarks(frame_bgr, landmarks) -> List[np.ndarray]:
+    """ รูปตา [left, right] จาก landmark ที่คำนวณไว้แล้ว (พิกัดของ frame_bgr) ; ไม่มี landmark → [] """
+    eye_crops: List[np.ndarray] = []
+    if landmarks and "left_eye" in landmarks and "right_eye" in landmarks:
+        for eye_key in ["left_eye", "right_eye"]:
+            crop = crop_eye(frame_bgr, landmarks[eye_key])
+            if crop is not None:
+                eye_crops.append(crop)
+    return eye_crops
+
+def extract_eye_crops(frame_bgr) -> List[np.ndarray]:
+    """ คืนลิสต์รูปตา [left, right] จากเฟรม ถ้าไม่เจอ → [] (ตรวจจับใบหน้า + landmark ใหม่ในรูปนี้) """
+    rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+    landmarks_list = fr.face_landmarks(rgb)
+    for lm in landmarks_list:
+        eye_crops = eye_crops_from_landmarks(frame_bgr, lm)
+        if eye_crops:
+            return eye_crops
+    return []
+
+def vote_eyes(per_eye, min_conf_for_closed=70.0):
+    """ rule-based รวมผล per_eye → (label, conf) """
+    closed_votes = [e for e in per_eye if e["label"].lower() == "closed" and e["conf"] >= min_conf_for_closed]
+    if closed_votes:
+        return "Closed", float(max(e["conf"] for e in closed_votes))
+    open_votes = [e for e in per_eye if e["label"].lower() == "open"]
+    return "Open", float(max([e["conf"] for e in open_votes], default=0.0))
+
+def predict_from_eyes(detector, frame_bgr, min_conf_for_closed=70.0, eyes=None):
+    """
+    รวมผลจากตาซ้าย/ขวา → (label, conf, per_eye)
+      - per_eye: [{"eye": "left"/"right", "label": "Open/Closed", "conf": float}, ...]
+      - label/ conf ระดับภาพ: ใช้ rule-based ตาม per_eye
+      - eyes: รูปตาที่ crop ไว้แล้ว (จาก landmark ของ FaceRecognizer.analyze_frame)
+              ถ้า None จะหา landmark ใหม่ใน frame_bgr
+    """
+    if eyes is None:
+        eyes = extract_eye_crops(frame_bgr)
+    per_eye = []
+    if eyes:
+        for i, eye in enumerate(eyes):
+            lbl, conf = detector.predict_from_array(eye, resize=True)
+            per_eye.append({
+                "eye": "left" if i == 0 else "right",
+                "label": lbl,
+                "conf": float(conf),
+            })
+        label, conf = vote_eyes(per_eye, min_conf_for_closed)
+        return label, conf, per_eye
+
+    # fallback: ใช้ทั้งเฟรม (กรณี landmark ไม่เจอ)
+    lbl, conf = detector.predict_from_array(frame_bgr, resize=True)
+    return lbl, float(conf), per_eye
+
+def predict_faces_batch(detector, face_crops: List[np.ndarray], min_conf_for_closed=70.0, eye_crops=None):
+    """
+    เหมือน predict_from_eyes แต่ทำทุกใบหน้าในเฟรมพร้อมกัน:
+    รวมรูปตาของทุกคนเป็น batch เดียว → detector.predict_batch (forward pass ครั้งเดียว)
+      - eye_crops: รูปตาต่อใบหน้าที่ crop ไว้แล้ว (จาก landmark ของ FaceRecognizer.analyze_frame)
+                   ถ้า None จะหา landmark ใหม่ในแต่ละ face crop
+    คืน list ของ (label, conf, per_eye) ตามลำดับ face_crops
+    """
+    crops: List[np.ndarray] = []
+    owners = []  # (index ใบหน้า, "left"/"right" หรือ None = ใช้ทั้งใบหน้าแทน)
+    for fi, face in enumerate(face_crops):
+        if face.size == 0:
+            continue
+        eyes = eye_crops[fi] if eye_crops is not None else extract_eye_crops(face)
+        if eyes:
+            for i, eye in enumerate(eyes):
+                crops.append(eye)
+                owners.append((fi, "left" if i == 0 else "right"))
+        else:
+            crops.append(face)
+            owners.append((fi, None))
+
+    preds = detector.predict_batch(crops, resize=True)
+
+    per_eyes: List[List[Dict[str, Any]]] = [[] for _ in face_crops]
+    fallbacks: Dict[int, tuple] = {}
+    for (fi, eye), (lbl, conf) in zip(owners, preds):
+        if eye is None:
+            fallbacks[fi] = (lbl, float(conf))
+        else:
+            per_eyes[fi].append({"eye": eye, "label": lbl, "conf": float(conf)})
+
+    results = []
+    for fi, per_eye in enumerate(per_eyes):
+        if per_eye:
+            label, conf = vote_eyes(per_eye, min_conf_for_closed)
+            results.append((label, conf, per_eye))
+        elif fi in fallbacks:
+            results.append((fallbacks[fi][0], fallbacks[fi][1], []))
+        else:
+            results.append(("Unknown", 0.0, []))
+    return results
+
+def predict_faces(detector, face_crops: List[np.ndarray], batched: bool = True, eye_crops=None):
+    """
+    ตรวจตาทุกใบหน้า → (results, latency_ms)
+      - batched=True : predict_faces_batch (forward pass เดียวต่อเฟรม)
+      - batched=False: predict_from_eyes ทีละใบหน้า (ไว้เทียบ latency) ใช้ eye_crops ชุดเดียวกัน
+    """
+    t0 = time.perf_counter()
+    if batched:
+        try:
+            results = predict_faces_batch(detector, face_crops, eye_crops=eye_crops)
+        except Exception:
+            results = [("Unknown", 0.0, [])] * len(face_crops)
+    else:
+        results = []
+        for fi, face in enumerate(face_crops):
+            try:
+                results.append(predict_from_eyes(detector, face,
+                                                 eyes=eye_crops[fi] if eye_crops is not None else None))
+            except Exception:
+                results.append(("Unknown", 0.0, []))
+    return results, (time.perf_counter() - t0) * 1000.0
+
+def analyze_faces(recognizer, detector, frame_bgr, batched: bool = True, estimator=None, timings=None):
+    """
+    ขั้นวิเคราะห์ต่อเฟรมแบบรวม: ตรวจจับใบหน้า + landmark ครั้งเดียว (recognizer.analyze_frame)
+    แล้วใช้ landmark ชุดเดียวกันทั้งระบุชื่อและ crop ตา → ตรวจตาทุกคนใน batch เดียว
+      - estimator: EyeStateEstimator (ถ้ามี) เกลี่ยสถานะตาต่อ track และเรียก CNN เฉพาะใบหน้าที่ก้ำกึ่ง
+      - timings: dict (ถ้ามี) ได้เวลาเป็นวินาทีของ "detect" (ใบหน้า + ชื่อ + landmark) และ "eyes" (ตรวจตา)
+    Returns:
+        (boxes, names, face_results, eye_ms, track_ids)
+          boxes: (top, right, bottom, left) ที่กันหลุดขอบแล้ว
+          face_results: list ของ (label, conf, per_eye)
+          track_ids: id ของ track ต่อใบหน้า (None ถ้า recognizer ปิด tracking)
+    """
+    t_detect = time.perf_counter()
+    face_locations, names, landmarks, track_ids = recognizer.analyze_frame(frame_bgr)
+    if timings is not None:
+        timings["detect"] = time.perf_counter() - t_detect
+    boxes = [clip_box(box, frame_bgr.shape) for box in face_locations]
+    face_crops = [frame_bgr[t:b, l:r].copy() for (t, r, b, l) in boxes]
+    # ทั้งสองโหมดใช้รูปตาจาก landmark ชุดเดียวกัน → เทียบกันได้ตรง ๆ (ต่างกันแค่การรวม batch)
+    eye_crops = [eye_crops_from_landmarks(frame_bgr, lm) for lm in landmarks]
+    if estimator is None or not batched:
+        face_results, eye_ms = predict_faces(detector, face_crops, batched=batched, eye_crops=eye_crops)
+        if timings is not None:
+            timings["eyes"] = eye_ms / 1000.0
+        return boxes, names, face_results, eye_ms, track_ids
+
+    def classify(indices):
+        results, _ = predict_faces(detector, [face_crops[i] for i in indices], batched=True,
+                                   eye_crops=[eye_crops[i] for i in indices])
+        return results
+
+    t0 = time.perf_counter()
+    keys = [tid if tid is not None else name for tid, name in zip(track_ids, names)]
+    face_results = estimator.estimate(keys, landmarks, recognizer.last_was_keyframe, classify)
+    eye_sec = time.perf_counter() - t0
+    if timings is not None:
+        timings["eyes"] = eye_sec
+    return boxes, names, face_results, eye_sec * 1000.0, track_ids
@@ -0,0 +1,136 @@
+# inference_pool.py — ตัวตรวจตาที่หลายกล้องใช้ร่วมกัน: รวมรูปตาจากทุกกล้องเป็น batch เดียวก่อนเรียกโมเดล
+#
+#   กล้อง A ──┐
+#   กล้อง B ──┼──► [คิวคำขอ (จำกัดขนาด)] ──► worker thread: รวมคำขอที่รออยู่ ≤ max_batch รูป / ≤ max_wait_ms
+#   กล้อง C ──┘                                  → SleepDetector.predict_batch ครั้งเดียว → แยกผลคืนแต่ละกล้อง
+#
+# interface เหมือน SleepDetector (predict_batch / predict_from_array) → ส่งให้ frame_analysis แทน detector ได้เลย
+# คิวเต็ม = inference thread ของกล้องรอ (backpressure) แล้วคิวเฟรมของกล้องนั้นทิ้งเฟรมเก่าเอง
+# รอคำขอจากกล้องอื่นเฉพาะเมื่อมี thread อื่นส่งคำขอมาเมื่อเร็ว ๆ นี้ (active_window_sec) — กล้องเดียว
+# หรือเรียกทีละ crop (eye_batch=false) จะไม่เสีย max_wait_ms ทุกครั้ง
+
+import queue
+import threading
+import time
+
+
+class _Request:
+    def __init__(self, crops, resize):
+        self.crops = crops
+        self.resize = resize
+        self.producer = threading.get_ident()
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchingInferencePool:
+    """
+    Args:
+        detectors: SleepDetector หนึ่งตัว หรือ list — หนึ่ง worker thread ต่อ detector
+                   (ปกติหนึ่งตัวก็พอ เพราะ TensorFlow ใช้หลายคอร์ในแต่ละ batch อยู่แล้ว ; detector ตัวเดียวกัน
+                    ใช้กับหลาย worker ได้ — batch buffer ของ SleepDetector แยกต่อ thread)
+        max_batch: จำนวนรูปตาสูงสุดต่อ forward pass
+        max_wait_ms: รอคำขอจากกล้องอื่นมาร่วม batch ได้นานสุดเท่านี้
+        max_pending: จำนวนคำขอที่รอได้ (เกินนี้ผู้เรียกต้องรอ)
+        active_window_sec: thread ที่ส่งคำขอภายในช่วงนี้นับเป็นผู้ส่งที่ยังทำงาน (ใช้ตัดสินว่าควรรอหรือไม่)
+    """
+
+    def __init__(self, detectors, max_batch=64, max_wait_ms=5.0, max_pending=32, active_window_sec=1.0):
+        self.detectors = detectors if isinstance(detectors, (list, tuple)) else [detectors]
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.active_window = active_window_sec
+        self._producers = {}   # thread ident → เวลาที่ส่งคำขอล่าสุด
+        self._requests = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self.stats = {"batches": 0, "requests": 0, "crops": 0, "max_batch_seen": 0}
+        self._threads = [threading.Thread(target=self._worker, args=(detector,), name=f"inference-pool-{i}",
+                                          daemon=True)
+                         for i, detector in enumerate(self.detectors)]
+        for t in self._threads:
+            t.start()
+
+    # ----- interface แบบ SleepDetector -----
+    def predict_batch(self, img_arrays, resize=True):
+        """ ส่งรูปเข้าคิวแล้วรอผล → list ของ (label, conf) ตามลำดับเดิม """
+        if not len(img_arrays):
+            return []
+        req = _Request(list(img_arrays), resize)
+        with self._lock:
+            self._producers[req.producer] = time.monotonic()
+        self._requests.put(req)
+        req.done.wait()
+        if req.error is not None:
+            raise req.error
+        return req.results
+
+    def predict_from_array(self, img_array, resize=True):
+        return self.predict_batch([img_array], resize=resize)[0]
+
+    def snapshot(self):
+        with self._lock:
+            out = dict(self.stats)
+        out["pending"] = self._requests.qsize()
+        out["active_producers"] = self._active_producers()
+        out["workers"] = len(self.detectors)
+        out["avg_batch"] = round(out["crops"] / out["batches"], 2) if out["batches"] else 0.0
+        out["avg_requests_per_batch"] = round(out["requests"] / out["batches"], 2) if out["batches"] else 0.0
+        return out
+
+    # ----- worker -----
+    def _active_producers(self):
+        """ จำนวน thread ที่ส่งคำขอภายใน active_window (ลบตัวที่เงียบไปแล้ว) """
+        cutoff = time.monotonic() - self.active_window
+        with self._lock:
+            for ident in [i for i, t in self._producers.items() if t < cutoff]:
+                del self._producers[ident]
+            return len(self._producers)
+
+    def _collect(self):
+        """
+        คำขอแรก (รอได้ไม่จำกัด) + คำขอที่รออยู่แล้ว ; รอเพิ่มได้ถึง max_wait เฉพาะเมื่อยังมีผู้ส่งที่ active
+        ซึ่งยังไม่อยู่ใน batch นี้ (ไม่งั้นไม่มีใครจะส่งมาร่วม → ส่งเข้าโมเดลทันที)
+        """
+        batch = [self._requests.get()]
+        n = len(batch[0].crops)
+        owners = {batch[0].producer}
+        active = self._active_producers()
+        deadline = time.perf_counter() + self.max_wait
+        while n < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0 and len(owners) < active:
+                    req = self._requests.get(timeout=remaining)
+                else:
+                    req = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(req)
+            owners.add(req.producer)
+            n += len(req.crops)
+        return batch, n
+
+    def _worker(self, detector):
+        while True:
+            batch, n = self._collect()
+            # resize=False ต้องได้รูปขนาด input พอดี → ไม่รวม forward pass กับคำขอที่ resize
+            for resize in {req.resize for req in batch}:
+                group = [req for req in batch if req.resize == resize]
+                crops = [c for req in group for c in req.crops]
+                try:
+                    preds = detector.predict_batch(crops, resize=resize)
+                    i = 0
+                    for req in group:
+                        req.results = preds[i:i + len(req.crops)]
+                        i += len(req.crops)
+                except Exception as e:
+                    for req in group:
+                        req.error = e
+            for req in batch:
+                req.done.set()
+            with self._lock:
+                self.stats["batches"] += 1
+                self.stats["requests"] += len(batch)
+                self.stats["crops"] += n
+                self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], n)
@@ -1,16 +1,16 @@
 # main.py — FastAPI + Eye-only sleep detection + Face recognition + MJPEG stream (FULL)
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, status
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, JSONResponse, Response, FileResponse, PlainTextResponse
 from pydantic import BaseModel, EmailStr
-from pymongo import MongoClient
-from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from typing import Dict, Any, List
 import shutil
 import os
+import json
 import base64
 from PIL import Image
 from io import BytesIO
@@ -18,15 +18,27 @@ import cv2
 import numpy as np
 import time
 import asyncio
+import threading
+import uuid
 from starlette.requests import Request
 from starlette.responses import StreamingResponse
-import httpx
 
-# ใช้ landmark เพื่อหา “ดวงตา”
-import face_recognition as fr
-
-from face_recognizer import FaceRecognizer
+from face_recognizer import FaceRecognizer, IMAGE_EXTS
 from sleep_detector import SleepDetector
+from frame_analysis import analyze_faces
+from stream_pipeline import FramePipeline
+from stream_quality import QualityController, FramePacer
+from video_analysis import analyze_video, list_videos, save_intervals
+from inference_pool import BatchingInferencePool
+from camera_registry import (Camera, CameraRegistry, is_file_source, open_capture, parse_source,
+                             resolve_file_source)
+from status_channel import StatusHub, sse_message
+from snapshot_store import SnapshotStore, etag_matches
+from sleep_events import SleepEventBus
+from sleep_history import SleepEpisodeStore, episode_document, serialize_episode
+from data_access import Database, UserStore, BehaviorStore
+from motion_gate import parse_rois
+from metrics import Registry, PipelineMetrics, SamplingProfiler, watch_event_loop_lag
 
 app = FastAPI()
 app.add_middleware(
@@ -41,30 +53,72 @@ os.makedirs("static", exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # ===== DB =====
-client = MongoClient("mongodb://localhost:27017/")
-db = client["Project_sleep_classroom"]
-users_collection = db["users"]
-behavior_collection = db["student_behavior_report"]
+# pymongo ใน thread pool ของ DB เอง (data_access.Database) — route ไม่บล็อก event loop ที่ขับสตรีม
+db = Database(os.getenv("MONGO_URI", "mongodb://localhost:27017/"), os.getenv("MONGO_DB", "Project_sleep_classroom"),
+              max_pool_size=int(os.getenv("MONGO_POOL_SIZE", "32")))
+users = UserStore(db)
+behaviors = BehaviorStore(db)
+sleep_intervals_collection = db["sleep_intervals"]   # ผลวิเคราะห์คลิปย้อนหลัง (video_analysis.py) — แยกจาก sleep_episodes ของกล้องสด
+sleep_episodes_collection = db["sleep_episodes"]     # การหลับแต่ละครั้งจากกล้องสด (เขียนเมื่อ episode จบ)
+episode_store = SleepEpisodeStore(sleep_episodes_collection)
 
 # ===== AI components =====
-face_recognizer = FaceRecognizer()
-sleep_detector = SleepDetector()
-
-# ===== Stream state =====
-is_streaming: bool = False
-latest_status: Dict[str, Any] = {
-    "label": None,
-    "confidence": None,
-    "faces": [],
-    "per_eye": [],
-    "timestamp": None,
-    "snapshot": None,
-}
+# ตัวตรวจจับใบหน้าของเฟรมสด: FACE_BACKEND=hog (ค่าเริ่มต้น) หรือ mediapipe
+# เทียบ latency / recall ของแต่ละตัวบนเฟรมจริงได้ด้วย benchmarks/bench_backends.py
+face_backend: str = os.getenv("FACE_BACKEND", "hog")
+# ตัวหลัก: เจ้าของดัชนีใบหน้า (ลงทะเบียน) + /process_frame ; รูปเดี่ยวไม่ต่อเนื่องกัน จึงไม่ใช้ tracking
+face_recognizer = FaceRecognizer(backend=face_backend, tracking=False)
+# โมเดลตรวจตา: EYE_MODEL_BACKEND=keras (ค่าเริ่มต้น, traced tf.function + warm-up ตอน startup)
+# หรือ tflite + EYE_MODEL_PATH=ไฟล์จาก export_eye_model.py → ไม่ต้อง import TensorFlow (เริ่มเร็ว RSS ต่ำ)
+eye_model_backend: str = os.getenv("EYE_MODEL_BACKEND", "keras")
+sleep_detector = SleepDetector(model_path=os.getenv("EYE_MODEL_PATH") or None, backend=eye_model_backend,
+                               inference="compiled")
+# ทุกกล้องส่งรูปตาเข้าคิวเดียว → รวมเป็น batch ข้ามกล้องก่อนเรียกโมเดล (ผู้ใช้ sleep_detector ทุกทางผ่านตัวนี้)
+eye_pool = BatchingInferencePool(sleep_detector)
+
+# event การหลับ (เริ่ม/จบ หนึ่งครั้งต่อ episode) จาก inference thread → ผู้ฟังบน event loop (ดู _start_sleep_consumers)
+sleep_bus = SleepEventBus()
+
+# ===== Cameras =====
+# กล้องแต่ละตัวมีสถานะของตัวเอง (camera_registry.Camera): tracker, สถานะตา, ตัวนับเวลาหลับ, latest_status, pipeline
+# ดัชนีใบหน้าใช้ร่วมกัน → ลงทะเบียนครั้งเดียวเห็นทุกกล้อง
+# MOTION_GATE=0 → ตรวจจับใบหน้าทุก keyframe แม้ฉากนิ่ง (ค่าเริ่มต้น: ข้ามเมื่อนิ่ง ดู motion_gate.py)
+cameras = CameraRegistry(face_recognizer.index, backend=face_backend, bus=sleep_bus,
+                         motion_gate=os.getenv("MOTION_GATE", "1") == "1")
+DEFAULT_CAMERA = "0"   # endpoint เดิมที่ไม่มี camera_id (/video_feed, /stream_status ...) ใช้กล้องนี้
+# CAMERA_ROIS="x0,y0,x1,y1;..." (สัดส่วนของเฟรม) → ตรวจจับเฉพาะบริเวณที่นั่ง
+cameras.register(DEFAULT_CAMERA, os.getenv("CAMERA_SOURCE", "0"), rois=parse_rois(os.getenv("CAMERA_ROIS")))
+# push สถานะที่เปลี่ยนให้ dashboard ทุกตัวผ่าน /events (แทนการ poll)
+status_hub = StatusHub()
+# รูปตอนเริ่มหลับ: หนึ่งรูปต่อครั้ง ใช้ JPEG ที่ encoder ของสตรีมเข้ารหัสแล้ว → /snapshots/{id}
+snapshot_store = SnapshotStore(os.getenv("SNAPSHOT_DIR", "snapshots"),
+                               max_age_days=float(os.getenv("SNAPSHOT_MAX_AGE_DAYS", "7")),
+                               max_total_mb=float(os.getenv("SNAPSHOT_MAX_TOTAL_MB", "500")))
+
+# ===== Metrics (/metrics) =====
+# latency ราย stage ต่อกล้อง, เฟรมที่วิเคราะห์/ทิ้ง, ใบหน้าและการเรียก CNN ต่อเฟรม, event loop lag
+metrics_registry = Registry()
+pipeline_metrics = PipelineMetrics(metrics_registry)
+loop_lag = metrics_registry.histogram("event_loop_lag_seconds", "How late the event loop woke up from a 100 ms sleep",
+                                      buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)).labels()
+stream_viewers = metrics_registry.gauge("stream_viewers", "MJPEG viewers per camera", ("camera",))
+camera_streaming = metrics_registry.gauge("camera_streaming", "1 if the camera stream is on", ("camera",))
+sse_clients = metrics_registry.gauge("sse_clients", "Connected /events clients").labels()
+eye_pool_crops = metrics_registry.counter("eye_pool_crops_total", "Eye crops classified by the shared pool").labels()
+eye_pool_batches = metrics_registry.counter("eye_pool_batches_total", "Forward passes of the shared pool").labels()
+motion_checks = metrics_registry.counter("motion_gate_checks_total", "Detections considered by the motion gate",
+                                        ("camera",))
+motion_skipped = metrics_registry.counter("motion_gate_skipped_total", "Detections skipped because the scene was static",
+                                         ("camera",))
+motion_pixels = metrics_registry.counter("motion_gate_pixels_total", "Frame pixels seen by the motion gate", ("camera",))
+motion_pixels_scanned = metrics_registry.counter("motion_gate_pixels_scanned_total",
+                                                 "Pixels passed on to face detection", ("camera",))
+sleep_events_total = metrics_registry.counter("sleep_events_total", "Sleep episode events published").labels()
+# sampling profiler ผ่าน POST /profile/{camera_id} — เปิดเมื่อ ENABLE_PROFILER=1 เท่านั้น
+profiler_enabled: bool = os.getenv("ENABLE_PROFILER") == "1"
 
 # ---- เพิ่มตัวแปรตรวจหลับต่อเนื่อง ----
 sleep_threshold_sec: float = 3.0          # ครบกี่วินาทีจึงถือว่า Sleep
-sleep_start_time: float | None = None     # ระดับภาพรวม (กรณีไม่มีใบหน้าชัดเจน)
-sleep_timers: Dict[str, float | None] = {}  # ระดับรายบุคคล key=ชื่อ (รวม Unknown)
 
 # ===== Schemas =====
 class FrameData(BaseModel):
@@ -85,6 +139,20 @@ class Behavior(BaseModel):
     student_id: str
     penalty: int
     created_at: datetime
+
+class CameraConfig(BaseModel):
+    id: str
+    source: str                 # "0" = อุปกรณ์ ; rtsp://... ; ไฟล์วิดีโอใน recordings_dir (วนซ้ำ ใช้แทนกล้องตอนทดสอบ)
+    backend: str | None = None  # None = FACE_BACKEND
+    flip: bool | None = None    # None = กลับภาพเฉพาะอุปกรณ์ (กล้องหน้า)
+    rois: List[List[float]] | None = None   # [[x0, y0, x1, y1], ...] สัดส่วน 0..1 ของเฟรม ; None = ทั้งเฟรม
+    motion_gate: bool | None = None         # None = MOTION_GATE
+
+class AnalysisJobRequest(BaseModel):
+    path: str                           # ไฟล์วิดีโอหรือโฟลเดอร์ ภายใน recordings_dir
+    workers: int | None = None          # None = ทุกคอร์
+    sample_fps: float = 5.0
+    recorded_at: datetime | None = None # เวลาเริ่มบันทึกคลิป (ถ้ารู้ → เก็บเวลาจริงของช่วงหลับ)
     
     
 # Sleep detection route
@@ -112,66 +180,12 @@ def serialize_behavior(behavior):
         "status": behavior.get("status", "active"),
     }
 
-def _clip(v, lo, hi):
-    return max(lo, min(int(v), hi))
-
-def extract_eye_crops(frame_bgr) -> List[np.ndarray]:
-    """ คืนลิสต์รูปตา [left, right] จากเฟรม ถ้าไม่เจอ → [] """
-    rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-    landmarks_list = fr.face_landmarks(rgb)
-    H, W = frame_bgr.shape[:2]
-    eye_crops: List[np.ndarray] = []
-    for lm in landmarks_list:
-        if "left_eye" in lm and "right_eye" in lm:
-            for eye_key in ["left_eye", "right_eye"]:
-                pts = lm[eye_key]
-                xs = [p[0] for p in pts]; ys = [p[1] for p in pts]
-                x_min, x_max = min(xs), max(xs)
-                y_min, y_max = min(ys), max(ys)
-                w = x_max - x_min; h = y_max - y_min
-                pad = int(0.3 * max(w, h))
-                x0 = _clip(x_min - pad, 0, W - 1)
-                y0 = _clip(y_min - pad, 0, H - 1)
-                x1 = _clip(x_max + pad, 0, W - 1)
-                y1 = _clip(y_max + pad, 0, H - 1)
-                crop = frame_bgr[y0:y1, x0:x1].copy()
-                if crop.size > 0:
-                    eye_crops.append(crop)
-        if eye_crops:
-            break
-    return eye_crops
-
-def predict_from_eyes(frame_bgr, min_conf_for_closed=70.0):
-    """
-    รวมผลจากตาซ้าย/ขวา → (label, conf, per_eye)
-      - per_eye: [{"eye": "left"/"right", "label": "Open/Closed", "conf": float}, ...]
-      - label/ conf ระดับภาพ: ใช้ rule-based ตาม per_eye
-    """
-    eyes = extract_eye_crops(frame_bgr)
-    per_eye = []
-    if eyes:
-        for i, eye in enumerate(eyes):
-            lbl, conf = sleep_detector.predict_from_array(eye, resize=True)
-            per_eye.append({
-                "eye": "left" if i == 0 else "right",
-                "label": lbl,
-                "conf": float(conf),
-            })
-        closed_votes = [e for e in per_eye if e["label"].lower() == "closed" and e["conf"] >= min_conf_for_closed]
-        if closed_votes:
-            return "Closed", float(max(e["conf"] for e in closed_votes)), per_eye
-        open_votes = [e for e in per_eye if e["label"].lower() == "open"]
-        return "Open", float(max([e["conf"] for e in open_votes], default=0.0)), per_eye
-
-    # fallback: ใช้ทั้งเฟรม (กรณี landmark ไม่เจอ)
-    lbl, conf = sleep_detector.predict_from_array(frame_bgr, resize=True)
-    return lbl, float(conf), per_eye
-
 # ===== Users & Behavior routes =====
 
 class WhoSleepData(BaseModel):
     name: str
     time: str
+    camera: str | None = None
     
 class DeleteSleepData(BaseModel):
     name: str
@@ -185,26 +199,106 @@ async def get_who_sleeping():
 async def delete_who_sleeping(data: DeleteSleepData):
     global sleepingList
     sleepingList = [entry for entry in sleepingList if entry["name"] != data.name]
+    status_hub.update_sleeping(sleepingList)
     return {"message": "Deleted from sleeping list", "list": sleepingList}
 
 @app.post('/who-sleeping')
 async def post_who_sleeping(data: WhoSleepData):
     global sleepingList
-    sleepingList.append({"name": data.name, "time": data.time})
+    sleepingList.append({"name": data.name, "time": data.time, "camera": data.camera})
     if len(sleepingList) > 5:
         sleepingList = sleepingList[-5:]
+    status_hub.update_sleeping(sleepingList)
     return {"message": "Added to sleeping list", "list": sleepingList}
 
+# ===== Sleep event consumers =====
+# เฟรมสดไม่เรียก /who-sleeping แล้ว: SleepEpisodes ส่ง event ครั้งเดียวตอนเริ่ม/จบ ผ่าน sleep_bus
+# ผู้ฟังแต่ละตัวมีคิวของตัวเอง → DB ช้าไม่ทำให้รายการคนหลับ / dashboard ช้าตาม
+def _episode_time(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+async def _consume_sleeping_list(sub):
+    """ start → เพิ่มเข้า sleepingList ; end → ใส่เวลาตื่นให้รายการเดิม """
+    global sleepingList
+    while True:
+        event = await sub.get()
+        if event["type"] == "start":
+            print(f"📢 แจ้งเตือน {event['name']} หลับแล้ว (กล้อง {event['camera']})")
+            sleepingList.append({"name": event["name"], "time": _episode_time(event["start"]),
+                                 "camera": event["camera"], "episode_id": event["episode_id"]})
+            if len(sleepingList) > 5:
+                sleepingList = sleepingList[-5:]
+        else:
+            # สร้าง dict ใหม่ (ไม่แก้ของเดิม) → StatusHub เห็นว่ารายการเปลี่ยน
+            sleepingList = [dict(entry, end=_episode_time(event["end"]), duration_sec=event["duration_sec"])
+                            if entry.get("episode_id") == event["episode_id"] else entry
+                            for entry in sleepingList]
+        status_hub.update_sleeping(sleepingList)
+
+async def _consume_episode_store(sub, max_batch: int = 200, max_wait_sec: float = 1.0):
+    """
+    end → บันทึก episode ลง sleep_episodes
+    รวม event ที่มาใกล้กัน (ไม่เกิน max_batch / รอไม่เกิน max_wait_sec) เป็น bulk insert เดียว ;
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await sub.get()]
+        deadline = loop.time() + max_wait_sec
+        while len(batch) < max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(sub.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        docs = [episode_document(e) for e in batch if e["type"] == "end"]
+        if not docs:
+            continue
+        try:
+            await db.run(episode_store.insert_many, docs)
+        except Exception as e:
+            print(f"⚠️ บันทึก sleep episode ไม่สำเร็จ ({len(docs)} รายการ): {e}")
+
+async def _consume_push(sub):
+    """ ส่ง event ดิบให้ dashboard ทาง /events (event: episode) """
+    while True:
+        status_hub.publish_episode(await sub.get())
+
+_background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def _ensure_indexes():
+    for store in (users, behaviors, episode_store):
+        try:
+            await db.run(store.ensure_indexes)
+        except Exception as e:
+            print(f"⚠️ สร้าง index ของ {store.collection.name} ไม่สำเร็จ: {e}")
+
+@app.on_event("startup")
+async def _start_sleep_consumers():
+    for name, consumer in (("sleeping_list", _consume_sleeping_list),
+                           ("episode_store", _consume_episode_store),
+                           ("push", _consume_push)):
+        _background_tasks.append(asyncio.create_task(consumer(sleep_bus.subscribe(name))))
+
+@app.on_event("shutdown")
+async def _close_database():
+    # หยุดงานเบื้องหลัง (ใช้ db.run) ก่อน แล้วปิด thread pool + MongoClient ของ Database
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    db.close()
+
 @app.post("/signup")
 async def signup(user: User):
-    if users_collection.find_one({"email": user.email}) or users_collection.find_one({"username": user.username}):
+    if not await users.create(user.dict()):
         raise HTTPException(status_code=400, detail="Username or email already exists")
-    users_collection.insert_one(user.dict())
     return {"message": "User registered successfully"}
 
 @app.post("/login")
 async def login(user: UserLogin):
-    found = users_collection.find_one({"username": user.username, "password": user.password})
+    found = await users.authenticate(user.username, user.password)
     if not found:
         raise HTTPException(status_code=401, detail="Invalid username or password")
     return {
@@ -218,17 +312,16 @@ async def login(user: UserLogin):
 
 @app.get("/users")
 async def get_users():
-    users = users_collection.find()
-    return [serialize_user(u) for u in users]
+    return [serialize_user(u) for u in await users.all()]
 
 @app.get("/search-students")
-async def search_students(name: str = ""):
-    results = users_collection.find({"role": "student", "username": {"$regex": name, "$options": "i"}})
-    return [serialize_user(u) for u in results]
+async def search_students(name: str = "", limit: int = Query(50, ge=1, le=200)):
+    # ชื่อขึ้นต้นด้วย name (ไม่สนตัวพิมพ์) → ใช้ index (role, username_lower)
+    return [serialize_user(u) for u in await users.search_students(name.strip(), limit)]
 
 @app.get("/student/{username}")
 async def get_student_by_username(username: str):
-    user = users_collection.find_one({"username": username, "role": "student"})
+    user = await users.get_student(username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return {
@@ -241,78 +334,53 @@ async def get_student_by_username(username: str):
 
 @app.put("/users/{user_id}")
 async def update_user(user_id: str, user: User):
-    result = users_collection.update_one({"_id": ObjectId(user_id)}, {"$set": user.dict()})
-    if result.matched_count == 0:
+    try:
+        matched = await users.update(user_id, user.dict())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Username or email already exists")
+    if matched == 0:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User updated successfully"}
 
 @app.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(user_id: str):
-    result = users_collection.delete_one({"_id": ObjectId(user_id)})
-    if result.deleted_count == 0:
+    if await users.delete(user_id) == 0:
         raise HTTPException(status_code=404, detail="User not found")
 
 @app.get("/behavior-reports")
 async def get_all_behavior_reports():
-    reports = behavior_collection.find()
-    return [serialize_behavior(r) for r in reports]
+    return [serialize_behavior(r) for r in await behaviors.all()]
 
 @app.get("/behavior-reports/{report_id}")
 async def get_behavior_report(report_id: str):
-    report = None
-    if len(report_id) == 24:
-        try:
-            report = behavior_collection.find_one({"_id": ObjectId(report_id)})
-        except Exception:
-            report = None
-    if not report:
-        report = behavior_collection.find_one({"_id": report_id})
+    report = await behaviors.get(report_id)
     if not report:
         raise HTTPException(status_code=404, detail=f"Behavior report with ID '{report_id}' not found")
     return serialize_behavior(report)
 
 @app.get("/behavior-reports/student/{student_id}")
 async def get_student_behavior_reports(student_id: str):
-    reports = behavior_collection.find({"student_id": student_id})
-    return [serialize_behavior(r) for r in reports]
+    return [serialize_behavior(r) for r in await behaviors.by_student(student_id)]
 
 @app.post("/behavior-reports")
 async def create_behavior_report(behavior: Behavior):
     d = behavior.dict()
     d["created_at"] = datetime.now()
     d["status"] = "active"
-    result = behavior_collection.insert_one(d)
-    new_report = behavior_collection.find_one({"_id": result.inserted_id})
-    return serialize_behavior(new_report)
+    return serialize_behavior(await behaviors.create(d))
 
 @app.put("/behavior-reports/{report_id}")
 async def update_behavior_report(report_id: str, behavior: Behavior):
     d = behavior.dict()
     d["updated_at"] = datetime.now()
-    result = None
-    if len(report_id) == 24:
-        try:
-            result = behavior_collection.update_one({"_id": ObjectId(report_id)}, {"$set": d})
-        except Exception:
-            result = None
-    if not result or result.matched_count == 0:
-        result = behavior_collection.update_one({"_id": report_id}, {"$set": d})
-    if result.matched_count == 0:
+    updated = await behaviors.update(report_id, d)
+    if not updated:
         raise HTTPException(status_code=404, detail="Behavior report not found")
-    updated = behavior_collection.find_one({"_id": ObjectId(report_id) if len(report_id) == 24 else report_id})
     return serialize_behavior(updated)
 
 @app.delete("/behavior-reports/{report_id}")
 async def delete_behavior_report(report_id: str):
-    result = None
-    if len(report_id) == 24:
-        try:
-            result = behavior_collection.delete_one({"_id": ObjectId(report_id)})
-        except Exception:
-            result = None
-    if not result or result.deleted_count == 0:
-        result = behavior_collection.delete_one({"_id": report_id})
-    if result.deleted_count == 0:
+    if await behaviors.delete(report_id) == 0:
         raise HTTPException(status_code=404, detail="Behavior report not found")
     return {"message": "Behavior report deleted successfully"}
 
@@ -323,13 +391,163 @@ async def upload_profile_image(file: UploadFile = File(...)):
         path = f"static/{name}"
         with open(path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
-        return {"image_url": f"http://localhost:8000/static/{name}"}
     except:
         raise HTTPException(status_code=500, detail="Upload failed")
+    # เข้ารหัสเฉพาะรูปใหม่แล้วสลับเข้า index ทันที (ไม่ต้องรีสตาร์ท)
+    enrolled = await _enroll_image(path)
+    return {"image_url": f"http://localhost:8000/static/{name}", "face_enrolled": enrolled}
+
+# ===== Face enrollment (เพิ่ม/แก้/ลบใบหน้าขณะเซิร์ฟเวอร์ทำงาน) =====
+
+async def _enroll_image(path: str, name: str | None = None) -> bool:
+    if not path.lower().endswith(IMAGE_EXTS):
+        return False
+    try:
+        # dlib encoder ใช้เวลาหลายร้อย ms → ทำใน thread ไม่ให้ event loop / สตรีมสะดุด
+        return await asyncio.to_thread(face_recognizer.add_face, path, name)
+    except Exception as e:
+        print(f"❌ ลงทะเบียนใบหน้าไม่สำเร็จ {path}: {e}")
+        return False
+
+@app.get("/faces")
+async def list_faces():
+    names = face_recognizer.known_face_names
+    return {"count": len(names), "names": names}
+
+@app.put("/faces/{name}")
+async def enroll_face(name: str, file: UploadFile = File(...)):
+    name = os.path.basename(name).lower().strip()
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    if not name or ext not in IMAGE_EXTS:
+        raise HTTPException(status_code=400, detail="Invalid name or image type")
+    path = f"static/{name}{ext}"
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    if not await _enroll_image(path, name):
+        raise HTTPException(status_code=400, detail="No face found in image")
+    return {"message": "Face enrolled", "name": name, "count": len(face_recognizer.index)}
+
+@app.delete("/faces/{name}")
+async def remove_face(name: str, delete_image: bool = False):
+    name = os.path.basename(name).lower().strip()
+    if not face_recognizer.remove_face(name):
+        raise HTTPException(status_code=404, detail="Face not found")
+    if delete_image:
+        for ext in IMAGE_EXTS:
+            if os.path.exists(f"static/{name}{ext}"):
+                os.remove(f"static/{name}{ext}")
+    return {"message": "Face removed", "name": name, "count": len(face_recognizer.index)}
+
+@app.post("/faces/bulk")
+async def bulk_enroll_faces(files: List[UploadFile] = File(...), workers: int | None = None):
+    """ ลงทะเบียนทั้งห้องเรียน: เข้ารหัสแบบขนานหลาย process แล้วส่งความคืบหน้าเป็น NDJSON ทีละไฟล์ """
+    paths = []
+    for file in files:
+        name = os.path.basename(file.filename or "").lower().strip()
+        if not name.endswith(IMAGE_EXTS):
+            continue
+        path = f"static/{name}"
+        with open(path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        paths.append(path)
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_progress(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    async def run():
+        try:
+            report = await asyncio.to_thread(face_recognizer.bulk_enroll, paths, workers, on_progress)
+            await events.put({"status": "done", "report": report})
+        except Exception as e:
+            await events.put({"status": "error", "error": str(e)})
+
+    async def gen():
+        task = asyncio.create_task(run())
+        while True:
+            event = await events.get()
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+            if event["status"] in ("done", "error"):
+                break
+        await task
+
+    return StreamingResponse(gen(), media_type="application/x-ndjson")
+
+@app.get("/startup_refresh")
+async def startup_refresh():
+    # สแกน static/ ใหม่: ใช้ face cache → เข้ารหัสเฉพาะรูปที่เพิ่ม/เปลี่ยน
+    await asyncio.to_thread(face_recognizer.load_known_faces)
+    return {"message": "Known faces refreshed", "count": len(face_recognizer.index)}
+
+# ===== Offline analysis: คลิปบันทึกการสอนย้อนหลัง (งานเบื้องหลัง) =====
+recordings_dir: str = os.getenv("RECORDINGS_DIR", "recordings")
+analysis_jobs: Dict[str, Dict[str, Any]] = {}
+_analysis_tasks: set = set()
+_analysis_lock = asyncio.Lock()   # ทีละงาน — แต่ละงานใช้ทุกคอร์อยู่แล้ว
+
+async def _run_analysis_job(job: Dict[str, Any], req: AnalysisJobRequest):
+    async with _analysis_lock:
+        job["status"] = "running"
+        try:
+            for video in job["videos"]:
+                result = await asyncio.to_thread(
+                    analyze_video, video, workers=req.workers, sample_fps=req.sample_fps,
+                    threshold_sec=sleep_threshold_sec, backend=face_backend,
+                    on_progress=job["progress"].update)
+                saved = await db.run(save_intervals, sleep_intervals_collection, result, job["id"], req.recorded_at)
+                job["results"].append(dict(result, saved=saved))
+            job["status"] = "done"
+        except Exception as e:
+            print(f"❌ วิเคราะห์คลิปไม่สำเร็จ: {e}")
+            job["status"] = "error"
+            job["error"] = str(e)
+        job["finished_at"] = time.time()
+
+@app.post("/analysis/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_analysis_job(req: AnalysisJobRequest):
+    root = os.path.realpath(recordings_dir)
+    target = os.path.realpath(os.path.join(root, req.path))
+    if target != root and not target.startswith(root + os.sep):
+        raise HTTPException(status_code=400, detail="Path must be inside the recordings folder")
+    if not os.path.exists(target):
+        raise HTTPException(status_code=404, detail="Recording not found")
+    videos = list_videos(target)
+    if not videos:
+        raise HTTPException(status_code=400, detail="No video files found")
+
+    job = {"id": uuid.uuid4().hex, "status": "queued", "videos": videos, "progress": {},
+           "results": [], "error": None, "created_at": time.time(), "finished_at": None}
+    analysis_jobs[job["id"]] = job
+    task = asyncio.create_task(_run_analysis_job(job, req))
+    _analysis_tasks.add(task)
+    task.add_done_callback(_analysis_tasks.discard)
+    return job
+
+@app.get("/analysis/jobs")
+async def list_analysis_jobs():
+    return {"jobs": [{k: job[k] for k in ("id", "status", "videos", "progress", "created_at", "finished_at")}
+                     for job in analysis_jobs.values()]}
+
+@app.get("/analysis/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 # ====== Process single frame (base64), เผื่อเรียกทดสอบเดี่ยว ======
+# face_recognizer ตัวเดียว (dlib detector ของ backend + last_was_keyframe) ใช้พร้อมกันหลาย thread ไม่ได้
+# → คำขอพร้อมกันเข้าทีละคำขอ ; การตรวจตายังรวม batch กับกล้องใน eye_pool ได้ตามปกติ
+_process_frame_lock = threading.Lock()
+
+def _analyze_single_frame(img, batched):
+    with _process_frame_lock:
+        return analyze_faces(face_recognizer, eye_pool, img, batched)
+
 @app.post("/process_frame")
-async def process_frame(frame: FrameData):
+async def process_frame(frame: FrameData, batched: bool = True):
     try:
         if not frame.image.startswith('data:image'):
             raise HTTPException(status_code=400, detail="Invalid base64 format")
@@ -337,55 +555,200 @@ async def process_frame(frame: FrameData):
         img = Image.open(BytesIO(img_data))
         img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
 
-        label, conf, per_eye = predict_from_eyes(img)
-        face_locations, names = face_recognizer.recognize_faces(img)
+        boxes, names, face_results, eye_ms, _ = await asyncio.to_thread(_analyze_single_frame, img, batched)
+
+        # ไม่เจอใบหน้า → Unknown (ไม่ตรวจตาทั้งภาพแทน ซึ่งต้องหา landmark เต็มภาพซ้ำอีกรอบ)
+        label, conf, per_eye = face_results[0] if face_results else ("Unknown", 0.0, [])
 
         result = {
             "status": "Frame processed",
             "prediction": {"label": label, "confidence": conf},
             "per_eye": per_eye,
             "recognized_faces": [
-                {"name": n, "box": (l, t, r, b)}
-                for (t, r, b, l), n in zip(face_locations, names)
+                {"name": n, "box": (l, t, r, b), "label": fl, "confidence": fc, "per_eye": fe}
+                for (t, r, b, l), n, (fl, fc, fe) in zip(boxes, names, face_results)
             ],
+            "eye_infer_ms": round(eye_ms, 2),
+            "eye_infer_mode": "batch" if batched else "per_crop",
         }
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error: {e}")
 
+# ====== Cameras ======
+def _get_camera(camera_id: str) -> Camera:
+    try:
+        return cameras.get(camera_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Camera not found")
+
+@app.get("/cameras")
+async def list_cameras():
+    return {"cameras": [cam.info() for cam in cameras.all()], "eye_pool": eye_pool.snapshot()}
+
+@app.post("/cameras", status_code=status.HTTP_201_CREATED)
+async def register_camera(config: CameraConfig):
+    try:
+        # ไฟล์วิดีโอ: เฉพาะใน recordings_dir (ไม่ให้ client สั่งเปิดไฟล์ใดก็ได้บนเครื่อง)
+        source = parse_source(config.source)
+        if is_file_source(source):
+            source = resolve_file_source(source, recordings_dir)
+        # สร้าง backend ตรวจจับของกล้อง (โหลด detector) → ทำใน thread
+        cam = await asyncio.to_thread(cameras.register, config.id, source, config.backend, config.flip,
+                                      config.rois, config.motion_gate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return cam.info()
+
+@app.delete("/cameras/{camera_id}")
+async def remove_camera(camera_id: str):
+    if camera_id == DEFAULT_CAMERA:
+        raise HTTPException(status_code=400, detail="Cannot remove the default camera")
+    cam = _get_camera(camera_id)
+    cam.is_streaming = False
+    if cam.pipeline is not None:
+        await _release_pipeline(cam, cam.pipeline)
+    cam.episodes.end_all(time.time())
+    cameras.remove(camera_id)
+    status_hub.remove_camera(camera_id)
+    return {"message": "Camera removed", "id": camera_id}
+
 # ====== Streaming control & status ======
-@app.post("/start_stream")
-async def start_stream():
-    global is_streaming, sleep_start_time, sleep_timers
-    is_streaming = True
+@app.post("/start_stream/{camera_id}")
+async def start_camera_stream(camera_id: str, eye_batch: bool = True):
+    cam = _get_camera(camera_id)
+    cam.is_streaming = True
+    cam.eye_batch_inference = eye_batch
     # รีเซ็ตตัวนับเมื่อเริ่มใหม่
-    sleep_start_time = None
-    sleep_timers = {}
-    return {"message": "Video stream started", "status": "success"}
+    await asyncio.to_thread(cam.reset)   # รอเฟรมที่กำลังวิเคราะห์ (state_lock) นอก event loop
+    status_hub.update_camera(cam.id, cam.is_streaming, cam.latest_status)
+    return {"message": "Video stream started", "status": "success", "camera": camera_id}
+
+@app.post("/stop_stream/{camera_id}")
+async def stop_camera_stream(camera_id: str):
+    cam = _get_camera(camera_id)
+    cam.is_streaming = False
+    if cam.pipeline is not None:
+        await _release_pipeline(cam, cam.pipeline)
+    cam.episodes.end_all(time.time())
+    status_hub.update_camera(cam.id, cam.is_streaming, cam.latest_status)
+    return {"message": "Video stream stopped", "status": "success", "camera": camera_id}
+
+@app.get("/stream_status/{camera_id}")
+async def get_camera_stream_status(camera_id: str):
+    cam = _get_camera(camera_id)
+    pipeline_stats = cam.pipeline.stats() if cam.pipeline is not None else None
+    gate = cam.recognizer.motion_gate
+    return JSONResponse({"camera": camera_id, "is_streaming": cam.is_streaming, "status": cam.latest_status,
+                         "pipeline": pipeline_stats, "eye_pool": eye_pool.snapshot(),
+                         "motion": gate.snapshot() if gate is not None else None})
+
+@app.get("/snapshots/{snapshot_id}")
+async def get_snapshot(snapshot_id: str, request: Request):
+    if not snapshot_store.exists(snapshot_id):
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    # id = sha256 ของเนื้อรูป → เนื้อหาไม่เปลี่ยน cache ได้ตลอด
+    etag = f'"{snapshot_id}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(snapshot_store.path(snapshot_id), media_type="image/jpeg", headers=headers)
+
+@app.get("/events")
+async def status_events(request: Request):
+    """
+    Server-Sent Events: ส่ง snapshot ครั้งแรก แล้วส่งเฉพาะสิ่งที่เปลี่ยน (camera / face / sleeping)
+    หนึ่งการเชื่อมต่อต่อ dashboard ; ไม่มีอะไรเปลี่ยน = ไม่ส่ง (มีแค่ keepalive ทุก 15 วินาที)
+    """
+    client = status_hub.subscribe()
+
+    async def gen():
+        try:
+            yield sse_message("snapshot", status_hub.snapshot())
+            while not await request.is_disconnected():
+                try:
+                    event, data = await client.get(timeout=15.0)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield sse_message(event, data)
+        finally:
+            status_hub.unsubscribe(client)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
+
+@metrics_registry.on_collect
+def _collect_gauges():
+    for cam in cameras.all():
+        stream_viewers.labels(cam.id).set(cam.pipeline.broadcaster.subscribers if cam.pipeline is not None else 0)
+        camera_streaming.labels(cam.id).set(1 if cam.is_streaming else 0)
+        gate = cam.recognizer.motion_gate
+        if gate is not None:
+            motion_checks.labels(cam.id).set(gate.stats["frames"])
+            motion_skipped.labels(cam.id).set(gate.stats["skipped"])
+            motion_pixels.labels(cam.id).set(gate.stats["pixels"])
+            motion_pixels_scanned.labels(cam.id).set(gate.stats["pixels_scanned"])
+    sse_clients.set(status_hub.clients)
+    pool = eye_pool.snapshot()
+    eye_pool_crops.set(pool["crops"])
+    eye_pool_batches.set(pool["batches"])
+    sleep_events_total.set(sleep_bus.stats["published"])
+
+@app.on_event("startup")
+async def _start_loop_lag_monitor():
+    _background_tasks.append(asyncio.create_task(watch_event_loop_lag(loop_lag)))
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/profile/{camera_id}")
+async def profile_camera(camera_id: str, frames: int = Query(100, ge=1, le=5000),
+                         interval_ms: float = Query(5.0, ge=1.0, le=100.0)):
+    """
+    สุ่ม stack ของ thread ใน pipeline ของกล้องนี้ไปจนครบ frames เฟรม → folded stacks (text)
+    ใช้ต่อ: flamegraph.pl profile.folded > profile.svg  หรือเปิดใน speedscope
+    """
+    if not profiler_enabled:
+        raise HTTPException(status_code=404, detail="Profiler disabled (set ENABLE_PROFILER=1)")
+    cam = _get_camera(camera_id)
+    if cam.pipeline is None or not cam.pipeline.is_running:
+        raise HTTPException(status_code=409, detail="Camera pipeline is not running")
+    if cam.profiler is not None:
+        raise HTTPException(status_code=409, detail="Profiler already running")
+    profiler = SamplingProfiler(cam.pipeline.thread_ids, frames=frames, interval=interval_ms / 1000.0).start()
+    cam.profiler = profiler
+    try:
+        await asyncio.to_thread(profiler.wait, profiler.timeout + 1.0)
+    finally:
+        cam.profiler = None
+    filename = f"profile-{camera_id}-{datetime.now():%Y%m%d-%H%M%S}.folded"
+    return PlainTextResponse(profiler.folded(), headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Profile-Frames": str(profiler.frames_seen),
+        "X-Profile-Samples": str(profiler.samples),
+    })
+
+# endpoint เดิม (frontend ปัจจุบัน) → กล้อง DEFAULT_CAMERA
+@app.post("/start_stream")
+async def start_stream(eye_batch: bool = True):
+    return await start_camera_stream(DEFAULT_CAMERA, eye_batch)
 
 @app.post("/stop_stream")
 async def stop_stream():
-    global is_streaming
-    is_streaming = False
-    return {"message": "Video stream stopped", "status": "success"}
+    return await stop_camera_stream(DEFAULT_CAMERA)
 
 @app.get("/stream_status")
 async def get_stream_status():
-    return JSONResponse({"is_streaming": is_streaming, "status": latest_status})
+    return await get_camera_stream_status(DEFAULT_CAMERA)
 
-async def _open_camera():
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        raise HTTPException(status_code=500, detail="Cannot open camera")
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    return cap
-
-async def _close_camera(cap):
+async def _open_camera(cam: Camera):
+    # VideoCapture ใช้เวลาเปิดนาน (RTSP ยิ่งนาน) → ทำใน thread ไม่ให้บล็อก event loop
     try:
-        cap.release()
-    except:
-        pass
+        return await asyncio.to_thread(open_capture, cam.source)
+    except ValueError:
+        raise HTTPException(status_code=500, detail="Cannot open camera")
 
 BOUNDARY = "frame"
 
@@ -397,195 +760,279 @@ def _multipart_chunk(img_bytes: bytes) -> bytes:
     ).encode("utf-8")
     return head + img_bytes + b"\r\n"
 
+# pipeline เดียวต่อกล้อง: ผู้ชมคนแรกเปิดกล้อง ผู้ชมที่เหลือแค่ subscribe เฟรมที่เข้ารหัสแล้ว
+_pipeline_lock = asyncio.Lock()
+
+async def _attach_viewer(cam: Camera):
+    """ → (pipeline, subscription) ; เปิดกล้อง/เริ่ม pipeline เฉพาะผู้ชมคนแรกของกล้องนั้น """
+    async with _pipeline_lock:
+        if cam.pipeline is None or not cam.pipeline.is_running:
+            cap = await _open_camera(cam)
+            cam.pipeline = FramePipeline(cap, lambda frame: _analyze_frame(cam, frame),
+                                         metrics=pipeline_metrics.for_camera(cam.id))
+            cam.pipeline.start()
+        # subscribe ภายใต้ lock เดียวกัน → _release_pipeline จะไม่ปิด pipeline ระหว่างนี้
+        return cam.pipeline, cam.pipeline.broadcaster.subscribe()
+
+async def _release_pipeline(cam: Camera, pipeline: FramePipeline):
+    """ หยุด pipeline เมื่อไม่มีผู้ชมเหลือ หรือสั่ง stop_stream แล้ว """
+    async with _pipeline_lock:
+        if cam.is_streaming and pipeline.broadcaster.subscribers > 0:
+            return
+        # stop() join thread + ปิดกล้อง → ทำใน thread
+        await asyncio.to_thread(pipeline.stop)
+        if cam.pipeline is pipeline:
+            cam.pipeline = None
+
+def _analyze_frame(cam: Camera, frame):
+    """
+    วิเคราะห์หนึ่งเฟรมของกล้อง cam (รันใน inference thread ของ pipeline กล้องนั้น):
+    หาใบหน้า + ชื่อ → ตรวจตา → นับเวลาหลับ → วาดผล → อัปเดต cam.latest_status
+    การหลับส่งออกเป็น event ผ่าน cam.episodes (ไม่มี network I/O ใน thread นี้)
+    คืนเฟรมที่วาดผลแล้วให้ encoder stage
+    """
+    # cam.reset() (start_stream) อาจถูกเรียกระหว่างเฟรม → ถือ lock เดียวกันตลอดการวิเคราะห์
+    with cam.state_lock:
+        return _analyze_frame_locked(cam, frame)
+
+def _analyze_frame_locked(cam: Camera, frame):
+    sleep_timers = cam.sleep_timers
+
+    # ใช้กล้องหน้า
+    if cam.flip:
+        frame = cv2.flip(frame, 1)
+
+    # 1) หาใบหน้า + ชื่อ + landmark ครั้งเดียว
+    # 2) ตรวจตา “ทุกคนพร้อมกัน” จาก landmark ชุดเดียวกัน (รวมรูปตาทุกใบหน้าเป็น batch เดียว)
+    timings = {}
+    cnn_before = cam.eye_state.stats["cnn_calls"]
+    try:
+        boxes, names, face_results, eye_ms, track_ids = analyze_faces(
+            cam.recognizer, eye_pool, frame, batched=cam.eye_batch_inference, estimator=cam.eye_state,
+            timings=timings)
+    except Exception:
+        boxes, names, face_results, eye_ms, track_ids = [], [], [], 0.0, []
+    t_annotate = time.perf_counter()
+    # per_crop ไม่ผ่าน estimator → ทุกใบหน้าเข้า CNN
+    cnn_calls = cam.eye_state.stats["cnn_calls"] - cnn_before if cam.eye_batch_inference else len(boxes)
+
+    faces_info = []  # เก็บผลรายคนสำหรับส่งสถานะ
+    new_sleepers = []  # key ที่เพิ่งเริ่มหลับในเฟรมนี้ → เก็บ snapshot จาก JPEG ของเฟรมนี้
+
+    # แล้ววาดผลไว้ตรงหน้าคนนั้น
+    for (top, right, bottom, left), name, (label, conf, per_eye), track_id in zip(boxes, names, face_results, track_ids):
+        # ---- นับเวลาต่อเนื่องรายบุคคล ----
+        now = time.time()
+        display_name = name if name else "Unknown"
+        # Unknown หลายคนในห้องต้องไม่ใช้ตัวนับร่วมกัน → ใช้ track id
+        key = track_id if track_id is not None else display_name
+        prev = sleep_timers.get(key)
+
+        display_label = label
+        sleep_elapsed = 0.0
+
+        if label.lower() == "closed":
+            if prev is None:
+                sleep_timers[key] = now
+                sleep_elapsed = 0.0
+            else:
+                sleep_elapsed = now - prev
+                if sleep_elapsed >= sleep_threshold_sec:
+                    display_label = "Sleep"  # เปลี่ยนป้ายเมื่อครบเวลา
+                    # event "start" ครั้งเดียวต่อการหลับหนึ่งครั้ง (เริ่มนับจากเวลาที่หลับตา)
+                    if cam.episodes.mark_sleeping(key, display_name, track_id, prev, now):
+                        new_sleepers.append(key)
+
+        else:
+            # เปิดตา → รีเซ็ตตัวนับ + จบ episode (ครั้งหน้าที่หลับเป็นครั้งใหม่ ได้ snapshot ใหม่)
+            sleep_timers[key] = None
+            cam.episodes.mark_awake(key, now)
+
+        snapshot_id = cam.episodes.snapshot_of(key)
+        faces_info.append({
+            "name": name,
+            "track_id": track_id,
+            "label": label,                 # label จากโมเดล
+            "display_label": display_label, # label ที่โชว์ (Sleep/Closed/Open)
+            "sleep_elapsed": round(sleep_elapsed, 2),
+            "confidence": float(conf),
+            "box": [int(left), int(top), int(right), int(bottom)],
+            "per_eye": per_eye,
+            "snapshot": f"/snapshots/{snapshot_id}" if snapshot_id else None,
+        })
+
+        # สีกรอบ/พื้นข้อความ
+        is_sleep = (display_label.lower() == "sleep")
+        is_closed = (display_label.lower() == "closed")
+        if is_sleep:
+            box_color = (0, 0, 255)     # แดง: Sleep
+        elif is_closed:
+            box_color = (40, 40, 220)   # น้ำเงินเข้ม: Closed (กำลังนับเวลา)
+        else:
+            box_color = (36, 255, 12)   # เขียว: Open/อื่นๆ
+        txt_color = (255, 255, 255)
+
+        # วาดกรอบหน้า
+        cv2.rectangle(frame, (left, top), (right, bottom), box_color, 2)
+
+        # แถบหัว: ชื่อ | สถานะ (%)
+        head = f"{name} | {display_label} ({conf:.0f}%)"
+        (tw, th), _ = cv2.getTextSize(head, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+        pad = 6
+        y_text = max(0, top - th - 10)
+        cv2.rectangle(
+            frame,
+            (left, y_text - pad),
+            (left + tw + pad*2, y_text + th + pad),
+            box_color, -1
+        )
+        cv2.putText(
+            frame, head,
+            (left + pad, y_text + th),
+            cv2.FONT_HERSHEY_SIMPLEX, 0.6, txt_color, 2, cv2.LINE_AA
+        )
+
+        # per-eye ใต้หัว (ซ้าย/ขวาแยกเปอร์เซ็นต์)
+        y_line = y_text + th + pad + 22
+        for e in (per_eye or []):
+            line = f"{e['eye']}: {e['label']} ({e['conf']:.0f}%)"
+            cv2.putText(
+                frame, line,
+                (left, min(y_line, bottom - 8)),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.55, box_color, 2, cv2.LINE_AA
+            )
+            y_line += 22
+
+        # แสดงเวลา Closed ต่อเนื่อง (ถ้ายังไม่ถึง 3 วิ)
+        if 0.0 < sleep_elapsed < sleep_threshold_sec:
+            remain = max(0.0, sleep_threshold_sec - sleep_elapsed)
+            tip = f"Sleeping in {remain:.1f}s"
+            cv2.putText(
+                frame, tip,
+                (left, min(y_line, bottom - 8)),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 215, 255), 2, cv2.LINE_AA
+            )
+
+    # ลบตัวนับของ track ที่ tracker ทิ้งไปแล้ว (id ไม่ถูกใช้ซ้ำ)
+    if cam.recognizer.tracker is not None:
+        alive = {t.id for t in cam.recognizer.tracker.tracks}
+        for k in [k for k in sleep_timers if isinstance(k, int) and k not in alive]:
+            del sleep_timers[k]
+    # ใบหน้าที่หลับอยู่แล้วหายจากภาพ (track หลุด / ออกจากกล้อง) → จบ episode
+    cam.episodes.expire(time.time())
+
+    # 3) อัปเดตภาพรวม (เผื่อไม่มีใบหน้า)
+    if faces_info:
+        main_label = faces_info[0]["display_label"]
+        main_conf  = faces_info[0]["confidence"]
+        main_names = [fi["name"] for fi in faces_info]
+    else:
+        # ไม่มีใบหน้า (หรือ gate / tracker ไม่ได้ตรวจจับเฟรมนี้และไม่มี track) → ไม่เดา
+        # ไม่ตรวจตาทั้งเฟรมแทน: นั่นคือการหา landmark เต็มเฟรมอีกรอบทุกเฟรมที่ว่าง ซึ่งหักล้าง motion gate
+        main_label, main_conf = "Unknown", 0.0
+        main_names = []
+
+    # snapshot: แสดงรูปล่าสุดเมื่อยังมีคนหลับอยู่ (รูปถูกเก็บครั้งเดียวตอนเริ่มหลับ ดู on_encoded ด้านล่าง)
+    anyone_sleeping = any(fi["display_label"].lower() == "sleep" for fi in faces_info)
+    snapshot_url = f"/snapshots/{cam.latest_snapshot}" if anyone_sleeping and cam.latest_snapshot else None
+
+    cam.latest_status = {
+        "camera": cam.id,
+        "label": main_label,
+        "confidence": float(main_conf),
+        "faces": main_names,        # คงรูปแบบเดิม
+        "faces_info": faces_info,   # รายละเอียดรายคน (มี display_label, sleep_elapsed)
+        "per_eye": [],              # คง field เดิมไว้ให้ย้อนหลัง
+        "timestamp": time.time(),
+        "snapshot": snapshot_url,      # URL ของรูป (ไม่ฝัง base64 ใน status แล้ว)
+        "eye_infer_ms": round(eye_ms, 2),   # latency ตรวจตาทั้งเฟรม (เทียบ batch / per_crop)
+        "eye_infer_mode": "batch" if cam.eye_batch_inference else "per_crop",
+        "face_backend": cam.recognizer.backend.name,
+        "tracker": dict(cam.recognizer.tracker.stats, interval=cam.recognizer.tracker.interval)
+                   if cam.recognizer.tracker else None,
+        "eye_state": dict(cam.eye_state.stats),     # cnn_calls / cnn_calls_avoided ...
+    }
+    status_hub.update_camera(cam.id, cam.is_streaming, cam.latest_status)
+
+    # detect / eyes จาก analyze_faces ; annotate = นับเวลาหลับ + วาดผล + อัปเดตสถานะ
+    cam_metrics = pipeline_metrics.for_camera(cam.id)
+    for stage, seconds in timings.items():
+        cam_metrics.observe_stage(stage, seconds)
+    cam_metrics.observe_stage("annotate", time.perf_counter() - t_annotate)
+    cam_metrics.observe_frame(len(boxes), cnn_calls)
+    if cam.profiler is not None:
+        cam.profiler.frame_done()
+
+    if not new_sleepers:
+        return frame
+
+    def on_encoded(jpeg):
+        # encoder เข้ารหัสเฟรมนี้ไว้ส่งสตรีมอยู่แล้ว → เก็บ bytes ชุดเดียวกัน ไม่ imencode ซ้ำ
+        snapshot_id = snapshot_store.put(jpeg)
+        for k in new_sleepers:
+            cam.episodes.set_snapshot(k, snapshot_id)   # False = ลืมตาไปแล้วระหว่างรอ encoder
+        cam.latest_snapshot = snapshot_id
+        cam.latest_status = dict(cam.latest_status, snapshot=f"/snapshots/{snapshot_id}")
+        status_hub.update_camera(cam.id, cam.is_streaming, cam.latest_status)
+
+    return frame, on_encoded
+
+
+# คุณภาพสตรีมต่อผู้ชม (stream_quality): ไม่ส่ง query = ปรับอัตโนมัติตามเวลาส่ง / เวลาเข้ารหัส / เฟรมที่ encoder ทิ้ง
+#   ?quality=10..95 / ?scale=0.1..1.0  → ล็อกระดับภาพ ; ?fps=1..30 → ล็อก fps ; ?adaptive=false → ไม่ปรับเลย
+STREAM_MAX_FPS = float(os.getenv("STREAM_MAX_FPS", "25"))
+STREAM_MIN_FPS = float(os.getenv("STREAM_MIN_FPS", "4"))
 
 @app.get("/video_feed")
-async def video_feed(request: Request):
-    global is_streaming, latest_status, sleep_start_time, sleep_timers
-    if not is_streaming:
+async def video_feed(request: Request, quality: int | None = Query(None, ge=10, le=95),
+                     scale: float | None = Query(None, gt=0.0, le=1.0),
+                     fps: float | None = Query(None, ge=1.0, le=30.0), adaptive: bool = True):
+    return await camera_video_feed(DEFAULT_CAMERA, request, quality, scale, fps, adaptive)
+
+@app.get("/video_feed/{camera_id}")
+async def camera_video_feed(camera_id: str, request: Request, quality: int | None = Query(None, ge=10, le=95),
+                            scale: float | None = Query(None, gt=0.0, le=1.0),
+                            fps: float | None = Query(None, ge=1.0, le=30.0), adaptive: bool = True):
+    cam = _get_camera(camera_id)
+    if not cam.is_streaming:
         raise HTTPException(status_code=400, detail="Stream not started")
 
-    cap = await _open_camera()
+    # 4) capture / inference / encode ทำใน pipeline ที่แชร์กันของกล้องนี้ — ฝั่งนี้แค่รับเฟรมล่าสุดที่เข้ารหัสแล้ว
+    pipeline, subscription = await _attach_viewer(cam)
+    controller = QualityController(scale, quality, fps, adaptive, max_fps=STREAM_MAX_FPS, min_fps=STREAM_MIN_FPS)
+    subscription.controller = controller
+    subscription.level = controller.level
+    pacer = FramePacer()
+    meters = pipeline.meters
 
     async def gen():
-        nonlocal cap
         try:
-            while is_streaming:
+            while cam.is_streaming and pipeline.is_running:
                 if await request.is_disconnected():
                     break
 
-                ok, frame = cap.read()
-                if not ok:
-                    await asyncio.sleep(0.02)
-                    continue
-
-                # ใช้กล้องหน้า
-                frame = cv2.flip(frame, 1)
+                wait = pacer.wait_sec()
+                if wait > 0:
+                    await asyncio.sleep(wait)
 
-                # 1) หาใบหน้า + ชื่อ
-                try:
-                    face_locations, names = face_recognizer.recognize_faces(frame)
-                except Exception:
-                    face_locations, names = [], []
-
-                faces_info = []  # เก็บผลรายคนสำหรับส่งสถานะ
-
-                # 2) ตรวจตา “รายคน” แล้ววาดผลไว้ตรงหน้าคนนั้น
-                for (top, right, bottom, left), name in zip(face_locations, names):
-                    # กัน index หลุดขอบ
-                    top = max(0, top); left = max(0, left)
-                    bottom = min(frame.shape[0]-1, bottom)
-                    right  = min(frame.shape[1]-1, right)
-
-                    face_crop = frame[top:bottom, left:right].copy()
-                    try:
-                        label, conf, per_eye = predict_from_eyes(face_crop)
-                    except Exception:
-                        label, conf, per_eye = "Unknown", 0.0, []
-
-                    # ---- นับเวลาต่อเนื่องรายบุคคล ----
-                    now = time.time()
-                    key = name if name else "Unknown"
-                    prev = sleep_timers.get(key)
-
-                    display_label = label
-                    sleep_elapsed = 0.0
-
-                    if label.lower() == "closed":
-                        if prev is None:
-                            sleep_timers[key] = now
-                            sleep_elapsed = 0.0
-                        else:
-                            sleep_elapsed = now - prev
-                            if sleep_elapsed >= sleep_threshold_sec:
-                                display_label = "Sleep"  # เปลี่ยนป้ายเมื่อครบเวลา
-                                async with httpx.AsyncClient() as client:
-                                    try:
-                                        print(f"📢 แจ้งเตือน {key} หลับแล้ว")
-                                        await client.post(
-                                            "http://localhost:8000/who-sleeping",
-                                            json={"name": key, "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-                                        )
-                                    except Exception:
-                                        pass
-                                
-                    else:
-                        # เปิดตา → รีเซ็ตตัวนับ
-                        sleep_timers[key] = None
-
-                    faces_info.append({
-                        "name": name,
-                        "label": label,                 # label จากโมเดล
-                        "display_label": display_label, # label ที่โชว์ (Sleep/Closed/Open)
-                        "sleep_elapsed": round(sleep_elapsed, 2),
-                        "confidence": float(conf),
-                        "box": [int(left), int(top), int(right), int(bottom)],
-                        "per_eye": per_eye
-                    })
-
-                    # สีกรอบ/พื้นข้อความ
-                    is_sleep = (display_label.lower() == "sleep")
-                    is_closed = (display_label.lower() == "closed")
-                    if is_sleep:
-                        box_color = (0, 0, 255)     # แดง: Sleep
-                    elif is_closed:
-                        box_color = (40, 40, 220)   # น้ำเงินเข้ม: Closed (กำลังนับเวลา)
-                    else:
-                        box_color = (36, 255, 12)   # เขียว: Open/อื่นๆ
-                    txt_color = (255, 255, 255)
-
-                    # วาดกรอบหน้า
-                    cv2.rectangle(frame, (left, top), (right, bottom), box_color, 2)
-
-                    # แถบหัว: ชื่อ | สถานะ (%)
-                    head = f"{name} | {display_label} ({conf:.0f}%)"
-                    (tw, th), _ = cv2.getTextSize(head, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-                    pad = 6
-                    y_text = max(0, top - th - 10)
-                    cv2.rectangle(
-                        frame,
-                        (left, y_text - pad),
-                        (left + tw + pad*2, y_text + th + pad),
-                        box_color, -1
-                    )
-                    cv2.putText(
-                        frame, head,
-                        (left + pad, y_text + th),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, txt_color, 2, cv2.LINE_AA
-                    )
-
-                    # per-eye ใต้หัว (ซ้าย/ขวาแยกเปอร์เซ็นต์)
-                    y_line = y_text + th + pad + 22
-                    for e in (per_eye or []):
-                        line = f"{e['eye']}: {e['label']} ({e['conf']:.0f}%)"
-                        cv2.putText(
-                            frame, line,
-                            (left, min(y_line, bottom - 8)),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.55, box_color, 2, cv2.LINE_AA
-                        )
-                        y_line += 22
-
-                    # แสดงเวลา Closed ต่อเนื่อง (ถ้ายังไม่ถึง 3 วิ)
-                    if 0.0 < sleep_elapsed < sleep_threshold_sec:
-                        remain = max(0.0, sleep_threshold_sec - sleep_elapsed)
-                        tip = f"Sleeping in {remain:.1f}s"
-                        cv2.putText(
-                            frame, tip,
-                            (left, min(y_line, bottom - 8)),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 215, 255), 2, cv2.LINE_AA
-                        )
-
-                # 3) อัปเดตภาพรวม (เผื่อไม่มีใบหน้า)
-                if faces_info:
-                    main_label = faces_info[0]["display_label"]
-                    main_conf  = faces_info[0]["confidence"]
-                    main_names = [fi["name"] for fi in faces_info]
-                else:
-                    try:
-                        main_label, main_conf, _ = predict_from_eyes(frame)
-                    except Exception:
-                        main_label, main_conf = "Unknown", 0.0
-                    main_names = []
-
-                    # เดินเวลาในระดับภาพรวม
-                    now = time.time()
-                    if main_label.lower() == "closed":
-                        if sleep_start_time is None:
-                            sleep_start_time = now
-                        elif now - sleep_start_time >= sleep_threshold_sec:
-                            main_label = "Sleep"
-                    else:
-                        sleep_start_time = None
-
-                # snapshot เมื่อมีคนหลับ (display_label == Sleep)
-                snapshot_b64 = None
-                if any(fi["display_label"].lower() == "sleep" for fi in faces_info):
-                    ok2, buf2 = cv2.imencode(".jpg", frame)
-                    if ok2:
-                        snapshot_b64 = "data:image/jpeg;base64," + base64.b64encode(buf2).decode("utf-8")
-
-                latest_status = {
-                    "label": main_label,
-                    "confidence": float(main_conf),
-                    "faces": main_names,        # คงรูปแบบเดิม
-                    "faces_info": faces_info,   # รายละเอียดรายคน (มี display_label, sleep_elapsed)
-                    "per_eye": [],              # คง field เดิมไว้ให้ย้อนหลัง
-                    "timestamp": time.time(),
-                    "snapshot": snapshot_b64
-                }
-
-                # 4) ส่งเฟรมเป็น MJPEG
-                ok, buf = cv2.imencode(".jpg", frame)
-                if not ok:
-                    await asyncio.sleep(0.01)
+                # client ที่ช้าจะได้เฟรมล่าสุดเสมอ (ข้ามเฟรมที่พลาดไป) ไม่ถ่วง pipeline
+                jpeg = await subscription.next(timeout=0.5)
+                if jpeg is None:
                     continue
 
+                t0 = time.perf_counter()
                 yield (
                     b"--frame\r\n"
-                    b"Content-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n"
+                    b"Content-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n"
                 )
-                await asyncio.sleep(0.01)
+                # yield กลับมาเมื่อ server ส่งเฟรมออกไปแล้ว → นานเกิน = client / เครือข่ายรับไม่ทัน
+                if controller.update(time.perf_counter() - t0, meters["encode"].last_latency_ms,
+                                     pipeline.encode_queue.dropped):
+                    subscription.level = controller.level
+                pacer.sent(controller.interval)
         finally:
-            await _close_camera(cap)
+            subscription.close()
+            await _release_pipeline(cam, pipeline)
 
     headers = {
         "Cache-Control": "no-cache, no-store, must-revalidate",
@@ -598,12 +1045,39 @@ async def video_feed(request: Request):
         headers=headers,
     )
 
-# ===== Sleep history StudentDashborad.tsx =====
+# ===== Sleep history (sleep_episodes) =====
+# start / end กรองตามเวลาเริ่มหลับ (ไม่มี timezone = UTC) ; หน้าถัดไป: ส่ง next_cursor กลับมาเป็น cursor
+
+async def _find_episodes(student=None, camera=None, start=None, end=None, limit=50, cursor=None):
+    try:
+        docs, next_cursor = await db.run(episode_store.find, student, camera, start, end, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return [serialize_episode(d) for d in docs], next_cursor
 
 @app.get("/sleep-history/{username}")
-async def get_sleep_history(username: str):
-    history = [entry for entry in sleepingList if entry["name"] == username]
-    return {"history": history}
+async def get_sleep_history(username: str, start: datetime | None = None, end: datetime | None = None,
+                            limit: int = Query(50, ge=1, le=500), cursor: str | None = None):
+    history, next_cursor = await _find_episodes(username, None, start, end, limit, cursor)
+    return {"history": history, "next_cursor": next_cursor}
+
+@app.get("/sleep-episodes")
+async def get_sleep_episodes(student: str | None = None, camera: str | None = None,
+                             start: datetime | None = None, end: datetime | None = None,
+                             limit: int = Query(50, ge=1, le=500), cursor: str | None = None):
+    episodes, next_cursor = await _find_episodes(student, camera, start, end, limit, cursor)
+    return {"episodes": episodes, "next_cursor": next_cursor}
+
+@app.get("/sleep-episodes/daily")
+async def get_sleep_daily(student: str | None = None, camera: str | None = None,
+                          start: datetime | None = None, end: datetime | None = None,
+                          tz: str = "Asia/Bangkok"):
+    """ นาทีที่หลับรวมต่อคนต่อวัน (วันตาม tz) """
+    try:
+        days = await db.run(episode_store.daily_totals, student, camera, start, end, tz)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"days": days, "tz": tz}
 
 
 # ===== ROOT =====
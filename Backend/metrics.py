@@ -0,0 +1,300 @@
+# metrics.py — ตัววัดแบบ Prometheus (text format 0.0.4) สำหรับ /metrics + ตัวจับ profile แบบสุ่มตัวอย่าง
+#
+#   Counter / Gauge / Histogram  : มี label ได้ ; thread-safe (pipeline หลาย thread เขียนพร้อมกัน)
+#   Registry.render()             : ข้อความสำหรับ Prometheus scrape
+#   PipelineMetrics               : ชุดตัววัดของ FramePipeline + การวิเคราะห์เฟรม ต่อกล้อง
+#   watch_event_loop_lag          : task วัดว่า event loop ตื่นช้ากว่าที่ควรเท่าไร (ถูกบล็อก)
+#   SamplingProfiler              : สุ่ม stack ของ thread ใน pipeline ทุก interval → folded stacks
+#                                   (ใช้กับ flamegraph.pl / speedscope / inferno ได้ตรง ๆ)
+#
+# ไม่พึ่ง prometheus_client: ที่ต้องใช้มีแค่นี้ และ observe หนึ่งครั้ง = lock + bisect (ไม่กี่ไมโครวินาที)
+# ดู benchmarks/bench_metrics.py สำหรับต้นทุนต่อเฟรม
+
+import asyncio
+import bisect
+import math
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 10, 15, 20, 30, 50)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt(v):
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """ ตัววัดย่อยของ label ชุดนี้ (เก็บไว้ใช้ซ้ำได้ ไม่ต้องเรียกทุกครั้ง) """
+        values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {values}")
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._new_child()
+            return child
+
+    def remove(self, *values):
+        with self._lock:
+            self._children.pop(tuple(str(v) for v in values), None)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_label_str(self.labelnames, values)} {_fmt(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # ช่องสุดท้าย = +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.bounds + (math.inf,), counts):
+            cumulative += n
+            le = _label_str(self.labelnames, values, [("le", _fmt(float(bound)))])
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        labels = _label_str(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_fmt(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._callbacks = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def on_collect(self, fn):
+        """ fn() ถูกเรียกก่อน render ทุกครั้ง — ใช้อัปเดต gauge ที่อ่านจากสถานะปัจจุบัน """
+        self._callbacks.append(fn)
+        return fn
+
+    def render(self):
+        for fn in self._callbacks:
+            try:
+                fn()
+            except Exception as e:
+                print(f"⚠️ metrics collector ผิดพลาด: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class CameraMetrics:
+    """ ตัววัดของกล้องหนึ่งตัว (label ผูกไว้แล้ว) — ส่งให้ FramePipeline(metrics=...) """
+
+    def __init__(self, parent, camera_id):
+        self._stages = {}
+        self._parent = parent
+        self.camera_id = camera_id
+        self._frames = parent.frames.labels(camera_id)
+        self._faces = parent.faces.labels(camera_id)
+        self._cnn = parent.cnn_calls.labels(camera_id)
+
+    def observe_stage(self, stage, seconds):
+        child = self._stages.get(stage)
+        if child is None:
+            child = self._stages[stage] = self._parent.stage_seconds.labels(self.camera_id, stage)
+        child.observe(seconds)
+
+    def count_drop(self, queue):
+        self._parent.dropped.labels(self.camera_id, queue).inc()
+
+    def observe_frame(self, faces, cnn_calls):
+        self._frames.inc()
+        self._faces.observe(faces)
+        self._cnn.observe(cnn_calls)
+
+
+class PipelineMetrics:
+    def __init__(self, registry):
+        self.stage_seconds = registry.histogram(
+            "pipeline_stage_seconds", "Latency of one pipeline stage per frame", ("camera", "stage"))
+        self.frames = registry.counter(
+            "pipeline_frames_processed_total", "Frames analysed", ("camera",))
+        self.dropped = registry.counter(
+            "pipeline_frames_dropped_total", "Frames dropped because the next stage was busy", ("camera", "queue"))
+        self.faces = registry.histogram(
+            "pipeline_faces_per_frame", "Faces detected per frame", ("camera",), COUNT_BUCKETS)
+        self.cnn_calls = registry.histogram(
+            "pipeline_cnn_calls_per_frame", "Faces sent to the eye CNN per frame", ("camera",), COUNT_BUCKETS)
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    def for_camera(self, camera_id):
+        with self._lock:
+            cm = self._cameras.get(camera_id)
+            if cm is None:
+                cm = self._cameras[camera_id] = CameraMetrics(self, camera_id)
+            return cm
+
+
+async def watch_event_loop_lag(histogram, gauge=None, interval=0.1):
+    """ task: sleep(interval) แล้ววัดว่าตื่นช้าไปเท่าไร = เวลาที่ event loop ถูกงานอื่นบล็อก """
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - t0 - interval)
+        histogram.observe(lag)
+        if gauge is not None:
+            gauge.set(lag)
+
+
+class SamplingProfiler:
+    """
+    สุ่ม stack ของ thread ที่กำหนดทุก interval วินาที จนกว่าจะครบ frames เฟรม (frame_done) หรือ timeout
+    ผลลัพธ์แบบ folded: "thread;module:func;module:func <จำนวนครั้ง>" หนึ่งบรรทัดต่อ stack
+
+    Args:
+        threads: {thread ident: ชื่อ} ที่จะสุ่ม (เช่น thread ของ FramePipeline)
+    """
+
+    def __init__(self, threads, frames=100, interval=0.005, timeout=60.0):
+        self.threads = dict(threads)
+        self.frames = frames
+        self.interval = interval
+        self.timeout = timeout
+        self.frames_seen = 0
+        self.samples = 0
+        self._stacks = _Tally()
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def frame_done(self):
+        self.frames_seen += 1
+        if self.frames_seen >= self.frames:
+            self._done.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def _run(self):
+        deadline = time.monotonic() + self.timeout
+        while not self._done.is_set() and time.monotonic() < deadline:
+            frames = sys._current_frames()
+            for ident, name in self.threads.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(name)
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+        self._done.set()
+
+    def folded(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self._stacks.most_common())
@@ -0,0 +1,143 @@
+# motion_gate.py — ตัดสินก่อนตรวจจับใบหน้าว่า "เฟรมนี้ต้องตรวจจับไหม และตรวจเฉพาะตรงไหน"
+#
+#   ย่อภาพ (scale) → gray + blur → เทียบกับภาพพื้นหลังแบบ running average (accumulateWeighted)
+#   พิกเซลที่ต่างเกิน diff_threshold ภายใน ROI (บริเวณที่นั่ง) = บริเวณที่เปลี่ยน
+#     - เปลี่ยนน้อยกว่า min_changed ของ ROI → ฉากนิ่ง: ไม่ตรวจจับ (track / ผลเดิมใช้ต่อ)
+#     - ไม่งั้น → ตรวจจับเฉพาะกรอบที่ครอบบริเวณที่เปลี่ยน (ขยายขอบ pad ให้ครอบทั้งใบหน้า)
+#     - นิ่งนานเกิน max_static_sec → ตรวจจับทั้ง ROI หนึ่งครั้ง (กันพลาดคนที่ขยับช้ามาก)
+#
+# ต้นทุนต่อเฟรม: resize + absdiff บนภาพ 160x120 (scale 0.25 ของ 640x480) — น้อยกว่าการตรวจจับใบหน้ามาก
+# stats: สัดส่วนเฟรมที่ไม่ต้องตรวจจับ และสัดส่วนพิกเซลที่ไม่ต้องสแกน (ดูใน /stream_status, /metrics)
+
+import time
+
+import cv2
+import numpy as np
+
+
+def parse_rois(text):
+    """ "x0,y0,x1,y1;x0,y0,x1,y1" (สัดส่วน 0..1 ของเฟรม) → [(x0, y0, x1, y1), ...] ; ว่าง → None """
+    if not text or not text.strip():
+        return None
+    rois = []
+    for part in text.split(";"):
+        values = [float(v) for v in part.split(",")]
+        if len(values) != 4:
+            raise ValueError(f"ROI needs 4 values x0,y0,x1,y1: {part!r}")
+        rois.append(tuple(values))
+    return rois
+
+
+class MotionGate:
+    """
+    Args:
+        rois: [(x0, y0, x1, y1)] สัดส่วน 0..1 ของเฟรม (บริเวณที่นั่ง) ; None = ทั้งเฟรม
+        scale: ย่อภาพก่อนเทียบ
+        diff_threshold: ค่าต่าง (0..255) ที่ถือว่าพิกเซลนั้นเปลี่ยน
+        min_changed: สัดส่วนพิกเซลที่เปลี่ยน (ของ ROI) ขั้นต่ำที่ถือว่ามีการเคลื่อนไหว
+        pad: ขยายกรอบที่เปลี่ยนแต่ละด้าน (สัดส่วนของด้านยาวของเฟรม)
+        max_static_sec: ตรวจจับทั้ง ROI อย่างน้อยหนึ่งครั้งต่อช่วงเวลานี้
+        alpha: น้ำหนักของเฟรมใหม่ในภาพพื้นหลัง
+    """
+
+    def __init__(self, rois=None, scale=0.25, diff_threshold=18, min_changed=0.002, pad=0.08,
+                 max_static_sec=2.0, alpha=0.1):
+        self.rois = [tuple(float(v) for v in roi) for roi in rois] if rois else None
+        self.scale = scale
+        self.diff_threshold = diff_threshold
+        self.min_changed = min_changed
+        self.pad = pad
+        self.max_static_sec = max_static_sec
+        self.alpha = alpha
+        self._background = None
+        self._mask = None          # ROI ในภาพย่อ (None = ทั้งภาพ)
+        self._mask_pixels = 0
+        self._roi_box = None       # กรอบครอบทุก ROI (top, right, bottom, left) พิกัดเฟรมเต็ม
+        self._last_full = 0.0
+        self.stats = {"frames": 0, "skipped": 0, "region": 0, "full": 0, "pixels": 0, "pixels_scanned": 0}
+
+    def reset(self):
+        self._background = None
+
+    def _setup(self, frame_shape, small_shape):
+        H, W = frame_shape[:2]
+        h, w = small_shape[:2]
+        if not self.rois:
+            self._mask = None
+            self._mask_pixels = h * w
+            self._roi_box = (0, W, H, 0)
+            return
+        self._mask = np.zeros((h, w), dtype=np.uint8)
+        for x0, y0, x1, y1 in self.rois:
+            cv2.rectangle(self._mask, (int(x0 * w), int(y0 * h)), (int(x1 * w) - 1, int(y1 * h) - 1), 255, -1)
+        self._mask_pixels = max(1, cv2.countNonZero(self._mask))
+        self._roi_box = (int(min(r[1] for r in self.rois) * H), int(max(r[2] for r in self.rois) * W),
+                         int(max(r[3] for r in self.rois) * H), int(min(r[0] for r in self.rois) * W))
+
+    def check(self, frame, allow_region=True):
+        """
+        เรียกเมื่อถึงเวลาตรวจจับ → (detect, region)
+          detect=False : ฉากนิ่ง ไม่ต้องตรวจจับ
+          region       : (top, right, bottom, left) พิกัดเฟรมเต็มที่ควรตรวจจับ ; None = ทั้งเฟรม
+        allow_region=False: มีการเคลื่อนไหว → ตรวจทั้ง ROI เสมอ (ผู้เรียกที่ไม่มี tracker รวมผลนอก region ไม่ได้)
+        """
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        now = time.monotonic()
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._setup(frame.shape, gray.shape)
+            self._background = gray.astype(np.float32)
+            return self._full(frame, now)
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(gray, self._background, self.alpha)
+        _, changed = cv2.threshold(diff, self.diff_threshold, 255, cv2.THRESH_BINARY)
+        if self._mask is not None:
+            changed = cv2.bitwise_and(changed, self._mask)
+
+        if now - self._last_full >= self.max_static_sec:
+            return self._full(frame, now)
+        if cv2.countNonZero(changed) < self.min_changed * self._mask_pixels:
+            return self._count(frame, False, None)
+        if not allow_region:
+            return self._full(frame, now)
+
+        x, y, w, h = cv2.boundingRect(changed)
+        H, W = frame.shape[:2]
+        pad = int(self.pad * max(H, W))
+        roi_top, roi_right, roi_bottom, roi_left = self._roi_box
+        region = (max(roi_top, int(y / self.scale) - pad), min(roi_right, int((x + w) / self.scale) + pad),
+                  min(roi_bottom, int((y + h) / self.scale) + pad), max(roi_left, int(x / self.scale) - pad))
+        area = (region[1] - region[3]) * (region[2] - region[0])
+        # กรอบเกือบเท่า ROI อยู่แล้ว → ตรวจทั้ง ROI ไปเลย (นับเป็น full)
+        if area >= 0.8 * (roi_right - roi_left) * (roi_bottom - roi_top):
+            return self._full(frame, now)
+        self.stats["region"] += 1
+        return self._count(frame, True, region)
+
+    def _full(self, frame, now):
+        self._last_full = now
+        self.stats["full"] += 1
+        H, W = frame.shape[:2]
+        return self._count(frame, True, None if self._roi_box == (0, W, H, 0) else self._roi_box)
+
+    def _count(self, frame, detect, region):
+        H, W = frame.shape[:2]
+        self.stats["frames"] += 1
+        self.stats["pixels"] += H * W
+        if not detect:
+            self.stats["skipped"] += 1
+        elif region is None:
+            self.stats["pixels_scanned"] += H * W
+        else:
+            self.stats["pixels_scanned"] += (region[1] - region[3]) * (region[2] - region[0])
+        return detect, region
+
+    def snapshot(self):
+        frames = self.stats["frames"]
+        pixels = self.stats["pixels"]
+        return dict(self.stats,
+                    rois=self.rois,
+                    frames_skipped_ratio=round(self.stats["skipped"] / frames, 4) if frames else 0.0,
+                    pixels_skipped_ratio=round(1.0 - self.stats["pixels_scanned"] / pixels, 4) if pixels else 0.0)
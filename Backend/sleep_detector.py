@@ -1,16 +1,177 @@
-from tensorflow.keras.models import load_model
+import threading
+
 import numpy as np
-import tensorflow as tf
-import matplotlib.pyplot as plt
 import cv2
 from PIL import Image
 
+# TensorFlow is imported only by the "keras" backend (and export_eye_model.py);
+# the "tflite" backend runs on tflite_runtime / ai_edge_litert when either is installed
+DEFAULT_MODELS = {
+    "keras": "model/Eye_Detection.keras",
+    "tflite": "model/Eye_Detection.tflite",
+}
+
+
+def softmax(logits, axis=-1):
+    """
+    NumPy softmax, same result as tf.nn.softmax on the model's raw outputs
+    """
+    shifted = np.asarray(logits, dtype=np.float32)
+    shifted = shifted - shifted.max(axis=axis, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=axis, keepdims=True)
+
+
+def preprocess_crops(img_arrays, height, width, out=None):
+    """
+    Resize OpenCV Mats (BGR/BGRA/gray) to (height, width) and write them as RGB float32 0..255,
+    the input the model was trained on
+    Args:
+        out: optional (N, height, width, 3) float32 array to write into
+    Returns:
+        (N, height, width, 3) float32 array
+    """
+    buf = out if out is not None else np.empty((len(img_arrays), height, width, 3), dtype=np.float32)
+    for i, img in enumerate(img_arrays):
+        if img.dtype != np.uint8:
+            img = (img * 255).astype(np.uint8)
+        # PIL's default resize is bicubic; INTER_AREA matches it better when shrinking
+        shrinking = img.shape[0] > height or img.shape[1] > width
+        resized = cv2.resize(img, (width, height),
+                             interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_CUBIC)
+        if resized.ndim == 2:
+            buf[i] = resized[..., np.newaxis]
+        else:
+            # BGR(A) -> RGB and uint8 -> float32 in the same assignment
+            buf[i] = resized[..., 2::-1]
+    return buf
+
+
+def load_tflite_interpreter(model_path, num_threads=None):
+    """
+    TFLite interpreter from the lightest runtime available: tflite_runtime, then ai_edge_litert,
+    then tf.lite from full TensorFlow as a last resort
+    """
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+class TFLiteModel:
+    """
+    Callable wrapper around a .tflite eye classifier: float32 (N, H, W, 3) batch -> raw outputs
+    Quantized (int8/uint8) inputs and outputs are (de)quantized here, so every export variant
+    looks the same to SleepDetector. The batch dimension is resized to the next power of two
+    (zero-padded) so the interpreter is not reallocated for every batch size.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        self.interpreter = load_tflite_interpreter(model_path, num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        _, self.height, self.width, _ = (int(v) for v in self._input["shape"])
+        self._capacity = int(self._input["shape"][0])
+        self._lock = threading.Lock()
+
+    def _ensure_capacity(self, n):
+        capacity = 1
+        while capacity < n:
+            capacity *= 2
+        if capacity != self._capacity:
+            self.interpreter.resize_tensor_input(self._input["index"], [capacity, self.height, self.width, 3])
+            self.interpreter.allocate_tensors()
+            self._capacity = capacity
+        return capacity
+
+    def __call__(self, img_bat):
+        n = img_bat.shape[0]
+        with self._lock:
+            capacity = self._ensure_capacity(n)
+            x = np.zeros((capacity, self.height, self.width, 3), dtype=np.float32)
+            x[:n] = img_bat
+            dtype = self._input["dtype"]
+            if dtype != np.float32:
+                scale, zero_point = self._input["quantization"]
+                info = np.iinfo(dtype)
+                x = np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(dtype)
+            self.interpreter.set_tensor(self._input["index"], x)
+            self.interpreter.invoke()
+            out = self.interpreter.get_tensor(self._output["index"])[:n]
+        if self._output["dtype"] != np.float32:
+            scale, zero_point = self._output["quantization"]
+            out = (out.astype(np.float32) - zero_point) * scale
+        return out
+
+
 class SleepDetector:
-    def __init__(self, model_path="model/Eye_Detection.keras", img_height=180, img_width=180, data_cat=None):
-        self.model = load_model(model_path)
+    def __init__(self, model_path=None, img_height=180, img_width=180, data_cat=None,
+                 inference="compiled", fast_preprocess=True, backend="keras", num_threads=None):
+        """
+        Args:
+            model_path: None = DEFAULT_MODELS[backend]
+            inference: "compiled" = traced tf.function (model(x, training=False)) with a fixed
+                       input signature, warmed up here so the first frame does not pay for tracing
+                       "predict"  = original Keras model.predict path
+                       (keras backend only)
+            fast_preprocess: resize + BGR->RGB with cv2/NumPy straight into a reusable per-thread
+                       float32 batch buffer instead of the PIL round-trip (see preprocess_batch)
+            backend: "keras"  = full TensorFlow + the .keras model
+                     "tflite" = a .tflite export (export_eye_model.py) on the TFLite runtime, without
+                                importing TensorFlow; input size comes from the model, so
+                                img_height / img_width are ignored
+            num_threads: TFLite interpreter threads (None = runtime default)
+        """
+        if inference not in ("compiled", "predict"):
+            raise ValueError(f"Unknown inference mode: {inference}")
+        if backend not in DEFAULT_MODELS:
+            raise ValueError(f"Unknown model backend: {backend} (choose from {', '.join(DEFAULT_MODELS)})")
+        model_path = model_path or DEFAULT_MODELS[backend]
+        self.backend = backend
+        self.data_cat = data_cat if data_cat is not None else ["Closed", "Open"]
+        self.inference = inference
+        self.fast_preprocess = fast_preprocess
+        # one buffer per thread: /process_frame, the stream pipelines and the inference pool
+        # may call the same detector concurrently
+        self._buffers = threading.local()
+        self._infer = None
+        if backend == "tflite":
+            self.model = TFLiteModel(model_path, num_threads)
+            self.img_height = self.model.height
+            self.img_width = self.model.width
+            return
+
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(model_path)
         self.img_height = img_height
         self.img_width = img_width
-        self.data_cat = data_cat if data_cat is not None else ["Closed", "Open"]
+        if inference == "compiled":
+            self._infer = tf.function(
+                lambda x: self.model(x, training=False),
+                input_signature=[tf.TensorSpec([None, img_height, img_width, 3], tf.float32)],
+            )
+            self._forward(np.zeros((1, img_height, img_width, 3), dtype=np.float32))
+    
+    def _forward(self, img_bat):
+        """
+        Run the model on a preprocessed batch and return raw outputs as a numpy array
+        """
+        img_bat = np.asarray(img_bat, dtype=np.float32)
+        matches_input = tuple(img_bat.shape[1:]) == (self.img_height, self.img_width, 3)
+        if self.backend == "tflite":
+            if not matches_input:
+                raise ValueError(f"TFLite model expects {self.img_height}x{self.img_width} inputs (use resize=True)")
+            return self.model(img_bat)
+        if self._infer is not None and matches_input:
+            return self._infer(img_bat).numpy()
+        # predict mode, or a batch that does not match the traced signature (e.g. resize=False)
+        return self.model.predict(img_bat, verbose=0)
     
     def preprocess_image_from_array(self, img_array, resize=True):
         """
@@ -40,41 +201,98 @@ class SleepDetector:
             image = image.resize((self.img_width, self.img_height))
         
         # Convert to array and add batch dimension
-        img_arr = tf.keras.utils.img_to_array(image)
-        img_bat = tf.expand_dims(img_arr, 0)  # Make it a batch
-        return img_bat
+        return self._image_to_batch(image)
+    
+    @staticmethod
+    def _image_to_batch(image):
+        """
+        PIL Image -> (1, H, W, C) float32, same as keras img_to_array + expand_dims
+        """
+        img_arr = np.asarray(image, dtype=np.float32)
+        if img_arr.ndim == 2:
+            img_arr = img_arr[..., np.newaxis]
+        return img_arr[np.newaxis]
+    
+    def _get_batch_buffer(self, n):
+        """
+        Return an (n, H, W, 3) float32 view of this thread's preallocated buffer, growing it when needed
+        """
+        buffer = getattr(self._buffers, "batch", None)
+        if buffer is None or buffer.shape[0] < n:
+            capacity = max(n, 2 * (0 if buffer is None else buffer.shape[0]))
+            buffer = self._buffers.batch = np.empty((capacity, self.img_height, self.img_width, 3),
+                                                    dtype=np.float32)
+        return buffer[:n]
+    
+    def preprocess_batch(self, img_arrays):
+        """
+        Vectorized preprocessing without PIL: every OpenCV Mat (BGR) is resized with cv2 and
+        written as RGB float32 straight into the calling thread's batch buffer (one copy per crop)
+        Args:
+            img_arrays: list of numpy arrays (OpenCV Mat, BGR/BGRA/gray)
+        Returns:
+            (N, H, W, 3) float32 array; a view of the buffer, reused by the next call from the same thread
+        """
+        buf = self._get_batch_buffer(len(img_arrays))
+        return preprocess_crops(img_arrays, self.img_height, self.img_width, out=buf)
+    
+    def _can_fast_preprocess(self, img_arrays, resize):
+        return self.fast_preprocess and resize and all(isinstance(img, np.ndarray) for img in img_arrays)
     
     def preprocess_image_from_path(self, img_path, resize=True):
         """
         Original method for file path input (kept for backward compatibility)
         """
+        # same as keras load_img: RGB, nearest-neighbour resize
+        image = Image.open(img_path).convert("RGB")
         if resize:
-            image = tf.keras.utils.load_img(img_path, target_size=(self.img_height, self.img_width))
-        else:
-            image = tf.keras.utils.load_img(img_path)
-        
-        img_arr = tf.keras.utils.img_to_array(image)
-        img_bat = tf.expand_dims(img_arr, 0)
-        return img_bat
+            image = image.resize((self.img_width, self.img_height), Image.NEAREST)
+        return self._image_to_batch(image)
     
     def predict_from_array(self, img_array, resize=True):
         """
         Predict from numpy array or OpenCV Mat
         """
-        img_bat = self.preprocess_image_from_array(img_array, resize)
-        pred = self.model.predict(img_bat)
-        score = tf.nn.softmax(pred[0])
+        if self._can_fast_preprocess([img_array], resize):
+            img_bat = self.preprocess_batch([img_array])
+        else:
+            img_bat = self.preprocess_image_from_array(img_array, resize)
+        pred = self._forward(img_bat)
+        score = softmax(pred[0])
         label = self.data_cat[np.argmax(score)]
         conf = np.max(score) * 100
         return label, conf
     
+    def predict_batch(self, img_arrays, resize=True):
+        """
+        Predict many numpy arrays / OpenCV Mats with a single forward pass
+        Args:
+            img_arrays: list of numpy arrays (OpenCV Mat) or PIL Images
+            resize: whether to resize the images (must be True for crops of different sizes)
+        Returns:
+            list of (label, conf) in the same order as img_arrays
+        """
+        if len(img_arrays) == 0:
+            return []
+        if self._can_fast_preprocess(img_arrays, resize):
+            img_bat = self.preprocess_batch(img_arrays)
+        else:
+            img_bat = np.concatenate([self.preprocess_image_from_array(img, resize) for img in img_arrays], axis=0)
+        pred = self._forward(img_bat)
+        scores = softmax(pred, axis=-1)
+        results = []
+        for score in scores:
+            idx = int(np.argmax(score))
+            results.append((self.data_cat[idx], float(score[idx]) * 100))
+        return results
+    
     def predict_from_path(self, img_path, resize=True):
         """
         Original predict method for file paths (kept for backward compatibility)
         """
         img_bat = self.preprocess_image_from_path(img_path, resize)
-        pred = self.model.predict(img_bat)
-        score = tf.nn.softmax(pred[0])
+        pred = self._forward(img_bat)
+        score = softmax(pred[0])
         label = self.data_cat[np.argmax(score)]
         conf = np.max(score) * 100
         return label, conf
@@ -83,6 +301,7 @@ class SleepDetector:
         """
         Plot image from numpy array or OpenCV Mat with prediction
         """
+        import matplotlib.pyplot as plt
         label, conf = self.predict_from_array(img_array, resize)
         
         # Prepare image for display
@@ -104,8 +323,9 @@ class SleepDetector:
         """
         Original plot method for file paths (kept for backward compatibility)
         """
+        import matplotlib.pyplot as plt
         label, conf = self.predict_from_path(img_path, resize)
-        image = tf.keras.utils.load_img(img_path)
+        image = Image.open(img_path).convert("RGB")
         plt.imshow(image)
         plt.title(f"Prediction: {label} ({conf:.2f}%)")
         plt.axis('off')
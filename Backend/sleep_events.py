@@ -0,0 +1,169 @@
+# sleep_events.py — event ของ "การหลับหนึ่งครั้ง" (episode) ภายในโปรเซส แทนการ POST /who-sleeping ทุกเฟรม
+#
+#   SleepEpisodes  (ต่อกล้อง, เรียกจาก inference thread) : ตรวจขอบ → ส่ง event ครั้งเดียวตอนเริ่มหลับ และครั้งเดียวตอนตื่น
+#   SleepEventBus  (ทั้งเซิร์ฟเวอร์) : publish จาก thread ใดก็ได้ → คิว asyncio ของผู้ฟังแต่ละตัวบน event loop
+#
+# event (dict):
+#   type        : "start" | "end"
+#   episode_id, camera, key, name, track_id
+#   start       : เวลาที่เริ่มหลับตา (epoch วินาที) — ไม่ใช่เวลาที่ครบ threshold
+#   end         : เวลาตื่น / หลุดจากภาพ (เฉพาะ "end")
+#   duration_sec, snapshot (id ใน SnapshotStore หรือ None), reason ("awake" / "lost" / "stopped")
+#
+# thread ที่วิเคราะห์ภาพไม่รอ I/O ใด ๆ: publish แค่ call_soon_threadsafe ; ผู้ฟังทำงานบน event loop เอง
+
+import asyncio
+import threading
+import uuid
+
+
+class SleepSubscription:
+    """ ผู้ฟังหนึ่งตัว — คิวของ event บน event loop """
+
+    def __init__(self, name, loop, queue_size):
+        self.name = name
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class SleepEventBus:
+    """
+    Args:
+        queue_size: จำนวน event ที่ค้างต่อผู้ฟังได้ ; เกินนี้ทิ้ง event ใหม่ (นับใน stats) แทนการบล็อกผู้ส่ง
+    """
+
+    def __init__(self, queue_size=1024):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.stats = {"published": 0, "dropped": 0}
+
+    def subscribe(self, name=None):
+        """ เรียกจากใน event loop → SleepSubscription """
+        sub = SleepSubscription(name, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event):
+        """ เรียกจาก thread ใดก็ได้ ไม่บล็อก """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        self.stats["published"] += 1
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(self._deliver, sub, event)
+            except RuntimeError:
+                # event loop ของผู้ฟังปิดไปแล้ว
+                self.unsubscribe(sub)
+
+    def _deliver(self, sub, event):
+        try:
+            sub.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            sub.dropped += 1
+            self.stats["dropped"] += 1
+            print(f"⚠️ sleep event ถูกทิ้ง (ผู้ฟัง {sub.name} ตามไม่ทัน)")
+
+
+class SleepEpisodes:
+    """
+    episode ที่กำลังเกิดของกล้องหนึ่งตัว (thread-safe)
+
+    Args:
+        camera_id: id กล้อง (ใส่ใน event)
+        bus: SleepEventBus ; None = ไม่ส่ง event (เช่นใน benchmark)
+        lost_after_sec: ใบหน้าที่กำลังหลับหายจากภาพนานเท่านี้ → จบ episode (reason="lost")
+    """
+
+    def __init__(self, camera_id, bus=None, lost_after_sec=2.0):
+        self.camera_id = camera_id
+        self.bus = bus
+        self.lost_after_sec = lost_after_sec
+        self._lock = threading.Lock()
+        self._active = {}   # key → episode dict (+ "last_seen")
+
+    def mark_sleeping(self, key, name, track_id, since, now):
+        """ ใบหน้า key อยู่ในสถานะ Sleep ในเฟรมนี้ → True ถ้าเพิ่งเริ่ม episode ใหม่ """
+        with self._lock:
+            episode = self._active.get(key)
+            if episode is not None:
+                episode["last_seen"] = now
+                return False
+            episode = {
+                "episode_id": uuid.uuid4().hex,
+                "camera": self.camera_id,
+                "key": key,
+                "name": name,
+                "track_id": track_id,
+                "start": since,
+                "snapshot": None,
+                "last_seen": now,
+            }
+            self._active[key] = episode
+        self._emit("start", episode)
+        return True
+
+    def mark_awake(self, key, now):
+        """ ใบหน้า key ลืมตาแล้ว → จบ episode (ถ้ามี) """
+        self._end([key], now, "awake")
+
+    def expire(self, now):
+        """ จบ episode ของใบหน้าที่หายจากภาพนานเกิน lost_after_sec ; เวลาจบ = ครั้งสุดท้ายที่เห็น """
+        with self._lock:
+            lost = [k for k, ep in self._active.items() if now - ep["last_seen"] >= self.lost_after_sec]
+        for key in lost:
+            self._end([key], None, "lost")
+
+    def end_all(self, now, reason="stopped"):
+        with self._lock:
+            keys = list(self._active)
+        self._end(keys, now, reason)
+
+    def set_snapshot(self, key, snapshot_id):
+        """ ผูกรูปกับ episode ที่ยังไม่จบ → False ถ้า episode จบไปแล้ว """
+        with self._lock:
+            episode = self._active.get(key)
+            if episode is None:
+                return False
+            episode["snapshot"] = snapshot_id
+            return True
+
+    def snapshot_of(self, key):
+        with self._lock:
+            episode = self._active.get(key)
+            return episode["snapshot"] if episode else None
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._active
+
+    def __len__(self):
+        with self._lock:
+            return len(self._active)
+
+    def _end(self, keys, now, reason):
+        ended = []
+        with self._lock:
+            for key in keys:
+                episode = self._active.pop(key, None)
+                if episode is not None:
+                    end = episode["last_seen"] if now is None else now
+                    ended.append(dict(episode, end=end, duration_sec=round(end - episode["start"], 2), reason=reason))
+        for episode in ended:
+            self._emit("end", episode)
+
+    def _emit(self, kind, episode):
+        if self.bus is None:
+            return
+        event = {k: v for k, v in episode.items() if k != "last_seen"}
+        event["type"] = kind
+        self.bus.publish(event)
@@ -0,0 +1,135 @@
+# sleep_history.py — ประวัติการหลับจากกล้องสด (หนึ่งเอกสารต่อ episode) ใน MongoDB
+#
+# เอกสาร: episode_id, student, camera, track_id, start_time, end_time (UTC), duration_sec, snapshot, reason
+# index:
+#   (student, start_time, _id)  ประวัติรายคน + แบ่งหน้า
+#   (camera, start_time, _id)   ประวัติรายกล้อง
+#   (start_time)                ช่วงเวลาทั้งห้อง / สรุปรายวันที่ไม่ระบุคน
+#   episode_id (unique)         กันเขียนซ้ำ
+#
+# แบ่งหน้าแบบ keyset: cursor = "<start_time ISO>|<_id>" ของแถวสุดท้าย → หน้าถัดไปใช้ index ต่อได้เลย
+# (ไม่ใช้ skip ซึ่งช้าลงตามจำนวนแถวที่ข้าม)
+
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel, InsertOne
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY = 11000
+
+
+def episode_document(event):
+    """ event "end" จาก sleep_events → เอกสารที่จะเก็บ """
+    return {
+        "episode_id": event["episode_id"],
+        "student": event["name"],
+        "camera": event["camera"],
+        "track_id": event["track_id"],
+        "start_time": datetime.fromtimestamp(event["start"], timezone.utc),
+        "end_time": datetime.fromtimestamp(event["end"], timezone.utc),
+        "duration_sec": event["duration_sec"],
+        "snapshot": event["snapshot"],
+        "reason": event["reason"],
+    }
+
+
+def serialize_episode(doc):
+    return {
+        "id": str(doc["_id"]),
+        "episode_id": doc["episode_id"],
+        "student": doc["student"],
+        "camera": doc["camera"],
+        # pymongo คืน datetime แบบไม่มี tz (เป็น UTC) → ใส่ tz ให้ client แปลงเป็นเวลาท้องถิ่นได้ถูก
+        "start_time": doc["start_time"].replace(tzinfo=timezone.utc),
+        "end_time": doc["end_time"].replace(tzinfo=timezone.utc),
+        "duration_sec": doc["duration_sec"],
+        "snapshot": f"/snapshots/{doc['snapshot']}" if doc.get("snapshot") else None,
+        "reason": doc.get("reason"),
+    }
+
+
+def encode_cursor(doc):
+    return f"{doc['start_time'].isoformat()}|{doc['_id']}"
+
+
+def decode_cursor(cursor):
+    """ → (start_time, ObjectId) ; ValueError ถ้ารูปแบบไม่ถูก """
+    start, _, oid = cursor.partition("|")
+    if not ObjectId.is_valid(oid):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return datetime.fromisoformat(start), ObjectId(oid)
+
+
+class SleepEpisodeStore:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        self.collection.create_indexes([
+            IndexModel([("student", ASCENDING), ("start_time", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("camera", ASCENDING), ("start_time", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("start_time", DESCENDING)]),
+            IndexModel([("episode_id", ASCENDING)], unique=True),
+        ])
+
+    def insert_many(self, docs):
+        """ bulk แบบ unordered: แถวที่ซ้ำ (episode_id) ถูกข้าม แถวอื่นยังเขียนต่อ → จำนวนที่เขียนได้ """
+        if not docs:
+            return 0
+        try:
+            return self.collection.bulk_write([InsertOne(d) for d in docs], ordered=False).inserted_count
+        except BulkWriteError as e:
+            if any(err.get("code") != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+                raise
+            return e.details.get("nInserted", 0)
+
+    @staticmethod
+    def _match(student=None, camera=None, start=None, end=None):
+        query = {}
+        if student is not None:
+            query["student"] = student
+        if camera is not None:
+            query["camera"] = camera
+        if start is not None or end is not None:
+            query["start_time"] = {}
+            if start is not None:
+                query["start_time"]["$gte"] = start
+            if end is not None:
+                query["start_time"]["$lt"] = end
+        return query
+
+    def find(self, student=None, camera=None, start=None, end=None, limit=50, cursor=None):
+        """ ใหม่ → เก่า ; → (เอกสาร, cursor ของหน้าถัดไปหรือ None) """
+        query = self._match(student, camera, start, end)
+        if cursor:
+            t, oid = decode_cursor(cursor)
+            query["$or"] = [{"start_time": {"$lt": t}}, {"start_time": t, "_id": {"$lt": oid}}]
+        docs = list(self.collection.find(query)
+                    .sort([("start_time", DESCENDING), ("_id", DESCENDING)])
+                    .limit(limit + 1))
+        next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+        return docs[:limit], next_cursor
+
+    def daily_totals(self, student=None, camera=None, start=None, end=None, tz="UTC"):
+        """
+        นาทีที่หลับรวมต่อคนต่อวัน (วันตาม tz) → [{"student", "date", "minutes", "episodes"}]
+        episode ที่คร่อมเที่ยงคืนนับเข้าวันที่เริ่ม
+        """
+        pipeline = [
+            {"$match": self._match(student, camera, start, end)},
+            {"$group": {
+                "_id": {
+                    "student": "$student",
+                    "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$start_time", "timezone": tz}},
+                },
+                "seconds": {"$sum": "$duration_sec"},
+                "episodes": {"$sum": 1},
+            }},
+            {"$sort": {"_id.date": -1, "_id.student": 1}},
+        ]
+        return [
+            {"student": row["_id"]["student"], "date": row["_id"]["date"],
+             "minutes": round(row["seconds"] / 60.0, 2), "episodes": row["episodes"]}
+            for row in self.collection.aggregate(pipeline)
+        ]
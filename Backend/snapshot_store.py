@@ -0,0 +1,105 @@
+# snapshot_store.py — เก็บรูป JPEG ตอนนักเรียนเริ่มหลับ (หนึ่งรูปต่อหนึ่งครั้งที่หลับ) ลงดิสก์
+#
+#   id = sha256 ของเนื้อไฟล์ → รูปเดียวกันได้ id เดียวกัน, เนื้อหาของ id ไม่มีวันเปลี่ยน (cache ได้ตลอด)
+#   snapshots/ab/abcdef....jpg   (แบ่งโฟลเดอร์ย่อยด้วย 2 ตัวแรก ไม่ให้ไฟล์ในโฟลเดอร์เดียวมากเกิน)
+#
+# retention: ลบรูปที่เก่ากว่า max_age_days แล้วลบรูปเก่าสุดจนขนาดรวมไม่เกิน max_total_mb
+# (ทำเองระหว่าง put ทุก prune_interval_sec — ไม่ต้องมี job แยก)
+
+import hashlib
+import os
+import re
+import threading
+import time
+
+_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def etag_matches(if_none_match, etag):
+    """
+    If-None-Match ตรงกับ etag (รวม quote) ไหม: แยกเป็นรายการ entity tag แล้วเทียบทีละตัวแบบ weak
+    (ตัด W/ ออก) ; "*" ตรงกับทุก etag
+    """
+    for tag in (if_none_match or "").split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class SnapshotStore:
+    def __init__(self, directory="snapshots", max_age_days=7.0, max_total_mb=500.0, prune_interval_sec=600.0):
+        self.directory = directory
+        self.max_age_sec = max_age_days * 86400.0
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024)
+        self.prune_interval_sec = prune_interval_sec
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.stats = {"stored": 0, "deduplicated": 0, "pruned": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def is_valid_id(snapshot_id):
+        return bool(_ID_RE.match(snapshot_id or ""))
+
+    def path(self, snapshot_id):
+        """ path ของรูป (ไม่ตรวจว่ามีไฟล์) ; ValueError ถ้า id ไม่ถูกรูปแบบ """
+        if not self.is_valid_id(snapshot_id):
+            raise ValueError(f"Invalid snapshot id: {snapshot_id}")
+        return os.path.join(self.directory, snapshot_id[:2], snapshot_id + ".jpg")
+
+    def put(self, jpeg):
+        """ เก็บ JPEG (bytes ที่เข้ารหัสแล้ว) → id """
+        snapshot_id = hashlib.sha256(jpeg).hexdigest()
+        path = self.path(snapshot_id)
+        if os.path.exists(path):
+            os.utime(path)   # ใช้ซ้ำ = ยังใหม่อยู่ สำหรับ retention
+            self.stats["deduplicated"] += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(jpeg)
+            os.replace(tmp, path)
+            self.stats["stored"] += 1
+        if time.time() - self._last_prune >= self.prune_interval_sec:
+            self.prune()
+        return snapshot_id
+
+    def exists(self, snapshot_id):
+        return self.is_valid_id(snapshot_id) and os.path.exists(self.path(snapshot_id))
+
+    def prune(self):
+        """ ลบตาม retention → จำนวนไฟล์ที่ลบ """
+        with self._lock:
+            self._last_prune = time.time()
+            files = []
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    if name.endswith(".jpg"):
+                        p = os.path.join(root, name)
+                        try:
+                            st = os.stat(p)
+                        except FileNotFoundError:
+                            continue
+                        files.append((st.st_mtime, st.st_size, p))
+            files.sort()
+
+            cutoff = self._last_prune - self.max_age_sec
+            total = sum(size for _, size, _ in files)
+            removed = 0
+            for mtime, size, p in files:
+                if mtime >= cutoff and total <= self.max_total_bytes:
+                    break
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self.stats["pruned"] += removed
+            return removed
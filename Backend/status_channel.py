@@ -0,0 +1,149 @@
+# status_channel.py — ส่งสถานะแบบ push (Server-Sent Events) แทนการ poll /stream_status และ /who-sleeping
+#
+# StatusHub เก็บสถานะล่าสุดที่ส่งไปแล้วต่อกล้อง แล้วส่งเฉพาะ "สิ่งที่เปลี่ยน":
+#   camera   : สรุประดับกล้องเปลี่ยน (กำลังสตรีม / label รวม / รายชื่อใบหน้า / มี snapshot)
+#   face     : สถานะของใบหน้าหนึ่งคนเปลี่ยน (Open → Closed → Sleep, เข้า/ออกจากภาพ: state=None)
+#   sleeping : รายการคนหลับเปลี่ยน
+#   episode  : การหลับหนึ่งครั้งเริ่ม/จบ (event จาก sleep_events ส่งต่อตามเดิม ไม่เก็บใน snapshot)
+#   snapshot : สถานะทั้งหมด (ตอนเชื่อมต่อ และเมื่อ client ตามไม่ทันจนคิวเต็ม)
+# เฟรมที่ไม่มีอะไรเปลี่ยนจะไม่ส่งอะไรเลย ; confidence / sleep_elapsed ที่ขยับทุกเฟรมไม่นับเป็นการเปลี่ยน
+
+import asyncio
+import json
+import threading
+
+
+def sse_message(event, data):
+    """ ข้อความ SSE หนึ่งชิ้น (bytes) """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n".encode("utf-8")
+
+
+class StatusClient:
+    """ client หนึ่งการเชื่อมต่อ — คิวของ (event, data) บน event loop """
+
+    def __init__(self, loop, queue_size):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class StatusHub:
+    """
+    Args:
+        queue_size: จำนวน event ที่ค้างต่อ client ได้ ; เกินนี้ล้างคิวแล้วส่ง snapshot ใหม่แทน
+    """
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._cameras = {}     # camera_id → {"summary": {...}, "faces": {key: {...}}}
+        self._sleeping = []
+        self._clients = set()
+        self.stats = {"events": 0, "resyncs": 0}
+
+    # ----- client -----
+    def subscribe(self):
+        """ เรียกจากใน event loop → StatusClient """
+        client = StatusClient(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    @property
+    def clients(self):
+        with self._lock:
+            return len(self._clients)
+
+    def snapshot(self):
+        """ สถานะทั้งหมดที่ client ควรมี (ส่งตอนเชื่อมต่อ) """
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {
+            "cameras": {cid: dict(cam["summary"], faces_state=dict(cam["faces"])) for cid, cam in self._cameras.items()},
+            "sleeping": list(self._sleeping),
+        }
+
+    # ----- publish (เรียกจาก thread ใดก็ได้) -----
+    def update_camera(self, camera_id, is_streaming, status):
+        """ เทียบ status ล่าสุดของกล้องกับที่ส่งไปแล้ว → ส่งเฉพาะส่วนที่เปลี่ยน """
+        faces = {}
+        if is_streaming:
+            for fi in status.get("faces_info", []):
+                key = str(fi["track_id"]) if fi.get("track_id") is not None else fi["name"]
+                faces[key] = {"name": fi["name"], "track_id": fi.get("track_id"), "state": fi["display_label"]}
+        summary = {
+            "is_streaming": is_streaming,
+            "label": status.get("label") if is_streaming else None,
+            "faces": status.get("faces", []) if is_streaming else [],
+            "snapshot": status.get("snapshot") if is_streaming else None,   # URL /snapshots/{id}
+        }
+        ts = status.get("timestamp")
+
+        events = []
+        with self._lock:
+            prev = self._cameras.setdefault(camera_id, {"summary": {}, "faces": {}})
+            if summary != prev["summary"]:
+                # confidence ไปพร้อมกับการเปลี่ยนครั้งนี้ แต่ตัวมันเองไม่ทำให้เกิด event
+                events.append(("camera", dict(summary, camera=camera_id, confidence=status.get("confidence"), ts=ts)))
+            for key, face in faces.items():
+                old = prev["faces"].get(key)
+                if old != face:
+                    events.append(("face", dict(face, camera=camera_id, key=key,
+                                                prev=old["state"] if old else None, ts=ts)))
+            for key, old in prev["faces"].items():
+                if key not in faces:
+                    events.append(("face", dict(old, camera=camera_id, key=key, state=None,
+                                                prev=old["state"], ts=ts)))
+            prev["summary"] = summary
+            prev["faces"] = faces
+            clients = list(self._clients)
+        self._dispatch(clients, events)
+
+    def remove_camera(self, camera_id):
+        with self._lock:
+            self._cameras.pop(camera_id, None)
+            clients = list(self._clients)
+        self._dispatch(clients, [("camera", {"camera": camera_id, "removed": True})])
+
+    def update_sleeping(self, sleeping):
+        with self._lock:
+            if sleeping == self._sleeping:
+                return
+            self._sleeping = list(sleeping)
+            clients = list(self._clients)
+        self._dispatch(clients, [("sleeping", {"list": list(sleeping)})])
+
+    def publish_episode(self, event):
+        with self._lock:
+            clients = list(self._clients)
+        self._dispatch(clients, [("episode", event)])
+
+    def _dispatch(self, clients, events):
+        if not events:
+            return
+        self.stats["events"] += len(events)
+        for client in clients:
+            try:
+                client.loop.call_soon_threadsafe(self._deliver, client, events)
+            except RuntimeError:
+                # event loop ของ client ปิดไปแล้ว
+                self.unsubscribe(client)
+
+    def _deliver(self, client, events):
+        """ (บน event loop) ใส่ event ลงคิว ; คิวเต็ม = client ช้า → ล้างคิวแล้วให้ snapshot ล่าสุดแทน """
+        try:
+            for event in events:
+                client.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not client.queue.empty():
+                client.queue.get_nowait()
+            client.queue.put_nowait(("snapshot", self.snapshot()))
+            self.stats["resyncs"] += 1
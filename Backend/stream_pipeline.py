@@ -0,0 +1,320 @@
+# stream_pipeline.py — แยก กล้อง / วิเคราะห์ภาพ / เข้ารหัส JPEG ออกเป็น thread ต่อ stage
+#
+#   capture thread ──► [DropOldestQueue] ──► inference thread ──► [DropOldestQueue] ──► encoder thread ──► latest JPEG
+#
+# ทุกคิวมีขนาดจำกัดและทิ้งเฟรมเก่าที่สุดเมื่อเต็ม → stage ที่ช้าไม่ทำให้ backlog สะสม
+# ฝั่ง HTTP อ่านได้แค่ "เฟรมล่าสุดที่เข้ารหัสแล้ว" จึงไม่ต้องรอ (event loop ไม่โดนบล็อก)
+# กล้องหนึ่งตัวมี pipeline เดียว แล้วแจกเฟรมให้ผู้ชมทุกคนผ่าน FrameBroadcaster
+# encoder เข้ารหัสหนึ่งครั้งต่อระดับ (scale, quality) ที่ผู้ชมใช้อยู่ (stream_quality) — การวิเคราะห์ใช้ภาพเต็มเสมอ
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from stream_quality import FULL_LEVEL
+
+
+def encode_jpeg(frame, scale=1.0, quality=95):
+    """ ย่อ (ถ้า scale < 1) แล้วเข้ารหัส JPEG → bytes หรือ None """
+    if scale < 1.0:
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    return buf.tobytes() if ok else None
+
+
+class DropOldestQueue:
+    """ คิวขนาดจำกัด: put ไม่บล็อก ถ้าเต็มจะทิ้งของเก่าที่สุด (นับไว้ใน dropped) """
+
+    def __init__(self, maxsize=2):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        """ → True ถ้าต้องทิ้งของเก่าเพื่อใส่ชิ้นนี้ """
+        with self._cond:
+            dropped = len(self._items) == self._items.maxlen
+            if dropped:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+            return dropped
+
+    def get(self, timeout=None):
+        """ คืนของชิ้นเก่าที่สุด หรือ None ถ้ารอจนหมดเวลา """
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+
+
+class StageMeter:
+    """ FPS (นับในหน้าต่างเวลา) และ latency ล่าสุดของหนึ่ง stage """
+
+    def __init__(self, window_sec=2.0):
+        self.window_sec = window_sec
+        self._ticks = deque()
+        self._lock = threading.Lock()
+        self.count = 0
+        self.last_latency_ms = 0.0
+
+    def tick(self, latency_sec):
+        now = time.monotonic()
+        with self._lock:
+            self.count += 1
+            self.last_latency_ms = latency_sec * 1000.0
+            self._ticks.append(now)
+            while self._ticks and now - self._ticks[0] > self.window_sec:
+                self._ticks.popleft()
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._ticks and now - self._ticks[0] > self.window_sec:
+                self._ticks.popleft()
+            return {
+                "fps": round(len(self._ticks) / self.window_sec, 2),
+                "latency_ms": round(self.last_latency_ms, 2),
+                "count": self.count,
+            }
+
+
+class Subscription:
+    """ ผู้ชมหนึ่งคนของ FrameBroadcaster — ได้เฉพาะเฟรมล่าสุดเสมอ (ผู้ชมที่ช้าจะข้ามเฟรมเอง) """
+
+    def __init__(self, broadcaster, loop):
+        self._broadcaster = broadcaster
+        self.loop = loop
+        self.event = asyncio.Event()
+        self.last_seq = 0
+        self.skipped = 0
+        self.level = FULL_LEVEL   # (scale, quality) ที่ต้องการ ; เปลี่ยนได้ระหว่างดู
+        self.controller = None    # stream_quality.QualityController ของผู้ชมนี้ (สำหรับ stats)
+
+    async def next(self, timeout=0.5):
+        """ → JPEG bytes ของเฟรมใหม่ถัดไป หรือ None ถ้ารอจนหมดเวลา """
+        self.event.clear()
+        seq, jpeg = self._broadcaster.latest(self.level)
+        if jpeg is None or seq == self.last_seq:
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            seq, jpeg = self._broadcaster.latest(self.level)
+            if jpeg is None or seq == self.last_seq:
+                return None
+        if self.last_seq:
+            self.skipped += max(0, seq - self.last_seq - 1)
+        self.last_seq = seq
+        return jpeg
+
+    def close(self):
+        self._broadcaster.unsubscribe(self)
+
+
+class FrameBroadcaster:
+    """
+    เก็บ JPEG ล่าสุดหนึ่งเฟรมแล้วปลุกผู้ชมทุกคน (thread-safe: publish จาก encoder thread ได้)
+    ไม่มีคิวต่อผู้ชม → client ที่ส่งช้าไม่ย้อนกลับไปถ่วง pipeline
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._jpegs = {}   # (scale, quality) → JPEG ของเฟรมล่าสุด
+        self._subscribers = set()
+
+    def publish(self, jpegs):
+        """ jpegs: {(scale, quality): bytes} ของเฟรมเดียวกัน """
+        with self._lock:
+            self._seq += 1
+            self._jpegs = jpegs
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.event.set)
+            except RuntimeError:
+                # event loop ของผู้ชมปิดไปแล้ว
+                self.unsubscribe(sub)
+
+    def latest(self, level=FULL_LEVEL):
+        """
+        → (seq, jpeg bytes หรือ None) ; seq เพิ่มทุกครั้งที่มีเฟรมใหม่
+        ระดับที่ขอยังไม่ถูกเข้ารหัส (เพิ่งเปลี่ยน) → ใช้ระดับที่ใกล้ที่สุดไปก่อนหนึ่งเฟรม
+        """
+        with self._lock:
+            jpegs = self._jpegs
+            seq = self._seq
+        if not jpegs:
+            return seq, None
+        if level in jpegs:
+            return seq, jpegs[level]
+        nearest = min(jpegs, key=lambda lv: (abs(lv[0] - level[0]), abs(lv[1] - level[1])))
+        return seq, jpegs[nearest]
+
+    def levels_in_use(self):
+        """ ระดับที่ผู้ชมปัจจุบันต้องการ (ไม่มีผู้ชม → ระดับเต็ม) """
+        with self._lock:
+            return {sub.level for sub in self._subscribers} or {FULL_LEVEL}
+
+    def viewer_stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return [sub.controller.snapshot() if sub.controller is not None else {"scale": sub.level[0],
+                                                                               "quality": sub.level[1]}
+                for sub in subscribers]
+
+    def subscribe(self):
+        """ เรียกจากใน event loop → Subscription """
+        sub = Subscription(self, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscribers(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+class FramePipeline:
+    """
+    Pipeline สาม stage สำหรับสตรีม MJPEG
+    Args:
+        capture: object ที่มี read()/release() (เช่น cv2.VideoCapture) — pipeline เป็นคนปิดให้ตอน stop()
+        analyze: callable(frame) → เฟรมที่วาดผลแล้ว (รันใน inference thread; ยก exception ได้ เฟรมนั้นจะถูกข้าม)
+                 หรือ (เฟรม, on_encoded) — on_encoded(jpeg bytes) ถูกเรียกใน encoder thread หลังเข้ารหัสเฟรมนั้น
+                 (ใช้ JPEG ตัวเดียวกับที่ส่งให้ผู้ชม ไม่ต้องเข้ารหัสซ้ำ)
+        queue_size: ขนาดคิวระหว่าง stage
+        metrics: ตัวรับ latency ราย stage / เฟรมที่ทิ้ง (metrics.CameraMetrics) ; None = ไม่เก็บ
+    """
+
+    def __init__(self, capture, analyze, queue_size=2, metrics=None):
+        self.capture = capture
+        self.analyze = analyze
+        self.metrics = metrics
+        self.capture_queue = DropOldestQueue(queue_size)
+        self.encode_queue = DropOldestQueue(queue_size)
+        self.meters = {
+            "capture": StageMeter(),
+            "inference": StageMeter(),
+            "encode": StageMeter(),
+        }
+        self.broadcaster = FrameBroadcaster()
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def thread_ids(self):
+        """ {thread ident: ชื่อ stage} ของ thread ที่กำลังทำงาน (ใช้กับ SamplingProfiler) """
+        return {t.ident: t.name for t in self._threads if t.ident is not None}
+
+    @property
+    def is_running(self):
+        return bool(self._threads) and not self._stop.is_set()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for name, target in (("capture", self._capture_loop),
+                             ("inference", self._inference_loop),
+                             ("encode", self._encode_loop)):
+            t = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        self.capture_queue.clear()
+        self.encode_queue.clear()
+        try:
+            self.capture.release()
+        except Exception:
+            pass
+
+    def stats(self):
+        out = {name: meter.snapshot() for name, meter in self.meters.items()}
+        out["capture"]["queue_depth"] = self.capture_queue.qsize()
+        out["capture"]["dropped"] = self.capture_queue.dropped
+        out["inference"]["queue_depth"] = self.encode_queue.qsize()
+        out["inference"]["dropped"] = self.encode_queue.dropped
+        out["running"] = self.is_running
+        out["subscribers"] = self.broadcaster.subscribers
+        out["viewers"] = self.broadcaster.viewer_stats()
+        return out
+
+    # ----- stages -----
+    def _record(self, stage, seconds):
+        self.meters[stage].tick(seconds)
+        if self.metrics is not None:
+            self.metrics.observe_stage(stage, seconds)
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            ok, frame = self.capture.read()
+            if not ok:
+                time.sleep(0.02)
+                continue
+            if self.capture_queue.put(frame) and self.metrics is not None:
+                self.metrics.count_drop("capture")
+            self._record("capture", time.perf_counter() - t0)
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            frame = self.capture_queue.get(timeout=0.1)
+            if frame is None:
+                continue
+            t0 = time.perf_counter()
+            try:
+                result = self.analyze(frame)
+            except Exception as e:
+                print(f"❌ ข้อผิดพลาดในการวิเคราะห์เฟรม: {e}")
+                continue
+            if self.encode_queue.put(result if isinstance(result, tuple) else (result, None)) and self.metrics is not None:
+                self.metrics.count_drop("encode")
+            self._record("inference", time.perf_counter() - t0)
+
+    def _encode_loop(self):
+        while not self._stop.is_set():
+            item = self.encode_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            frame, on_encoded = item
+            t0 = time.perf_counter()
+            jpegs = {}
+            for level in self.broadcaster.levels_in_use():
+                jpeg = encode_jpeg(frame, *level)
+                if jpeg is not None:
+                    jpegs[level] = jpeg
+            if not jpegs:
+                continue
+            self.broadcaster.publish(jpegs)
+            self._record("encode", time.perf_counter() - t0)
+            if on_encoded is not None:
+                try:
+                    # ภาพเต็มเสมอ (ใช้ของสตรีมถ้ามีผู้ชมระดับเต็มอยู่แล้ว)
+                    on_encoded(jpegs.get(FULL_LEVEL) or encode_jpeg(frame, *FULL_LEVEL))
+                except Exception as e:
+                    print(f"❌ ข้อผิดพลาดหลังเข้ารหัสเฟรม: {e}")
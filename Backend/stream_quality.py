@@ -0,0 +1,120 @@
+# stream_quality.py — ปรับคุณภาพสตรีม MJPEG ต่อผู้ชม (ขนาดภาพ / คุณภาพ JPEG / fps) ตามสภาพจริง
+#
+# การวิเคราะห์ภาพยังทำที่ความละเอียดเต็มเสมอ ; ที่ปรับคือภาพที่ส่งให้ผู้ชมเท่านั้น
+# encoder ของ pipeline เข้ารหัสเฟรมหนึ่งครั้งต่อ "ระดับ" (scale, quality) ที่มีผู้ชมใช้อยู่ (ปกติ 1–2 ระดับ)
+#
+# สัญญาณที่ใช้ (ทุกเฟรมที่ส่ง):
+#   send     : เวลาที่ yield เฟรมหนึ่งใช้จนส่งออก (ASGI server รอ socket ระบาย) เทียบกับช่วงเวลาต่อเฟรม
+#              → client / เครือข่ายช้า
+#   encode   : เวลาเข้ารหัสต่อเฟรมของ encoder เกิน encode_budget ของช่วงเวลาต่อเฟรม → CPU ไม่พอ
+#              (เทียบกับงบเวลาแบบสัมบูรณ์ ไม่ใช่เวลาวิเคราะห์ ซึ่งอาจสั้นมากในเฟรมที่ gate / tracker ข้ามการตรวจจับ)
+#   backlog  : encoder ทิ้งเฟรม (คิว inference → encode เต็ม) → encoder ตามไม่ทัน
+# แย่ต่อเนื่อง down_after เฟรม → ลดระดับ (ถึงระดับต่ำสุดแล้วลด fps) ;
+# ดีต่อเนื่อง up_after เฟรม → เพิ่ม fps ก่อน แล้วค่อยเพิ่มระดับ (ขึ้นช้า ลงเร็ว → ไม่แกว่ง)
+
+import time
+
+# (scale, quality) จากดีที่สุดไปถูกที่สุด
+# ระดับเต็ม = quality 95 เท่าค่าเริ่มต้นของ cv2.imencode เดิม
+LEVELS = ((1.0, 95), (1.0, 80), (1.0, 70), (0.75, 65), (0.5, 60), (0.35, 50))
+FULL_LEVEL = LEVELS[0]
+
+
+class QualityController:
+    """
+    Args:
+        scale / quality: ค่าคงที่จาก query (None = ปรับอัตโนมัติ) ; กำหนดตัวใดตัวหนึ่ง = ไม่ปรับระดับ
+        fps: fps คงที่ (None = ปรับอัตโนมัติระหว่าง min_fps..max_fps)
+        adaptive: False = ใช้ระดับ/fps เริ่มต้นตลอด
+        encode_budget: สัดส่วนของช่วงเวลาต่อเฟรมที่ encoder ใช้ได้ก่อนถือว่าแย่ง CPU
+    """
+
+    def __init__(self, scale=None, quality=None, fps=None, adaptive=True,
+                 max_fps=25.0, min_fps=4.0, down_after=3, up_after=40, encode_budget=0.5):
+        self.fixed_level = scale is not None or quality is not None
+        self.fixed_fps = fps is not None
+        self.adaptive = adaptive
+        self.max_fps = float(fps) if fps is not None else max_fps
+        self.min_fps = min(min_fps, self.max_fps)
+        self.down_after = down_after
+        self.up_after = up_after
+        self.encode_budget = encode_budget
+        self._index = 0
+        self._custom = (scale if scale is not None else FULL_LEVEL[0],
+                        quality if quality is not None else FULL_LEVEL[1])
+        self.fps = self.max_fps
+        self._bad = 0
+        self._good = 0
+        self._last_dropped = None
+        self.stats = {"steps_down": 0, "steps_up": 0}
+
+    @property
+    def level(self):
+        """ (scale, quality) ที่ผู้ชมนี้ควรได้ตอนนี้ """
+        return self._custom if self.fixed_level else LEVELS[self._index]
+
+    @property
+    def interval(self):
+        return 1.0 / self.fps
+
+    def update(self, send_sec, encode_ms, encode_dropped):
+        """ เรียกหลังส่งหนึ่งเฟรม → True ถ้าระดับหรือ fps เปลี่ยน """
+        if not self.adaptive:
+            return False
+        backlog = self._last_dropped is not None and encode_dropped > self._last_dropped
+        self._last_dropped = encode_dropped
+        slow_client = send_sec > 0.5 * self.interval
+        # encoder กินเวลาเกินงบต่อเฟรม (ที่ fps ปัจจุบัน) → แย่ง CPU กับการวิเคราะห์
+        encode_bound = encode_ms > self.encode_budget * self.interval * 1000.0
+        if slow_client or backlog or encode_bound:
+            self._bad += 1
+            self._good = 0
+        else:
+            self._good += 1
+            self._bad = 0
+
+        if self._bad >= self.down_after:
+            self._bad = 0
+            return self._step_down()
+        if self._good >= self.up_after:
+            self._good = 0
+            return self._step_up()
+        return False
+
+    def _step_down(self):
+        if not self.fixed_level and self._index < len(LEVELS) - 1:
+            self._index += 1
+        elif not self.fixed_fps and self.fps > self.min_fps:
+            self.fps = max(self.min_fps, self.fps * 0.75)
+        else:
+            return False
+        self.stats["steps_down"] += 1
+        return True
+
+    def _step_up(self):
+        if not self.fixed_fps and self.fps < self.max_fps:
+            self.fps = min(self.max_fps, self.fps * 1.25)
+        elif not self.fixed_level and self._index > 0:
+            self._index -= 1
+        else:
+            return False
+        self.stats["steps_up"] += 1
+        return True
+
+    def snapshot(self):
+        scale, quality = self.level
+        return dict(self.stats, scale=scale, quality=quality, fps=round(self.fps, 2), adaptive=self.adaptive)
+
+
+class FramePacer:
+    """ จำกัด fps ของผู้ชมหนึ่งคน: wait_sec() → ต้องรออีกกี่วินาทีก่อนส่งเฟรมถัดไป """
+
+    def __init__(self):
+        self._next = 0.0
+
+    def wait_sec(self):
+        return max(0.0, self._next - time.perf_counter())
+
+    def sent(self, interval):
+        # ตามหลัง (client ช้า) → เริ่มนับใหม่จากตอนนี้ ไม่ส่งรัวเพื่อชดเชย
+        self._next = max(self._next + interval, time.perf_counter())
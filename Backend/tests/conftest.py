@@ -0,0 +1,7 @@
+# ให้ import โมดูลใน Backend/ ได้เมื่อรัน pytest จากโฟลเดอร์ใดก็ได้ (เหมือน benchmarks/_common.py)
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,66 @@
+import pytest
+
+from eye_state import EyeStateEstimator, closed_probability
+
+
+def weak_closed_eyes():
+    return [{"eye": "left", "label": "Closed", "conf": 60.0},
+            {"eye": "right", "label": "Closed", "conf": 55.0}]
+
+
+def test_two_weak_closed_eyes_are_not_confident_sleep():
+    # vote_eyes ตัดตาปิดที่ต่ำกว่า 70% ทิ้ง → ("Open", 0.0) ; EMA ต้องใช้ค่าต่อตา ไม่ใช่ผลโหวต
+    per_eye = weak_closed_eyes()
+    estimator = EyeStateEstimator()
+    [(label, conf, _)] = estimator.estimate(["t1"], [None], False, lambda idx: [("Open", 0.0, per_eye)])
+    assert estimator.states["t1"]["p_closed"] == pytest.approx(0.575)
+    # เกณฑ์ 70% เดียวกับ vote_eyes → ยังไม่นับเป็นหลับ
+    assert label == "Open"
+    assert conf == pytest.approx(42.5)
+
+
+def test_smoothed_value_past_threshold_is_closed():
+    estimator = EyeStateEstimator(min_conf_for_closed=50.0)
+    [(label, conf, _)] = estimator.estimate(["t1"], [None], False, lambda idx: [("Open", 0.0, weak_closed_eyes())])
+    assert (label, conf) == ("Closed", pytest.approx(57.5))
+
+
+def test_reused_frames_keep_last_per_eye():
+    per_eye = [{"eye": "left", "label": "Open", "conf": 97.0},
+               {"eye": "right", "label": "Open", "conf": 95.0}]
+    estimator = EyeStateEstimator()
+    estimator.estimate(["t1"], [None], False, lambda idx: [("Open", 97.0, per_eye)])
+
+    def no_cnn(idx):
+        raise AssertionError("CNN should be skipped")
+    [(label, _, reused)] = estimator.estimate(["t1"], [None], False, no_cnn)
+    assert label == "Open"
+    assert reused == per_eye
+    assert estimator.stats["reused"] == 1
+
+
+def test_per_eye_probabilities_are_averaged():
+    per_eye = [{"eye": "left", "label": "Closed", "conf": 90.0},
+               {"eye": "right", "label": "Open", "conf": 70.0}]
+    assert closed_probability("Closed", 90.0, per_eye) == pytest.approx((0.9 + 0.3) / 2)
+
+
+def test_face_fallback_without_per_eye():
+    assert closed_probability("Open", 80.0, []) == pytest.approx(0.2)
+
+
+@pytest.mark.parametrize("result", [("Open", 0.0, []), ("Unknown", 0.0, []), ("Closed", 0.0, [])])
+def test_empty_or_zero_confidence_is_no_measurement(result):
+    assert closed_probability(*result) is None
+    estimator = EyeStateEstimator()
+    [(label, conf, _)] = estimator.estimate(["t1"], [None], False, lambda idx: [result])
+    assert (label, conf) == ("Unknown", 0.0)
+    assert "t1" not in estimator.states
+
+
+def test_no_measurement_keeps_previous_state():
+    estimator = EyeStateEstimator(max_reuse_frames=0)
+    estimator.estimate(["t1"], [None], False, lambda idx: [("Open", 95.0, [])])
+    before = estimator.states["t1"]["p_closed"]
+    estimator.estimate(["t1"], [None], False, lambda idx: [("Open", 0.0, [])])
+    assert estimator.states["t1"]["p_closed"] == before
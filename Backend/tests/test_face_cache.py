@@ -0,0 +1,52 @@
+import glob
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from face_cache import EncodingCache
+
+
+def image(folder, name, content=b"jpeg"):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(content + name.encode())
+    return path
+
+
+def test_concurrent_writers_merge_and_leave_one_array(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    a_path, b_path = image(tmp_path, "a.jpg"), image(tmp_path, "b.jpg")
+    # สอง worker โหลด manifest เดียวกัน (ยังว่าง) แล้วต่างคนต่าง save
+    first, second = EncodingCache(cache_dir), EncodingCache(cache_dir)
+    first.put(a_path, "a", np.full(128, 1.0))
+    second.put(b_path, "b", np.full(128, 2.0))
+    first.save()
+    second.save()
+
+    merged = EncodingCache(cache_dir)
+    assert merged.get(a_path)[1][0] == pytest.approx(1.0)
+    assert merged.get(b_path)[1][0] == pytest.approx(2.0)
+    assert len(glob.glob(os.path.join(cache_dir, "encodings-*.npy"))) == 1
+
+
+def test_removed_entry_is_not_restored_from_disk(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    a_path = image(tmp_path, "a.jpg")
+    cache = EncodingCache(cache_dir)
+    cache.put(a_path, "a", np.zeros(128))
+    cache.save()
+    cache.remove(a_path)
+    cache.save()
+    assert EncodingCache(cache_dir).get(a_path) == (False, None)
+
+
+def test_keys_are_normalised(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("static")
+    image("static", "a.jpg")
+    cache = EncodingCache(str(tmp_path / "cache"))
+    cache.put("./static/a.jpg", "a", np.zeros(128))
+    hit, _ = cache.get("static/a.jpg")
+    assert hit
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("PIL")
+
+from sleep_detector import SleepDetector, preprocess_crops
+
+HEIGHT = WIDTH = 180
+# ค่า pixel เฉลี่ยต่างจากทาง PIL ได้ไม่เกินเท่านี้ (สเกล 0-255) — เท่ากับ --pixel-tol ของ bench_preprocess.py
+PIXEL_TOL = 3.0
+
+
+def eye_crop(height, width, seed=0):
+    """ ภาพคล้ายรูปตา (BGR uint8): ผิว + ตาขาว + ม่านตาเข้ม + เปลือกตา แล้ว blur ให้ smooth แบบกล้องจริง """
+    rng = np.random.default_rng(seed)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = (120, 150, 200)
+    center = (width // 2 + int(rng.integers(-width // 10, width // 10 + 1)), height // 2)
+    cv2.ellipse(img, center, (width * 2 // 5, height // 4), 0, 0, 360, (225, 230, 235), -1)
+    cv2.circle(img, center, max(2, height // 5), (40, 50, 70), -1)
+    cv2.circle(img, center, max(1, height // 12), (10, 10, 10), -1)
+    cv2.ellipse(img, (width // 2, height // 4), (width // 2, height // 6), 0, 0, 180, (90, 110, 150), -1)
+    noise = rng.normal(0, 4, img.shape)
+    img = np.clip(img + noise, 0, 255).astype(np.uint8)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+def reference_batch(crops):
+    """ ทางเดิม: BGR→RGB → PIL resize (bicubic) → float32 — ไม่ต้องโหลดโมเดล """
+    detector = SleepDetector.__new__(SleepDetector)
+    detector.img_height, detector.img_width = HEIGHT, WIDTH
+    return np.concatenate([detector.preprocess_image_from_array(c) for c in crops])
+
+
+def assert_close_to_reference(crops):
+    fast = preprocess_crops(crops, HEIGHT, WIDTH)
+    ref = reference_batch(crops)
+    assert fast.shape == ref.shape == (len(crops), HEIGHT, WIDTH, 3)
+    assert fast.dtype == np.float32
+    diff = np.abs(fast - ref).mean(axis=(1, 2, 3))
+    assert diff.max() <= PIXEL_TOL, diff
+
+
+def test_enlarging_eye_crops_match_pil():
+    # crop ตาจาก landmark จริงเล็กกว่า input ของโมเดล → ขยาย (INTER_CUBIC)
+    assert_close_to_reference([eye_crop(h, w, seed) for seed, (h, w) in enumerate([(28, 44), (40, 62), (64, 96)])])
+
+
+def test_shrinking_crops_match_pil():
+    # crop ที่ใหญ่กว่า input (กล้องใกล้ / ภาพความละเอียดสูง) → ย่อ (INTER_AREA)
+    assert_close_to_reference([eye_crop(h, w, seed) for seed, (h, w) in enumerate([(240, 320), (360, 480)])])
+
+
+@pytest.mark.parametrize("shape, interpolation", [
+    ((40, 62), cv2.INTER_CUBIC),
+    ((240, 320), cv2.INTER_AREA),
+    ((120, 260), cv2.INTER_AREA),   # ด้านใดด้านหนึ่งใหญ่กว่า → นับเป็นการย่อ
+])
+def test_interpolation_follows_scale_direction(shape, interpolation):
+    crop = eye_crop(*shape)
+    expected = cv2.resize(crop, (WIDTH, HEIGHT), interpolation=interpolation)[..., ::-1].astype(np.float32)
+    np.testing.assert_array_equal(preprocess_crops([crop], HEIGHT, WIDTH)[0], expected)
+
+
+def test_batch_buffer_is_not_shared_between_threads():
+    # /process_frame (to_thread) กับ pipeline ของกล้องเรียก detector ตัวเดียวกันพร้อมกันได้
+    detector = SleepDetector.__new__(SleepDetector)
+    detector.img_height, detector.img_width = HEIGHT, WIDTH
+    detector._buffers = threading.local()
+    buffers = []
+    worker = threading.Thread(target=lambda: buffers.append(detector.preprocess_batch([eye_crop(40, 62)])))
+    worker.start()
+    worker.join()
+    mine = detector.preprocess_batch([eye_crop(40, 62, seed=1)])
+    assert not np.shares_memory(mine, buffers[0])
+    assert np.shares_memory(mine, detector.preprocess_batch([eye_crop(40, 62, seed=2)]))
@@ -0,0 +1,27 @@
+import pytest
+
+from snapshot_store import etag_matches
+
+ETAG = '"' + "ab" * 32 + '"'
+
+
+@pytest.mark.parametrize("header", [
+    ETAG,
+    "W/" + ETAG,
+    '"other", ' + ETAG,
+    "*",
+])
+def test_matching_if_none_match(header):
+    assert etag_matches(header, ETAG)
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    "ab" * 32,                          # ไม่มี quote
+    '"' + "ab" * 32 + 'ff"',            # id เป็น substring ของ tag อื่น
+    '"x' + "ab" * 32 + '"',
+    '"other"',
+])
+def test_non_matching_if_none_match(header):
+    assert not etag_matches(header, ETAG)
@@ -0,0 +1,240 @@
+# video_analysis.py — วิเคราะห์คลิปบันทึกการสอนย้อนหลัง (ไม่ต้องใช้กล้องสด)
+#
+#   python video_analysis.py lecture.mp4 --workers 8
+#   python video_analysis.py recordings/ --sample-fps 5 --no-db      (ทุกไฟล์วิดีโอในโฟลเดอร์)
+#
+# แบ่งคลิปเป็นช่วงเวลา (segment) แล้วกระจายให้หลาย process — แต่ละ process มี FaceRecognizer / SleepDetector
+# ของตัวเอง อ่านเฉพาะช่วงของตัวเองจากไฟล์ (ไม่ต้องส่งเฟรมข้าม process) → ได้ผลต่อเฟรมเป็น (เวลา, ชื่อ, ตาปิดไหม)
+# จากนั้นรวมทุกช่วงเป็นเส้นเวลาเดียวแล้วหาช่วงหลับของนักเรียนแต่ละคน (ตาปิดต่อเนื่อง ≥ sleep_threshold_sec
+# เหมือนสตรีมสด) ช่วงที่คร่อมรอยต่อ segment จึงไม่ถูกตัดขาด
+#
+# ผลเก็บแยกใน collection sleep_intervals (อ้างด้วยชื่อไฟล์คลิป + วินาทีในคลิป) ไม่ปนกับ sleep_episodes ของกล้องสด
+# → /sleep-history, /sleep-episodes แสดงเฉพาะกล้องสด ; ผลของคลิปดูจาก /analysis/jobs/{id}
+# (คลิปไม่มีกล้อง / track / snapshot และเวลาจริงมีก็ต่อเมื่อส่ง recorded_at มา)
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import cv2
+
+VIDEO_EXTS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+# ----- worker process -----
+_worker = {}
+
+
+def _init_worker(image_folder, cache_dir, backend):
+    """ สร้างโมเดลครั้งเดียวต่อ process (import ที่นี่เพื่อจำกัด thread ก่อน TensorFlow โหลด) """
+    # หลาย process อยู่แล้ว → ให้แต่ละตัวใช้ thread เดียว ไม่แย่งคอร์กันเอง
+    os.environ.setdefault("TF_NUM_INTRAOP_THREADS", "1")
+    os.environ.setdefault("TF_NUM_INTEROP_THREADS", "1")
+    cv2.setNumThreads(1)
+    from face_recognizer import FaceRecognizer
+    from sleep_detector import SleepDetector
+    from eye_state import EyeStateEstimator
+    _worker["recognizer"] = FaceRecognizer(image_folder=image_folder, min_faces=0, cache_dir=cache_dir,
+                                           backend=backend)
+    # EYE_MODEL_BACKEND / EYE_MODEL_PATH เดียวกับเซิร์ฟเวอร์ (สืบทอด environment มา)
+    _worker["detector"] = SleepDetector(model_path=os.getenv("EYE_MODEL_PATH") or None,
+                                        backend=os.getenv("EYE_MODEL_BACKEND", "keras"),
+                                        inference="compiled", num_threads=1)
+    _worker["estimator"] = EyeStateEstimator()
+
+
+def _analyze_segment(path, start_frame, end_frame, fps, sample_every):
+    """
+    วิเคราะห์เฟรม [start_frame, end_frame) ของไฟล์ โดยวิเคราะห์ทุก sample_every เฟรม
+    → (start_frame, observations) ; observations = [(t_sec, name, closed), ...] เฉพาะคนที่รู้จัก
+    """
+    from frame_analysis import analyze_faces
+    recognizer = _worker["recognizer"]
+    detector = _worker["detector"]
+    estimator = _worker["estimator"]
+    # segment ใหม่ไม่ต่อเนื่องกับเฟรมก่อนหน้าของ process นี้ → เริ่ม track / สถานะตาใหม่
+    if recognizer.tracker is not None:
+        recognizer.tracker.reset()
+    estimator.reset()
+
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    observations = []
+    try:
+        for index in range(start_frame, end_frame):
+            if (index - start_frame) % sample_every:
+                # เฟรมที่ไม่วิเคราะห์: grab อย่างเดียว ไม่ต้องแปลงเป็นภาพ
+                if not cap.grab():
+                    break
+                continue
+            ok, frame = cap.read()
+            if not ok:
+                break
+            boxes, names, face_results, _, _ = analyze_faces(recognizer, detector, frame, estimator=estimator)
+            t = index / fps
+            for name, (label, _, _) in zip(names, face_results):
+                if name not in ("Unknown", "Error"):
+                    observations.append((t, name, label.lower() == "closed"))
+    finally:
+        cap.release()
+    return start_frame, observations
+
+
+# ----- แบ่งงาน / รวมผล -----
+def video_info(path):
+    """ → (frame_count, fps) ของไฟล์วิดีโอ """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    return frame_count, fps
+
+
+def split_segments(frame_count, fps, segment_sec):
+    """ ช่วงเฟรม [(start, end), ...] ยาวช่วงละ segment_sec วินาที """
+    size = max(1, int(round(segment_sec * fps)))
+    return [(start, min(start + size, frame_count)) for start in range(0, frame_count, size)]
+
+
+def sleep_intervals(observations, threshold_sec=3.0, max_gap_sec=1.0, step_sec=0.0):
+    """
+    รวมผลต่อเฟรมเป็นช่วงหลับต่อคน
+    Args:
+        observations: [(t_sec, name, closed), ...] (ลำดับใดก็ได้)
+        threshold_sec: ตาปิดต่อเนื่องอย่างน้อยเท่านี้จึงนับเป็นหลับ
+        max_gap_sec: ไม่เห็นหน้านานกว่านี้ถือว่าช่วงตาปิดขาดตอน
+        step_sec: ระยะห่างระหว่างเฟรมที่วิเคราะห์ (บวกเข้าปลายช่วง เพราะเฟรมสุดท้ายแทนเวลาถึงเฟรมถัดไป)
+    Returns:
+        list ของ {"name", "start_sec", "end_sec", "duration_sec"} เรียงตามเวลาเริ่ม
+    """
+    by_name = {}
+    for t, name, closed in observations:
+        by_name.setdefault(name, []).append((t, closed))
+
+    intervals = []
+    for name, obs in by_name.items():
+        obs.sort()
+        start = last = None
+        for t, closed in obs + [(float("inf"), False)]:
+            if closed and start is not None and t - last <= max_gap_sec:
+                last = t
+                continue
+            if start is not None and last + step_sec - start >= threshold_sec:
+                intervals.append({"name": name, "start_sec": round(start, 2), "end_sec": round(last + step_sec, 2),
+                                  "duration_sec": round(last + step_sec - start, 2)})
+            start = last = t if closed else None
+    intervals.sort(key=lambda iv: iv["start_sec"])
+    return intervals
+
+
+def list_videos(path):
+    """ ไฟล์เดียว หรือทุกไฟล์วิดีโอในโฟลเดอร์ """
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(VIDEO_EXTS))
+    return [path]
+
+
+def analyze_video(path, workers=None, sample_fps=5.0, segment_sec=30.0, threshold_sec=3.0,
+                  image_folder="static", cache_dir=".face_cache", backend="hog", on_progress=None):
+    """
+    วิเคราะห์คลิปหนึ่งไฟล์แบบขนาน
+    Args:
+        workers: จำนวน process (None = ทุกคอร์)
+        sample_fps: วิเคราะห์กี่เฟรมต่อวินาทีของคลิป (เฟรมอื่นแค่ decode ผ่าน)
+        segment_sec: ความยาวช่วงที่ส่งให้ worker ครั้งละช่วง (สั้น = กระจายงานได้ทั่วกว่า)
+        on_progress: callable(dict) เรียกทุกครั้งที่ segment เสร็จ
+    Returns:
+        dict: video, duration_sec, frames, analyzed_frames, elapsed_sec, realtime_factor, intervals
+    """
+    t0 = time.perf_counter()
+    frame_count, fps = video_info(path)
+    sample_every = max(1, int(round(fps / sample_fps)))
+    segments = split_segments(frame_count, fps, segment_sec)
+    observations = []
+
+    # spawn: process แม่อาจมี thread (pipeline / TensorFlow) อยู่ ไม่ควร fork
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(image_folder, cache_dir, backend)) as executor:
+        futures = [executor.submit(_analyze_segment, path, start, end, fps, sample_every)
+                   for start, end in segments]
+        for done, future in enumerate(as_completed(futures), 1):
+            _, obs = future.result()
+            observations.extend(obs)
+            if on_progress:
+                on_progress({"video": path, "segments_done": done, "segments": len(segments),
+                             "elapsed_sec": round(time.perf_counter() - t0, 2)})
+
+    duration = frame_count / fps
+    elapsed = time.perf_counter() - t0
+    return {
+        "video": path,
+        "duration_sec": round(duration, 2),
+        "frames": frame_count,
+        "analyzed_frames": sum(len(range(s, e, sample_every)) for s, e in segments),
+        "elapsed_sec": round(elapsed, 2),
+        "realtime_factor": round(duration / elapsed, 2) if elapsed > 0 else None,
+        "intervals": sleep_intervals(observations, threshold_sec, max_gap_sec=max(1.0, 2 * sample_every / fps),
+                                     step_sec=sample_every / fps),
+    }
+
+
+def save_intervals(collection, result, job_id=None, recorded_at=None):
+    """
+    บันทึกช่วงหลับของคลิปลง MongoDB (ลบผลเก่าของคลิปเดียวกันก่อน → วิเคราะห์ซ้ำได้)
+    recorded_at: เวลาเริ่มบันทึกคลิป (datetime) ถ้ารู้ → คำนวณเวลาจริงของแต่ละช่วง
+    """
+    collection.delete_many({"video": result["video"]})
+    docs = []
+    for iv in result["intervals"]:
+        doc = dict(iv, video=result["video"], job_id=job_id, created_at=datetime.now())
+        if recorded_at is not None:
+            doc["start_time"] = recorded_at.timestamp() + iv["start_sec"]
+            doc["end_time"] = recorded_at.timestamp() + iv["end_sec"]
+        docs.append(doc)
+    if docs:
+        collection.insert_many(docs)
+    return len(docs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline sleep analysis of recorded lectures")
+    parser.add_argument("path", help="ไฟล์วิดีโอ หรือโฟลเดอร์ของวิดีโอ")
+    parser.add_argument("--workers", type=int, default=None, help="จำนวน process (ค่าเริ่มต้น = ทุกคอร์)")
+    parser.add_argument("--sample-fps", type=float, default=5.0)
+    parser.add_argument("--segment-sec", type=float, default=30.0)
+    parser.add_argument("--threshold-sec", type=float, default=3.0)
+    parser.add_argument("--image-folder", default="static")
+    parser.add_argument("--cache-dir", default=".face_cache")
+    parser.add_argument("--backend", default="hog")
+    parser.add_argument("--no-db", action="store_true", help="พิมพ์ผลอย่างเดียว ไม่บันทึกลง MongoDB")
+    args = parser.parse_args()
+
+    collection = None
+    if not args.no_db:
+        from pymongo import MongoClient
+        collection = MongoClient("mongodb://localhost:27017/")["Project_sleep_classroom"]["sleep_intervals"]
+
+    def print_progress(event):
+        print(f"[{event['segments_done']}/{event['segments']}] {event['video']} ({event['elapsed_sec']} s)",
+              flush=True)
+
+    for path in list_videos(args.path):
+        result = analyze_video(path, workers=args.workers, sample_fps=args.sample_fps,
+                               segment_sec=args.segment_sec, threshold_sec=args.threshold_sec,
+                               image_folder=args.image_folder, cache_dir=args.cache_dir,
+                               backend=args.backend, on_progress=print_progress)
+        print(f"✅ {path}: คลิป {result['duration_sec']} s วิเคราะห์ {result['elapsed_sec']} s "
+              f"(x{result['realtime_factor']} ของเวลาจริง)")
+        for iv in result["intervals"]:
+            print(f"😴 {iv['name']:<20} {iv['start_sec']:>9.1f} → {iv['end_sec']:>9.1f} s ({iv['duration_sec']} s)")
+        if collection is not None:
+            print(f"💾 บันทึก {save_intervals(collection, result)} ช่วงลง sleep_intervals")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,12 @@
 // MainContent.tsx
 import React, { useState, useEffect, useRef } from "react";
+import { subscribeStatus } from "../statusChannel";
 
 const API_BASE_URL = "http://localhost:8000";
+const CAMERA_ID = "0"; // กล้องเริ่มต้นของ /start_stream, /video_feed
 
 type StreamStatusType = "connected" | "disconnected" | "error";
 
-type StatusPayload = {
-  is_streaming: boolean;
-  status: {
-    label: string | null;
-    confidence: number | null; // 0–100 จาก backend
-    faces: string[];
-    timestamp: number | null;
-  };
-};
-
 const MainContent: React.FC = () => {
   const [isStreaming, setIsStreaming] = useState(false);
   const [streamStatus, setStreamStatus] = useState<StreamStatusType>("disconnected");
@@ -55,28 +47,25 @@ const MainContent: React.FC = () => {
     }
   };
 
-  const checkStreamStatus = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/stream_status`);
-      const data: StatusPayload = await response.json();
-      setIsStreaming(data.is_streaming);
-      setStreamStatus(data.is_streaming ? "connected" : "disconnected");
-      if (data.status) {
-        setLabel(data.status.label);
-        setConfidence(data.status.confidence);
-        setFaces(data.status.faces || []);
-      }
-    } catch (e) {
-      console.error("checkStreamStatus error:", e);
-      setStreamStatus("error");
-    }
-  };
-
-  useEffect(() => {
-    checkStreamStatus();
-    const interval = setInterval(checkStreamStatus, 1000);
-    return () => clearInterval(interval);
-  }, []);
+  // server push (/events) แทนการ poll /stream_status ทุก 1 วินาที — อัปเดตเฉพาะเมื่อสถานะเปลี่ยน
+  useEffect(
+    () =>
+      subscribeStatus(
+        (state) => {
+          const cam = state.cameras[CAMERA_ID];
+          const streaming = cam?.is_streaming ?? false;
+          setIsStreaming(streaming);
+          setStreamStatus(streaming ? "connected" : "disconnected");
+          setLabel(cam?.label ?? null);
+          setConfidence(cam?.confidence ?? null);
+          setFaces(cam?.faces ?? []);
+        },
+        (connected) => {
+          if (!connected) setStreamStatus("error");
+        }
+      ),
+    []
+  );
 
   useEffect(() => {
     if (isStreaming && imgRef.current) {
@@ -1,4 +1,5 @@
 import { useEffect, useState } from "react";
+import { subscribeStatus } from "../statusChannel";
 
 const API_BASE_URL = "http://localhost:8000";
 
@@ -17,30 +18,20 @@ type StreamStatus = {
 const StudentSearch = () => {
   const [sleepList, setSleepList] = useState<{ name: string; time: string }[]>([]);
 
-  useEffect(() => {
-    const getSleepList = async () => {
-      try {
-        const res = await fetch(`${API_BASE_URL}/who-sleeping`);
-        const data = await res.json();
-
-        if (data.list) {
-          const seen = new Set<string>();
-          const unique = data.list.filter((item: { name: string; time: string }) => {
-            if (seen.has(item.name)) return false;
-            seen.add(item.name);
-            return true;
-          });
-          setSleepList(unique);
-        }
-      } catch (e) {
-        console.error("Error fetching sleep list:", e);
-      }
-    };
-
-    getSleepList();
-    const id = setInterval(getSleepList, 3000);
-    return () => clearInterval(id);
-  }, []);
+  // รายการคนหลับมาทาง /events เมื่อมีการเปลี่ยนเท่านั้น (แทนการ poll /who-sleeping ทุก 3 วินาที)
+  useEffect(
+    () =>
+      subscribeStatus((state) => {
+        const seen = new Set<string>();
+        const unique = state.sleeping.filter((item) => {
+          if (seen.has(item.name)) return false;
+          seen.add(item.name);
+          return true;
+        });
+        setSleepList(unique);
+      }),
+    []
+  );
 
   const handleDelete = async (index: number) => {
     try {
@@ -1,5 +1,6 @@
 import { useEffect, useState } from "react"
 import { useNavigate } from "react-router-dom"
+import { subscribeStatus } from "../statusChannel"
 
 type UserData = {
   _id?: string
@@ -12,6 +13,27 @@ type UserData = {
 type SleepRecord = {
   name: string
   time: string
+  episode_id?: string
+}
+
+type SleepEpisode = {
+  episode_id: string
+  student: string
+  start_time: string
+}
+
+// ตัวตัดรายการซ้ำ: episode_id ถ้ามี ; รายการที่ไม่มี id (เช่นจาก /who-sleeping) ใช้ชื่อ + เวลาเริ่มหลับ
+const recordKey = (r: SleepRecord) => r.episode_id ?? `${r.name}|${r.time}`
+
+const mergeRecords = (base: SleepRecord[], extra: SleepRecord[]) => {
+  const seen = new Set(base.map(recordKey))
+  const added = extra.filter((r) => {
+    const key = recordKey(r)
+    if (seen.has(key)) return false
+    seen.add(key)
+    return true
+  })
+  return added.length ? [...base, ...added] : base
 }
 
 const StudentDashboard = () => {
@@ -38,10 +60,15 @@ const StudentDashboard = () => {
 
     const fetchHistory = async () => {
       try {
-        const res = await fetch("http://localhost:8000/who-sleeping")
-        const data = await res.json()
-        const filtered = data.list.filter((h: SleepRecord) => h.name === parsedUser.username)
-        setHistory(filtered)
+        // ประวัติถาวรจาก sleep_episodes (ใหม่ → เก่า) → เรียงเก่า → ใหม่ตามที่หน้านี้แสดง
+        const res = await fetch(
+          `http://localhost:8000/sleep-history/${encodeURIComponent(parsedUser.username)}?limit=200`
+        )
+        const data: { history: SleepEpisode[] } = await res.json()
+        const records = data.history
+          .map((e) => ({ name: e.student, time: new Date(e.start_time).toLocaleString(), episode_id: e.episode_id }))
+          .reverse()
+        setHistory((live) => mergeRecords(records, live))
       } catch (err) {
         console.error("❌ Failed to fetch sleep history:", err)
       } finally {
@@ -50,6 +77,12 @@ const StudentDashboard = () => {
     }
 
     fetchHistory()
+
+    // ครั้งที่หลับระหว่างเปิดหน้านี้มาทาง /events → ต่อท้ายถ้ายังไม่มี
+    return subscribeStatus((state) => {
+      const live = state.sleeping.filter((h) => h.name === parsedUser.username)
+      setHistory((prev) => mergeRecords(prev, live))
+    })
   }, [navigate])
 
   // === ฟังก์ชัน Export CSV ===
@@ -0,0 +1,135 @@
+// statusChannel.ts — การเชื่อมต่อ /events (Server-Sent Events) เส้นเดียวต่อหน้าเว็บ ใช้ร่วมกันทุก component
+// server ส่ง snapshot ตอนเชื่อมต่อ แล้วส่งเฉพาะสิ่งที่เปลี่ยน → ที่นี่รวมกลับเป็นสถานะเต็มให้ component อ่าน
+
+const API_BASE_URL = "http://localhost:8000";
+
+export type FaceState = {
+  name: string;
+  track_id: number | null;
+  state: string; // Open / Closed / Sleep
+};
+
+export type CameraState = {
+  is_streaming: boolean;
+  label: string | null;
+  confidence?: number | null;
+  faces: string[];
+  snapshot: string | null; // path ของรูปล่าสุดเมื่อมีคนหลับ (ต่อท้าย API_BASE_URL)
+  faces_state: Record<string, FaceState>;
+};
+
+export type SleepEntry = {
+  name: string;
+  time: string; // เวลาเริ่มหลับ
+  camera?: string | null;
+  episode_id?: string;
+  end?: string; // มีเมื่อตื่นแล้ว
+  duration_sec?: number;
+};
+
+export type StatusState = {
+  cameras: Record<string, CameraState>;
+  sleeping: SleepEntry[];
+};
+
+type Listener = (state: StatusState) => void;
+type ConnectionListener = (connected: boolean) => void;
+
+let source: EventSource | null = null;
+let state: StatusState | null = null;
+const listeners = new Set<Listener>();
+const connectionListeners = new Set<ConnectionListener>();
+
+const emptyCamera = (): CameraState => ({
+  is_streaming: false,
+  label: null,
+  faces: [],
+  snapshot: null,
+  faces_state: {},
+});
+
+const notify = () => {
+  if (!state) return;
+  const current = state;
+  listeners.forEach((l) => l(current));
+};
+
+const onSnapshot = (e: MessageEvent) => {
+  const data: { cameras: Record<string, Partial<CameraState>>; sleeping?: SleepEntry[] } = JSON.parse(e.data);
+  const cameras: Record<string, CameraState> = {};
+  for (const [id, cam] of Object.entries(data.cameras)) {
+    cameras[id] = { ...emptyCamera(), ...cam, faces: cam.faces ?? [], faces_state: cam.faces_state ?? {} };
+  }
+  state = { cameras, sleeping: data.sleeping ?? [] };
+  notify();
+};
+
+const onCamera = (e: MessageEvent) => {
+  if (!state) return;
+  const data = JSON.parse(e.data);
+  const cameras = { ...state.cameras };
+  if (data.removed) {
+    delete cameras[data.camera];
+  } else {
+    const prev = cameras[data.camera] ?? emptyCamera();
+    cameras[data.camera] = {
+      is_streaming: data.is_streaming,
+      label: data.label,
+      confidence: data.confidence,
+      faces: data.faces ?? [],
+      snapshot: data.snapshot ?? null,
+      faces_state: data.is_streaming ? prev.faces_state : {},
+    };
+  }
+  state = { ...state, cameras };
+  notify();
+};
+
+const onFace = (e: MessageEvent) => {
+  if (!state) return;
+  const { camera, key, state: faceState, name, track_id } = JSON.parse(e.data);
+  const prev = state.cameras[camera] ?? emptyCamera();
+  const faces_state = { ...prev.faces_state };
+  if (faceState === null) delete faces_state[key];
+  else faces_state[key] = { name, track_id, state: faceState };
+  state = { ...state, cameras: { ...state.cameras, [camera]: { ...prev, faces_state } } };
+  notify();
+};
+
+const onSleeping = (e: MessageEvent) => {
+  if (!state) return;
+  state = { ...state, sleeping: JSON.parse(e.data).list ?? [] };
+  notify();
+};
+
+const connect = () => {
+  source = new EventSource(`${API_BASE_URL}/events`);
+  source.addEventListener("snapshot", onSnapshot);
+  source.addEventListener("camera", onCamera);
+  source.addEventListener("face", onFace);
+  source.addEventListener("sleeping", onSleeping);
+  // EventSource ต่อใหม่เองเมื่อหลุด แล้ว server ส่ง snapshot ใหม่ให้
+  source.onopen = () => connectionListeners.forEach((l) => l(true));
+  source.onerror = () => connectionListeners.forEach((l) => l(false));
+};
+
+/**
+ * ฟังสถานะแบบ push — listener ถูกเรียกทันทีถ้ามีสถานะแล้ว และทุกครั้งที่มีอะไรเปลี่ยน
+ * คืนฟังก์ชันยกเลิก (ปิดการเชื่อมต่อเมื่อไม่มีใครฟังแล้ว)
+ */
+export const subscribeStatus = (listener: Listener, onConnection?: ConnectionListener) => {
+  listeners.add(listener);
+  if (onConnection) connectionListeners.add(onConnection);
+  if (!source) connect();
+  if (state) listener(state);
+
+  return () => {
+    listeners.delete(listener);
+    if (onConnection) connectionListeners.delete(onConnection);
+    if (listeners.size === 0 && source) {
+      source.close();
+      source = null;
+      state = null;
+    }
+  };
+};